@@ -0,0 +1,121 @@
+import atexit
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from datetime import datetime
+
+
+LOGGER_NAME = 'emergency'
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_STANDARD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+_listener = None
+_configure_lock = threading.Lock()
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Let through 1 in `rate` records logged with extra={'sampled': True}.
+
+    Per-student and per-message lines are marked as sampled, so verbose runs
+    over large rosters print a representative trickle instead of every row.
+    Records that are not marked are never dropped.
+    """
+
+    def __init__(self, rate=1):
+        super().__init__()
+        self.rate = max(1, int(rate))
+        self._counter = itertools.count()
+
+    def filter(self, record):
+        if getattr(record, 'sampled', False):
+            return next(self._counter) % self.rate == 0
+        return True
+
+
+class StructuredFormatter(logging.Formatter):
+    """Format records as one JSON object per line, including any `extra` fields"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRIBUTES and key != 'sampled':
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def configure_logging(level=None, log_format=None, sample_rate=None, stream=None):
+    """
+    Configure the emergency system's loggers
+
+    Records are handed to a queue and written by a background listener
+    thread, so agents never block on console I/O. Defaults come from the
+    environment:
+        EMERGENCY_LOG_LEVEL: INFO (summary counters only) or DEBUG (also per-row lines)
+        EMERGENCY_LOG_FORMAT: 'text' or 'json'
+        EMERGENCY_LOG_SAMPLE: emit 1 in N per-row lines at DEBUG level (default 1)
+
+    Args:
+        level: logging level name or number
+        log_format: 'text' or 'json'
+        sample_rate: keep 1 in this many per-row (sampled) records
+        stream: where to write (default sys.stdout)
+    """
+    global _listener
+
+    level = level or os.environ.get('EMERGENCY_LOG_LEVEL', 'INFO')
+    log_format = log_format or os.environ.get('EMERGENCY_LOG_FORMAT', 'text')
+    sample_rate = sample_rate or int(os.environ.get('EMERGENCY_LOG_SAMPLE', '1'))
+
+    with _configure_lock:
+        if _listener is not None:
+            _listener.stop()
+
+        output = logging.StreamHandler(stream or sys.stdout)
+        if log_format == 'json':
+            output.setFormatter(StructuredFormatter())
+        else:
+            output.setFormatter(logging.Formatter('%(message)s'))
+
+        # Sampling happens before the queue so dropped rows cost nothing downstream
+        records = queue.SimpleQueue()
+        queue_handler = logging.handlers.QueueHandler(records)
+        queue_handler.addFilter(SamplingFilter(sample_rate))
+
+        logger = logging.getLogger(LOGGER_NAME)
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+        logger.addHandler(queue_handler)
+        logger.setLevel(level.upper() if isinstance(level, str) else level)
+        logger.propagate = False
+
+        _listener = logging.handlers.QueueListener(records, output)
+        _listener.start()
+
+
+def get_logger(name):
+    """Get the logger for a component, configuring logging from the environment on first use"""
+    if _listener is None:
+        configure_logging()
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+
+atexit.register(_stop_listener)
@@ -1,13 +1,20 @@
 import pandas as pd
 from datetime import datetime
 
+from .agent_logging import get_logger
+from .emergency_ids import new_emergency_id
+from .emergency_target import EmergencyTarget
+
+logger = get_logger('alert_agent')
+
 class AlertAgent:
     def __init__(self):
         self.role = 'Emergency Alert Coordinator'
         self.goal = 'Trigger emergency alerts and coordinate response'
         self.backstory = 'You are responsible for initiating emergency communication protocols and ensuring all stakeholders are notified promptly.'
     
-    def trigger_emergency(self, emergency_type, emergency_message, students_data):
+    def trigger_emergency(self, emergency_type, emergency_message, students_data, branch=None, section=None,
+                          selected_students=None, roster_index=None):
         """
         Trigger emergency alert based on type and message
         
@@ -15,33 +22,34 @@ class AlertAgent:
             emergency_type: 'all', 'branch', or 'section'
             emergency_message: Description of the emergency
             students_data: DataFrame containing student information
+            branch: Branch name (branch/section emergencies)
+            section: Section name (section emergencies)
+            selected_students: list of student IDs who are safe (checked)
+            roster_index: optional RosterIndex over students_data
         
         Returns:
-            dict: Emergency alert details
+            dict: Emergency alert details; 'target' is a lazy EmergencyTarget, so no
+                student rows are materialized here (the SelectionAgent resolves it)
         """
+        target = EmergencyTarget(
+            emergency_type, branch, section, selected_students,
+            students_data=students_data, roster_index=roster_index
+        )
+        
         alert_data = {
-            'emergency_id': f"EMRG_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+            # Unique even for many triggers per second, and sortable by creation time
+            'emergency_id': new_emergency_id(),
             'emergency_type': emergency_type,
             'emergency_message': emergency_message,
             'timestamp': datetime.now().isoformat(),
             'status': 'ACTIVE',
-            'affected_students': []
+            'target': target,
+            'target_description': target.description
         }
         
-        # Determine affected students based on emergency type
-        if emergency_type == 'all':
-            alert_data['affected_students'] = students_data.to_dict('records')
-            alert_data['target_description'] = "All Students"
-        elif emergency_type == 'branch':
-            # This will be handled by SelectionAgent
-            alert_data['target_description'] = "Specific Branch"
-        elif emergency_type == 'section':
-            # This will be handled by SelectionAgent
-            alert_data['target_description'] = "Specific Section"
-        
-        print(f"🚨 EMERGENCY ALERT TRIGGERED: {alert_data['emergency_id']}")
-        print(f"Type: {emergency_type}")
-        print(f"Message: {emergency_message}")
-        print(f"Timestamp: {alert_data['timestamp']}")
+        logger.info(
+            f"🚨 EMERGENCY ALERT TRIGGERED: {alert_data['emergency_id']} | Type: {emergency_type} | Message: {emergency_message}",
+            extra={'emergency_id': alert_data['emergency_id'], 'emergency_type': emergency_type}
+        )
         
         return alert_data
@@ -1,6 +1,10 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, make_response
+import functools
 import json
 import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
 import sys
 
@@ -8,26 +12,115 @@ import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from agents.emergency_coordinator import EmergencyCoordinator
+from agents.response_encoding import compress, dumps, negotiate_encoding
 
 app = Flask(__name__)
 
-# Initialize the emergency coordinator
-emergency_coordinator = EmergencyCoordinator()
+# Status stream: comment line sent while idle (keeps proxies from closing the
+# connection), and maximum connection age before the browser reconnects
+STATUS_STREAM_KEEPALIVE = 15
+STATUS_STREAM_MAX_AGE = 300
 
-# Store current emergency status
-current_emergency_status = {
-    'active': False,
-    'emergency_id': None,
-    'emergency_message': None,
-    'emergency_type': None,
-    'timestamp': None
-}
+# Conditional GET: serialized bodies kept per (URL, version) for clients without a cached copy
+RESPONSE_CACHE_SIZE = 256
+MIN_COMPRESS_SIZE = 1024
+ROSTER_MAX_AGE = 30  # seconds browsers may reuse roster responses before revalidating
+
+# Bulk student lookups
+STUDENTS_BATCH_MAX_GROUPS = 1000
+
+# Emergency history pagination
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 500
+
+# Initialize the emergency coordinator (wsgi.py sets EMERGENCY_SHARED_STATE=1 for multi-worker servers;
+# EMERGENCY_DATA_DIR moves students.csv and the databases out of data/)
+emergency_coordinator = EmergencyCoordinator(
+    shared=os.environ.get('EMERGENCY_SHARED_STATE') == '1',
+    data_dir=os.environ.get('EMERGENCY_DATA_DIR')
+)
+
+_response_cache = OrderedDict()
+_response_cache_lock = threading.Lock()
+
+def versioned(get_version, max_age=0):
+    """
+    Serve a read-only endpoint with a strong ETag derived from a data version
+    
+    Clients sending a matching If-None-Match get 304 Not Modified without the
+    view running. Otherwise the serialized body is reused from a small cache
+    keyed by URL and version, so the view only runs once per version. Bodies
+    of at least MIN_COMPRESS_SIZE bytes are compressed (brotli or gzip, as the
+    client accepts) once and cached compressed; each compressed
+    representation gets its own ETag.
+    
+    Args:
+        get_version: callable returning the current version tag of the data the view reads
+        max_age: seconds clients may reuse the response without revalidating (0 = always revalidate)
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = str(get_version())
+            # Any representation of the current version is still valid for the client
+            matched = next((tag for tag in (etag, f"{etag}-gzip", f"{etag}-br")
+                            if request.if_none_match.contains(tag)), None)
+            if matched is not None:
+                response = Response(status=304)
+                response.set_etag(matched)
+            else:
+                encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+                key = (request.full_path, etag, encoding)
+                with _response_cache_lock:
+                    cached = _response_cache.get(key)
+                    if cached is not None:
+                        _response_cache.move_to_end(key)
+                if cached is None:
+                    response = make_response(view(*args, **kwargs))
+                    # Data changed while the view ran: the body may be newer than the tag
+                    if response.status_code != 200 or str(get_version()) != etag:
+                        return response
+                    body = response.get_data()
+                    if encoding is not None and len(body) >= MIN_COMPRESS_SIZE:
+                        cached = (compress(body, encoding), response.mimetype, encoding)
+                    else:
+                        cached = (body, response.mimetype, None)
+                    with _response_cache_lock:
+                        _response_cache[key] = cached
+                        while len(_response_cache) > RESPONSE_CACHE_SIZE:
+                            _response_cache.popitem(last=False)
+                
+                body, mimetype, content_encoding = cached
+                response = Response(body, mimetype=mimetype)
+                if content_encoding is not None:
+                    response.headers['Content-Encoding'] = content_encoding
+                response.set_etag(f"{etag}-{content_encoding}" if content_encoding else etag)
+            
+            response.vary.add('Accept-Encoding')
+            if max_age:
+                response.cache_control.public = True
+                response.cache_control.max_age = max_age
+            else:
+                response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
+
+def json_response(payload, status=200):
+    """JSON response serialized with the fastest available encoder (orjson if installed)"""
+    return Response(dumps(payload), status=status, mimetype='application/json')
+
+def roster_version():
+    return emergency_coordinator.get_roster_tag()
+
+def emergency_status_version():
+    return f"status-{emergency_coordinator.get_current_emergency_version()}"
 
 @app.route('/')
 def dashboard():
     """Main dashboard page"""
     return render_template('dashboard.html', 
-                         emergency_status=current_emergency_status,
+                         emergency_status=emergency_coordinator.get_current_emergency(),
                          available_branches=emergency_coordinator.get_available_branches())
 
 @app.route('/api/emergency/trigger', methods=['POST'])
@@ -41,6 +134,8 @@ def trigger_emergency():
         branch = data.get('branch')
         section = data.get('section')
         selected_students = data.get('selected_students', [])  # List of student IDs who are safe (checked)
+        wait = data.get('wait', False)  # Block until all notifications are sent (scripts/CLI)
+        response_mode = data.get('response_mode', 'compact')  # 'full' embeds students and notifications
         
         # Validate input
         if emergency_type not in ['all', 'branch', 'section']:
@@ -52,35 +147,122 @@ def trigger_emergency():
         if emergency_type == 'section' and not section:
             return jsonify({'error': 'Section is required for section emergencies'}), 400
         
-        # Trigger emergency
-        response = emergency_coordinator.trigger_emergency(
-            emergency_type, emergency_message, branch, section, selected_students
-        )
+        # Trigger emergency: by default selection and notification run in the background
+        if wait:
+            response = emergency_coordinator.trigger_emergency(
+                emergency_type, emergency_message, branch, section, selected_students, response_mode
+            )
+        else:
+            response = emergency_coordinator.dispatch_emergency(
+                emergency_type, emergency_message, branch, section, selected_students
+            )
+            response['progress_url'] = f"/api/emergency/{response['emergency_id']}/progress"
         
-        # Update current emergency status
-        current_emergency_status.update({
-            'active': True,
-            'emergency_id': response['emergency_id'],
-            'emergency_message': emergency_message,
-            'emergency_type': emergency_type,
-            'timestamp': response['timestamp']
-        })
+        # Update current emergency status (shared by all server workers)
+        emergency_coordinator.set_current_emergency(
+            response['emergency_id'], emergency_type, emergency_message, response['timestamp']
+        )
         
-        return jsonify(response)
+        return jsonify(response), 200 if wait else 202
     
+    except ValueError as e:
+        # Invalid selected_students: rejected before an emergency ID is assigned
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/emergency/status')
+@versioned(emergency_status_version)
 def get_emergency_status():
     """Get current emergency status"""
-    return jsonify(current_emergency_status)
+    return jsonify(emergency_coordinator.get_current_emergency())
+
+@app.route('/api/emergency/stream')
+def stream_emergency_status():
+    """
+    Server-Sent Events stream of the current emergency status
+    
+    Sends the status on connect and again whenever it changes (from any
+    server worker). Browsers reconnect automatically and send Last-Event-ID,
+    so a reconnecting dashboard only receives a status it has not seen.
+    """
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    last_version = int(last_event_id) if last_event_id.isdigit() else 0
+    
+    def generate():
+        version = last_version
+        deadline = time.monotonic() + STATUS_STREAM_MAX_AGE
+        yield 'retry: 1000\n\n'
+        while time.monotonic() < deadline:
+            update = emergency_coordinator.wait_for_current_emergency(version, STATUS_STREAM_KEEPALIVE)
+            if update is None:
+                yield ': keepalive\n\n'
+                continue
+            status, version = update
+            yield f"id: {version}\nevent: status\ndata: {json.dumps(status)}\n\n"
+    
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/emergency/<emergency_id>')
+def get_emergency(emergency_id):
+    """Get a single emergency by ID (?detail=full includes every notification)"""
+    record = emergency_coordinator.get_emergency(emergency_id, request.args.get('detail') == 'full')
+    if record is None:
+        # Dispatched but still being processed: report its progress instead
+        progress = emergency_coordinator.get_emergency_progress(emergency_id)
+        if progress is None:
+            return jsonify({'error': 'Emergency not found'}), 404
+        return jsonify({'emergency_id': emergency_id, 'status': progress['status'], 'progress': progress})
+    return jsonify(record)
+
+@app.route('/api/emergency/<emergency_id>/progress')
+def get_emergency_progress(emergency_id):
+    """Get delivery progress (queued/sent/failed) for a dispatched emergency"""
+    progress = emergency_coordinator.get_emergency_progress(emergency_id)
+    if progress is None:
+        return jsonify({'error': 'Emergency not found'}), 404
+    return jsonify(progress)
 
 @app.route('/api/emergency/history')
 def get_emergency_history():
-    """Get emergency history"""
-    history = emergency_coordinator.get_emergency_history()
-    return jsonify(history)
+    """
+    Get emergency history, newest first
+    
+    Query parameters:
+        cursor: next_cursor from the previous page
+        limit: page size (1 to 500, default 50)
+        detail: 'full' to include affected students and notification bodies
+        format: 'ndjson' to stream one emergency per line instead of a JSON page
+    """
+    cursor = request.args.get('cursor')
+    detail = request.args.get('detail') == 'full'
+    limit = request.args.get('limit', type=int)
+    if limit is not None and limit < 1:
+        return jsonify({'error': 'limit must be at least 1'}), 400
+    
+    if request.args.get('format') == 'ndjson':
+        # Streams the whole history (or `limit` records) without building it in memory
+        lines = emergency_coordinator.iter_emergency_history_json(cursor, limit, detail)
+        try:
+            first = next(lines, None)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        def generate():
+            if first is not None:
+                yield first + '\n'
+                for line in lines:
+                    yield line + '\n'
+        
+        return Response(generate(), mimetype='application/x-ndjson')
+    
+    limit = min(limit or HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE)
+    try:
+        page = emergency_coordinator.get_emergency_history_page(cursor, limit, detail)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(page)
 
 @app.route('/api/notifications/recent')
 def get_recent_notifications():
@@ -88,43 +270,108 @@ def get_recent_notifications():
     notifications = emergency_coordinator.get_recent_notifications()
     return jsonify(notifications)
 
+@app.route('/api/notifications/stats')
+def get_notification_stats():
+    """Get notification counters (students notified, notifications rendered, sends saved)"""
+    return jsonify(emergency_coordinator.get_notification_stats())
+
+@app.route('/api/delivery/metrics')
+def get_delivery_metrics():
+    """Get delivery queue depth and wait times per priority lane, and rate-limit throttling"""
+    return jsonify(emergency_coordinator.get_delivery_metrics())
+
 @app.route('/api/branches')
+@versioned(roster_version, ROSTER_MAX_AGE)
 def get_branches():
     """Get available branches"""
     branches = emergency_coordinator.get_available_branches()
     return jsonify(branches)
 
 @app.route('/api/sections')
+@versioned(roster_version, ROSTER_MAX_AGE)
 def get_sections():
     """Get sections for a specific branch"""
     branch = request.args.get('branch')
     sections = emergency_coordinator.get_available_sections(branch)
     return jsonify(sections)
 
+@app.route('/api/catalog')
+@versioned(roster_version, ROSTER_MAX_AGE)
+def get_catalog():
+    """Get all branches with their sections and student counts in one response"""
+    return jsonify(emergency_coordinator.get_catalog())
+
 @app.route('/api/students')
+@versioned(roster_version, ROSTER_MAX_AGE)
 def get_students():
-    """Get students for a specific branch and section"""
+    """
+    Get students for a specific branch and section
+    
+    ?format=columnar returns parallel column arrays with dictionary-encoded
+    branch/section instead of one object per student.
+    """
     branch = request.args.get('branch')
     section = request.args.get('section')
     
     if not branch:
         return jsonify({'error': 'Branch is required'}), 400
     
+    if request.args.get('format') == 'columnar':
+        return json_response(emergency_coordinator.get_students_columnar(branch, section))
+    
     students = emergency_coordinator.get_students_for_branch_section(branch, section)
     return jsonify(students)
 
+@app.route('/api/students/batch')
+@versioned(roster_version, ROSTER_MAX_AGE)
+def get_students_batch():
+    """
+    Get every section of one or more branches in one columnar response
+    
+    Query parameters:
+        branch: branch name (repeat for several branches)
+        columns: comma-separated roster columns (default: student_id,name)
+    
+    Rows of all sections are concatenated in 'data', one list per column;
+    each entry of 'groups' gives a section's offset and count.
+    """
+    groups = [(branch, None) for branch in request.args.getlist('branch')]
+    columns = request.args.get('columns')
+    if not groups:
+        return jsonify({'error': 'At least one branch is required'}), 400
+    return _students_batch_response(groups, columns.split(',') if columns else None)
+
+@app.route('/api/students/batch', methods=['POST'])
+def post_students_batch():
+    """
+    Get explicit branch/section groups in one columnar response
+    
+    Body: {"groups": [{"branch": "CSE", "section": "A"}, ...], "columns": [...]}
+    A group without a section is split into the branch's sections.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        data = {}
+    groups = data.get('groups')
+    if not isinstance(groups, list) or not all(isinstance(group, dict) for group in groups):
+        return jsonify({'error': 'groups must be a list of {"branch", "section"} objects'}), 400
+    groups = [(group.get('branch'), group.get('section')) for group in groups]
+    if not groups or any(not branch for branch, _ in groups):
+        return jsonify({'error': 'Every group needs a branch'}), 400
+    if len(groups) > STUDENTS_BATCH_MAX_GROUPS:
+        return jsonify({'error': f'At most {STUDENTS_BATCH_MAX_GROUPS} groups per request'}), 400
+    return _students_batch_response(groups, data.get('columns'))
+
+def _students_batch_response(groups, columns):
+    try:
+        return json_response(emergency_coordinator.get_students_batch(groups, columns))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
 @app.route('/api/emergency/resolve', methods=['POST'])
 def resolve_emergency():
     """Resolve current emergency"""
-    global current_emergency_status
-    
-    current_emergency_status = {
-        'active': False,
-        'emergency_id': None,
-        'emergency_message': None,
-        'emergency_type': None,
-        'timestamp': None
-    }
+    emergency_coordinator.resolve_current_emergency()
     
     return jsonify({'status': 'emergency_resolved', 'message': 'Emergency status cleared'})
 
@@ -149,11 +396,12 @@ def send_status_update():
 def notifications_page():
     """Notifications page"""
     recent_notifications = emergency_coordinator.get_recent_notifications()
-    emergency_history = emergency_coordinator.get_emergency_history()
+    history_page = emergency_coordinator.get_emergency_history_page(limit=HISTORY_PAGE_SIZE)
     
     return render_template('notifications.html',
                          notifications=recent_notifications,
-                         emergency_history=emergency_history)
+                         emergency_history=history_page['emergencies'],
+                         total_emergencies=emergency_coordinator.count_emergencies())
 
 @app.route('/test')
 def test_page():
@@ -168,8 +416,13 @@ if __name__ == '__main__':
     print("🔧 API Documentation:")
     print("  - POST /api/emergency/trigger - Trigger emergency")
     print("  - GET /api/emergency/status - Get current status")
+    print("  - GET /api/emergency/stream - Stream status changes (Server-Sent Events)")
+    print("  - GET /api/emergency/<id> - Get a single emergency")
+    print("  - GET /api/emergency/<id>/progress - Get delivery progress")
     print("  - GET /api/emergency/history - Get emergency history")
     print("  - GET /api/notifications/recent - Get recent notifications")
+    print("  - GET /api/notifications/stats - Get notification counters")
+    print("  - GET /api/delivery/metrics - Get delivery queue metrics")
     print("  - POST /api/emergency/resolve - Resolve emergency")
     print("=" * 50)
     
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for safe-student exclusion
+Compares the list-comprehension/isin path over a full roster copy with the
+typed-ID exclusion applied to the roster index's target slice
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agents.agent_logging import configure_logging
+from agents.roster_index import RosterIndex
+from agents.selection_agent import SelectionAgent
+from benchmark_rendering import make_roster
+
+
+def exclude_per_element(students_data, filter_criteria):
+    """The original path: copy, boolean masks, then int() per safe ID and isin"""
+    filtered_students = students_data.copy()
+    if filter_criteria['emergency_type'] == 'branch':
+        filtered_students = filtered_students[filtered_students['branch'] == filter_criteria['branch']]
+    selected_students = [int(sid) if isinstance(sid, str) else sid for sid in filter_criteria['selected_students']]
+    return filtered_students[~filtered_students['student_id'].isin(selected_students)]
+
+
+def best_of(repeat, func, *args):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--roster-sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--safe-sizes', type=int, nargs='+', default=[100, 10_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    configure_logging(level='WARNING')
+    agent = SelectionAgent()
+    rng = np.random.default_rng(1)
+
+    print(f"{'roster':>10} {'safe':>8} {'target':>8} {'per-element (ms)':>17} {'typed (ms)':>11} {'speedup':>8}")
+    for roster_size in args.roster_sizes:
+        roster = make_roster(roster_size)
+        index = RosterIndex(roster.copy())
+        target_ids = roster.loc[roster['branch'] == 'CSE', 'student_id'].to_numpy()
+
+        for safe_size in args.safe_sizes:
+            if safe_size > len(target_ids):
+                continue
+            # The dashboard sends the checked IDs as strings
+            safe_ids = [str(sid) for sid in rng.choice(target_ids, safe_size, replace=False)]
+            criteria = {'emergency_type': 'branch', 'branch': 'CSE', 'section': None, 'selected_students': safe_ids}
+
+            old_time, old = best_of(args.repeat, exclude_per_element, roster, criteria)
+            new_time, new = best_of(args.repeat, agent.filter_students, index.students_data, criteria, index)
+            assert old['student_id'].tolist() == new['student_id'].tolist()
+
+            print(f"{roster_size:>10,} {safe_size:>8,} {len(new):>8,} {old_time * 1000:17.2f} "
+                  f"{new_time * 1000:11.2f} {old_time / new_time:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
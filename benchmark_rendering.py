@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Benchmark for notification rendering
+Compares the per-row iterrows/f-string path with the vectorized batch renderer,
+and times the per-guardian (coalescing) renderer that production uses
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agents.notification_renderer import NotificationRenderer
+
+
+def make_roster(size, sibling_share=0.0, seed=0):
+    """
+    Build a synthetic roster with the same columns as data/students.csv
+
+    A `sibling_share` of the students share their parent email with the
+    student before them.
+    """
+    rng = np.random.default_rng(seed)
+    student_ids = np.arange(100000, 100000 + size)
+    guardians = np.cumsum(rng.random(size) >= sibling_share)
+    return pd.DataFrame({
+        'student_id': student_ids,
+        'name': [f"Student {sid}" for sid in student_ids],
+        'branch': pd.Categorical(rng.choice(['CSE', 'ECE', 'MECH', 'CIVIL'], size)),
+        'section': pd.Categorical(rng.choice(['A', 'B', 'C'], size)),
+        'parent_email': [f"parent.{guardian}@email.com" for guardian in guardians]
+    })
+
+
+def render_per_row(alert_data, affected_students):
+    """The original rendering path: iterrows plus one f-string and two strftime calls per row"""
+    notifications = []
+    for _, student in affected_students.iterrows():
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        subject = f"URGENT: Emergency Alert - {alert_data['emergency_id']}"
+        message = f"""
+Dear Parent/Guardian of {student['name']},
+
+URGENT EMERGENCY NOTIFICATION
+
+Emergency ID: {alert_data['emergency_id']}
+Time: {timestamp}
+Student: {student['name']} (ID: {student['student_id']})
+Branch/Section: {student['branch']}-{student['section']}
+
+EMERGENCY DETAILS:
+{alert_data['emergency_message']}
+
+PLEASE TAKE IMMEDIATE ACTION:
+- Ensure your child's safety
+- Follow official emergency procedures
+- Stay tuned for further updates
+- Contact the school if you have any concerns
+
+This is an automated emergency notification system.
+Please do not reply to this email.
+
+School Emergency Communication System
+Generated at: {timestamp}
+
+---
+This message was sent to all parents of affected students.
+        """.strip()
+        notifications.append({
+            'student_id': student['student_id'],
+            'parent_email': student['parent_email'],
+            'subject': subject,
+            'message': message,
+            'timestamp': timestamp,
+            'status': 'sent'
+        })
+    return notifications
+
+
+def time_call(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help='number of recipients to render')
+    parser.add_argument('--max-per-row', type=int, default=1_000_000,
+                        help='skip the (slow) per-row path above this many recipients')
+    parser.add_argument('--sibling-share', type=float, default=0.2,
+                        help='share of students whose parent also has an earlier student (for the per-guardian renderer)')
+    args = parser.parse_args()
+
+    alert_data = {
+        'emergency_id': 'EMRG_BENCHMARK',
+        'emergency_message': 'FIRE DRILL: Please evacuate the building immediately.'
+    }
+    renderer = NotificationRenderer()
+
+    print(f"{'recipients':>12} {'per-row (s)':>12} {'batch (s)':>10} {'speedup':>8} {'batch msg/s':>12} "
+          f"{'guardian (s)':>13} {'guardian msgs':>14} {'students/s':>12}")
+    for size in args.sizes:
+        roster = make_roster(size, args.sibling_share)
+
+        batch_time, batch = time_call(renderer.render, alert_data, roster)
+        assert len(batch) == size
+
+        if size <= args.max_per_row:
+            per_row_time, per_row = time_call(render_per_row, alert_data, roster)
+            # Both paths must produce the same text for the same timestamp
+            assert per_row[0]['message'].replace(per_row[0]['timestamp'], batch[0]['timestamp']) == batch[0]['message']
+            per_row_text = f"{per_row_time:12.3f}"
+            speedup_text = f"{per_row_time / batch_time:7.1f}x"
+        else:
+            per_row_text = f"{'skipped':>12}"
+            speedup_text = f"{'-':>8}"
+
+        # Production renders one notification per guardian (NotificationAgent with coalesce=True)
+        guardian_time, by_guardian = time_call(renderer.render_by_guardian, alert_data, roster)
+        assert sum(len(notification['student_ids']) for notification in by_guardian) == size
+
+        print(f"{size:>12,} {per_row_text} {batch_time:10.3f} {speedup_text} {size / batch_time:12,.0f} "
+              f"{guardian_time:13.3f} {len(by_guardian):14,} {size / guardian_time:12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
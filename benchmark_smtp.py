@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark for SMTP delivery
+Compares a connection per message (SMTPTransport) with pooled, pipelined
+sessions (PooledSMTPTransport) at several pool sizes against the local
+FakeSMTPServer
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agents.delivery_engine import DeliveryEngine, SMTPTransport
+from agents.fake_smtp import FakeSMTPServer
+from agents.smtp_pool import PooledSMTPTransport
+
+
+def make_notifications(count):
+    """Build notifications shaped like the renderer's output"""
+    return [
+        {
+            'student_id': 100000 + i,
+            'parent_email': f"parent.{100000 + i}@email.com",
+            'subject': 'URGENT: Emergency Alert - EMRG_BENCHMARK',
+            'message': f"Dear Parent/Guardian of Student {100000 + i},\n\nFIRE DRILL: Please evacuate the building immediately.\n"
+        }
+        for i in range(count)
+    ]
+
+
+def run(transport, concurrency, notifications, delay):
+    """Deliver every notification through transport; returns (seconds, sent, server connections)"""
+    with FakeSMTPServer(delay=delay) as server:
+        transport.port = server.port
+        engine = DeliveryEngine(transport, concurrency=concurrency, max_retries=0)
+        try:
+            started = time.perf_counter()
+            results = engine.deliver(notifications)
+            elapsed = time.perf_counter() - started
+        finally:
+            engine.close()
+        sent = sum(1 for result in results if result['status'] == 'sent')
+        assert len(server.messages) == sent
+        return elapsed, sent, server.connections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=2000, help='notifications to deliver per run')
+    parser.add_argument('--pool-sizes', type=int, nargs='+', default=[1, 4, 16, 64],
+                        help='pooled transport sizes to compare')
+    parser.add_argument('--concurrency', type=int, default=16,
+                        help='concurrency of the connection-per-message baseline')
+    parser.add_argument('--delay', type=float, default=0.0,
+                        help='seconds the server waits before accepting each message (simulates a slow provider)')
+    args = parser.parse_args()
+
+    notifications = make_notifications(args.messages)
+
+    print(f"{'transport':>24} {'seconds':>8} {'sent':>7} {'connections':>12} {'msg/s':>9}")
+    runs = [(f"per-message x{args.concurrency}", SMTPTransport(host='127.0.0.1', max_workers=args.concurrency),
+             args.concurrency)]
+    runs += [(f"pooled x{size}", PooledSMTPTransport(host='127.0.0.1', pool_size=size), size)
+             for size in args.pool_sizes]
+    for label, transport, concurrency in runs:
+        elapsed, sent, connections = run(transport, concurrency, notifications, args.delay)
+        print(f"{label:>24} {elapsed:8.2f} {sent:7,} {connections:12,} {sent / elapsed:9,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+
+FORMAT_VERSION = 2
+
+# File naming the version directory readers load
+CURRENT_FILE = 'CURRENT'
+
+
+def compiled_path_for(csv_path):
+    """Default location of the compiled roster for a CSV file"""
+    return f"{os.path.splitext(csv_path)[0]}.roster"
+
+
+def csv_signature(csv_path):
+    """(mtime, size) of the CSV file the compiled roster is checked against"""
+    stat = os.stat(csv_path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def compile_roster(students_df, csv_path, compiled_path=None):
+    """
+    Write a parsed roster in the compiled format
+
+    Every compile writes a new version directory inside the compiled roster
+    directory, with one .npy file per column and a meta.json recording the
+    column types and the size and modification time of the CSV it was built
+    from. The CURRENT file, replaced atomically once the version is complete,
+    names the version readers load. Files that other processes may still have
+    memory-mapped are never replaced or moved; old versions are deleted by
+    retire_compiled_versions. Numeric columns are stored as-is, categorical
+    columns (branch and section, see roster_loader) as integer codes plus
+    their categories, and other text columns as fixed-width strings, so no
+    column has to be parsed. The CSV stays the source of truth: a compiled
+    roster that does not match it is ignored.
+
+    Args:
+        students_df: roster DataFrame parsed from csv_path
+        csv_path: CSV file the roster was read from
+        compiled_path: output directory (default: next to the CSV, see compiled_path_for)
+
+    Returns:
+        str: Path of the compiled roster
+    """
+    compiled_path = compiled_path or compiled_path_for(csv_path)
+    # Signature first: if the CSV changes while we write, the result is simply stale
+    mtime_ns, size = csv_signature(csv_path)
+    # Names sort by creation time, so versions newer than the current one (being written) are never retired
+    version = f"v{time.time_ns():020d}-{os.getpid()}"
+    staging = os.path.join(compiled_path, version)
+    os.makedirs(staging)
+
+    columns = []
+    for position, name in enumerate(students_df.columns):
+        column = {'name': name, 'file': f"{position}.npy"}
+        values, column['kind'] = _encode_column(students_df[name], column)
+        np.save(os.path.join(staging, column['file']), values, allow_pickle=False)
+        columns.append(column)
+
+    meta = {
+        'format_version': FORMAT_VERSION,
+        'source': {'mtime_ns': mtime_ns, 'size': size},
+        'rows': len(students_df),
+        'columns': columns
+    }
+    with open(os.path.join(staging, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    # Point readers at the complete version, so they see the old or the new roster, never a partial one
+    pointer = os.path.join(compiled_path, f"{CURRENT_FILE}.tmp-{os.getpid()}")
+    with open(pointer, 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(pointer, os.path.join(compiled_path, CURRENT_FILE))
+    return compiled_path
+
+
+def retire_compiled_versions(csv_path, compiled_path=None):
+    """
+    Delete the compiled versions older than the current one
+
+    Call once the roster loaded from the current version has been swapped in.
+    Versions still memory-mapped by an older snapshot are deleted on POSIX
+    systems (the mappings stay valid); where open files cannot be deleted,
+    as on Windows, they are left in place and retried on the next call.
+
+    Returns:
+        int: Number of old versions deleted
+    """
+    compiled_path = compiled_path or compiled_path_for(csv_path)
+    current = _current_version(compiled_path)
+    if current is None:
+        return 0
+    try:
+        names = os.listdir(compiled_path)
+    except OSError:
+        return 0
+    retired = 0
+    for name in names:
+        path = os.path.join(compiled_path, name)
+        if name.startswith('v') and os.path.isdir(path):
+            if name < current:
+                shutil.rmtree(path, ignore_errors=True)
+                retired += not os.path.exists(path)
+        elif name != CURRENT_FILE and not name.startswith(f"{CURRENT_FILE}.tmp-") and os.path.isfile(path):
+            # Left by the unversioned format 1 layout
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    return retired
+
+
+def load_compiled_roster(csv_path, compiled_path=None):
+    """
+    Load the compiled roster for a CSV file, if it is up to date
+
+    Numeric columns and the codes of categorical columns stay read-only
+    memory maps of the .npy files, so processes loading the same roster share
+    those pages through the OS page cache. Categories and the remaining text
+    columns are decoded into Python strings by every process.
+
+    Args:
+        csv_path: CSV file the roster should match
+        compiled_path: compiled roster directory (default: see compiled_path_for)
+
+    Returns:
+        DataFrame or None: The roster, or None if there is no compiled roster or it
+            was built from a different version of the CSV
+    """
+    compiled_path = compiled_path or compiled_path_for(csv_path)
+    version = _current_version(compiled_path)
+    if version is None:
+        return None
+    version_path = os.path.join(compiled_path, version)
+    try:
+        with open(os.path.join(version_path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        mtime_ns, size = csv_signature(csv_path)
+    except (OSError, ValueError):
+        return None
+
+    if (meta.get('format_version') != FORMAT_VERSION
+            or meta['source'] != {'mtime_ns': mtime_ns, 'size': size}):
+        return None
+
+    data = {}
+    try:
+        for column in meta['columns']:
+            values = np.load(os.path.join(version_path, column['file']), mmap_mode='r', allow_pickle=False)
+            data[column['name']] = _decode_column(values, column)
+    except (OSError, ValueError):
+        # Retired by another process's compile between reading CURRENT and mapping the columns
+        return None
+    # copy=False keeps one block per column, backed by its memory map
+    return pd.DataFrame(data, columns=[column['name'] for column in meta['columns']], copy=False)
+
+
+def _current_version(compiled_path):
+    """Name of the version directory CURRENT points to, or None"""
+    try:
+        with open(os.path.join(compiled_path, CURRENT_FILE), encoding='utf-8') as f:
+            version = f.read().strip()
+    except OSError:
+        return None
+    return version or None
+
+
+def _encode_column(series, column):
+    """Convert a column to an array np.save can write without pickling"""
+    if series.dtype.kind in 'biuf':
+        return series.to_numpy(), 'numeric'
+
+    # Only columns the CSV loader made categorical, so a compiled load has the same dtypes as a CSV load
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        column['categories'] = series.cat.categories.tolist()
+        return series.cat.codes.to_numpy(), 'category'
+
+    # Missing text is kept as a list of row positions next to the values
+    missing = series.isna().to_numpy()
+    column['missing'] = np.flatnonzero(missing).tolist()
+    return series.fillna('').astype(str).to_numpy(dtype=str), 'text'
+
+
+def _decode_column(values, column):
+    if column['kind'] == 'numeric':
+        return values
+    if column['kind'] == 'category':
+        return pd.Categorical.from_codes(values, categories=column['categories'])
+
+    text = values.astype(object)
+    if column['missing']:
+        text[column['missing']] = np.nan
+    return text
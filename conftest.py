@@ -0,0 +1,43 @@
+"""
+Test setup shared by every test module
+
+The agent modules import each other relatively (from .agent_logging import
+...), so they only work as members of the `agents` package. When this
+directory holds the modules themselves rather than an agents/ folder, it is
+registered as that package, so tests import `agents.<module>` in either layout.
+Fixtures used by several test modules live here too.
+"""
+
+import importlib.util
+import os
+import shutil
+import sys
+
+import pytest
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+if 'agents' not in sys.modules and not os.path.isdir(os.path.join(PROJECT_DIR, 'agents')):
+    _spec = importlib.util.spec_from_file_location(
+        'agents', os.path.join(PROJECT_DIR, '__init__.py'), submodule_search_locations=[PROJECT_DIR]
+    )
+    _agents = importlib.util.module_from_spec(_spec)
+    sys.modules['agents'] = _agents
+    _spec.loader.exec_module(_agents)
+
+if PROJECT_DIR not in sys.path:
+    sys.path.append(PROJECT_DIR)
+
+
+def copy_sample_roster(directory):
+    """Copy the sample roster (data/students.csv) into directory, skipping the test if it is missing"""
+    for source in (os.path.join(PROJECT_DIR, 'data', 'students.csv'), os.path.join(PROJECT_DIR, 'students.csv')):
+        if os.path.exists(source):
+            return shutil.copy(source, os.path.join(directory, 'students.csv'))
+    pytest.skip('sample roster data/students.csv not found')
+
+
+@pytest.fixture
+def students_csv(tmp_path):
+    """A private copy of the sample roster, so tests may rewrite it and compile it next to it"""
+    return copy_sample_roster(tmp_path)
@@ -0,0 +1,429 @@
+import asyncio
+import itertools
+import logging
+import random
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+
+from .agent_logging import get_logger
+
+logger = get_logger('delivery')
+
+# Delivery lanes: a lower number is sent first
+PRIORITY_ALERT = 0   # initial alerts for a branch, section or selected students
+PRIORITY_BULK = 1    # initial alerts for the whole school
+PRIORITY_STATUS = 2  # status updates for an emergency already notified
+LANES = {PRIORITY_ALERT: 'alert', PRIORITY_BULK: 'bulk', PRIORITY_STATUS: 'status'}
+
+
+def build_email(notification, sender):
+    """Build the EmailMessage for a notification"""
+    message = EmailMessage()
+    message['From'] = sender
+    message['To'] = notification['parent_email']
+    message['Subject'] = notification['subject']
+    if notification.get('idempotency_key'):
+        # Stable across resends, so a duplicate delivery after a crash can be recognized
+        domain = sender.partition('@')[2] or 'localhost'
+        message['Message-ID'] = f"<{notification['idempotency_key'].replace('/', '.')}@{domain}>"
+    message.set_content(notification['message'])
+    return message
+
+
+class ConsoleTransport:
+    """Simulated transport that logs each email (visible at DEBUG level, sampled)"""
+
+    name = 'console'
+
+    async def send(self, notification):
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                f"📨 EMAIL SENT:\n"
+                f"To: {notification['parent_email']}\n"
+                f"Subject: {notification['subject']}\n"
+                f"Message: {notification['message']}\n"
+                f"Student: {notification.get('student_name')} ({notification['student_id']})\n"
+                f"Branch/Section: {notification.get('branch')}-{notification.get('section')}",
+                extra={'sampled': True, 'parent_email': notification['parent_email']}
+            )
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter for the delivery engine's event loop.
+
+    Holds up to `burst` tokens and refills at `rate` tokens per second; each
+    send attempt takes one token.
+    """
+
+    def __init__(self, rate, burst=None):
+        """
+        Args:
+            rate: sustained sends per second
+            burst: sends allowed back to back after an idle period (default: one second's worth)
+        """
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1.0, self.rate))
+        self.tokens = self.burst
+        self._updated = time.monotonic()
+
+    def delay(self):
+        """Seconds until a token is available (0 if one is available now)"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    async def wait(self):
+        """Wait until a token is available, without taking it; returns the seconds waited"""
+        waited = 0.0
+        delay = self.delay()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            waited += delay
+            delay = self.delay()
+        return waited
+
+    def take(self):
+        self.tokens -= 1
+
+    async def acquire(self):
+        """Wait for a token and take it; returns the seconds waited"""
+        waited = await self.wait()
+        self.take()
+        return waited
+
+
+class SharedTokenBucket(TokenBucket):
+    """
+    Token bucket whose tokens live in a SharedStateStore.
+
+    Every engine drawing from the same store and bucket name shares one
+    budget, so several server worker processes sending through one provider
+    stay under its rate limit together.
+    """
+
+    def __init__(self, store, name, rate, burst=None):
+        """
+        Args:
+            store: SharedStateStore holding the bucket
+            name: bucket name; engines using the same name share its tokens
+            rate: sustained sends per second, across every engine
+            burst: sends allowed back to back after an idle period (default: one second's worth)
+        """
+        super().__init__(rate, burst)
+        self.store = store
+        self.name = name
+
+    def delay(self):
+        """Seconds until a token is available (0 if one is available now)"""
+        self.tokens = self.store.bucket_tokens(self.name, self.rate, self.burst)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens = self.store.take_token(self.name, self.rate, self.burst)
+
+
+class SMTPTransport:
+    """
+    Transport that delivers notifications through an SMTP server.
+
+    smtplib is blocking, so every send runs on a dedicated thread pool; size
+    it to match the engine's concurrency.
+    """
+
+    name = 'smtp'
+
+    def __init__(self, host='localhost', port=25, sender='emergency@school.local',
+                 timeout=10.0, max_workers=50, rate_limit=None):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.timeout = timeout
+        # Provider's messages-per-second cap, enforced by the DeliveryEngine
+        self.rate_limit = rate_limit
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='smtp')
+
+    def build_message(self, notification):
+        """Build the EmailMessage for a notification"""
+        return build_email(notification, self.sender)
+
+    async def send(self, notification):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._send_sync, notification)
+
+    def _send_sync(self, notification):
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            smtp.send_message(self.build_message(notification))
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class DeliveryEngine:
+    """
+    Concurrent notification delivery engine.
+
+    Runs a long-lived asyncio event loop on a background thread with a fixed
+    pool of worker coroutines, so throughput scales with `concurrency` rather
+    than with the number of recipients. Each send is bounded by a per-recipient
+    timeout and transient failures are retried with exponential backoff and
+    jitter. The transport is pluggable: anything with an async
+    `send(notification)` method works; an optional async `aclose()` is
+    awaited on the engine's loop when the engine closes.
+
+    Queued notifications wait in priority lanes (see LANES) and workers
+    always take from the most urgent non-empty lane. With a rate limit (the
+    engine's, or the transport's `rate_limit` attribute), every send attempt,
+    retries included, takes a token from a token bucket, and a worker only
+    picks its next notification once a token is available, so an urgent
+    notification never waits behind less urgent ones held back by the limit.
+    With a `rate_limit_store`, the bucket lives in that SharedStateStore and
+    the limit holds for every engine (in any process) using the same store and
+    `rate_limit_key` together.
+    """
+
+    def __init__(self, transport=None, concurrency=50, timeout=10.0, max_retries=3,
+                 backoff=0.5, max_backoff=8.0, rate_limit=None, burst=None,
+                 rate_limit_store=None, rate_limit_key='delivery'):
+        """
+        Args:
+            transport: object with an async send(notification) method (default: ConsoleTransport)
+            concurrency: number of notifications in flight at once
+            timeout: seconds allowed for a single send attempt
+            max_retries: extra attempts after the first failure
+            backoff: base delay in seconds before the first retry (doubles each retry)
+            max_backoff: cap for the retry delay
+            rate_limit: maximum sends per second (default: the transport's rate_limit, else unlimited)
+            burst: sends allowed back to back after an idle period (default: one second's worth)
+            rate_limit_store: optional SharedStateStore to share the rate limit through
+            rate_limit_key: name of the shared bucket; engines using the same name share one limit
+        """
+        self.transport = transport or ConsoleTransport()
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        if rate_limit is None:
+            rate_limit = getattr(self.transport, 'rate_limit', None)
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self.rate_limit_store = rate_limit_store
+        self.rate_limit_key = rate_limit_key
+
+        self._loop = None
+        self._thread = None
+        self._queue = None
+        self._bucket = None
+        self._token_lock = None
+        self._sequence = itertools.count()
+        self._workers = []
+        self._start_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._in_flight = 0
+        self._throttled = 0.0
+        self._lanes = {
+            lane: {'queued': 0, 'dequeued': 0, 'total_wait': 0.0, 'max_wait': 0.0}
+            for lane in LANES.values()
+        }
+
+    def deliver(self, notifications, on_result=None, priority=PRIORITY_ALERT):
+        """
+        Deliver notifications and block until every one has succeeded or failed
+
+        Args:
+            notifications: list of notification dicts
+            on_result: optional callback(notification, result) invoked as each delivery finishes
+            priority: delivery lane (PRIORITY_ALERT, PRIORITY_BULK or PRIORITY_STATUS)
+
+        Returns:
+            list: One result dict per notification, in input order
+        """
+        return self.submit(notifications, on_result, priority).result()
+
+    def submit(self, notifications, on_result=None, priority=PRIORITY_ALERT):
+        """Queue notifications for delivery and return a concurrent.futures.Future of the results"""
+        if priority not in LANES:
+            raise ValueError(f"Unknown delivery priority: {priority}")
+        self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(
+            self._deliver_batch(list(notifications), on_result, priority), self._loop
+        )
+
+    def metrics(self):
+        """
+        Queue and throughput metrics
+
+        Returns:
+            dict: rate limit, notifications in flight, seconds spent waiting for
+                rate-limit tokens, and per lane the queue depth plus the count,
+                mean and max of the time notifications waited in the queue
+        """
+        with self._metrics_lock:
+            lanes = {}
+            for lane, stats in self._lanes.items():
+                lanes[lane] = {
+                    'queued': stats['queued'],
+                    'dequeued': stats['dequeued'],
+                    'wait_avg': stats['total_wait'] / stats['dequeued'] if stats['dequeued'] else 0.0,
+                    'wait_max': stats['max_wait']
+                }
+            return {
+                'rate_limit': self.rate_limit,
+                'in_flight': self._in_flight,
+                'throttled_seconds': self._throttled,
+                'lanes': lanes
+            }
+
+    def close(self):
+        """Stop the workers and the background event loop"""
+        if self._loop is None:
+            return
+
+        async def shutdown():
+            for worker in self._workers:
+                worker.cancel()
+            await asyncio.gather(*self._workers, return_exceptions=True)
+            if hasattr(self.transport, 'aclose'):
+                await self.transport.aclose()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+        if hasattr(self.transport, 'close'):
+            self.transport.close()
+
+    def _ensure_started(self):
+        """Start the event loop thread and worker pool on first use"""
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            ready = threading.Event()
+            self._loop = asyncio.new_event_loop()
+
+            def run():
+                asyncio.set_event_loop(self._loop)
+                self._queue = asyncio.PriorityQueue()
+                if self.rate_limit and self.rate_limit_store is not None:
+                    self._bucket = SharedTokenBucket(
+                        self.rate_limit_store, self.rate_limit_key, self.rate_limit, self.burst
+                    )
+                elif self.rate_limit:
+                    self._bucket = TokenBucket(self.rate_limit, self.burst)
+                if self._bucket is not None:
+                    self._token_lock = asyncio.Lock()
+                self._workers = [
+                    self._loop.create_task(self._worker()) for _ in range(self.concurrency)
+                ]
+                ready.set()
+                self._loop.run_forever()
+
+            self._thread = threading.Thread(target=run, name='delivery-engine', daemon=True)
+            self._thread.start()
+            ready.wait()
+
+    async def _deliver_batch(self, notifications, on_result, priority):
+        """Enqueue a batch and wait for all of its deliveries"""
+        loop = asyncio.get_running_loop()
+        futures = []
+        enqueued_at = time.monotonic()
+        for notification in notifications:
+            future = loop.create_future()
+            futures.append(future)
+            # The sequence number keeps each lane first-in first-out
+            self._queue.put_nowait((priority, next(self._sequence), enqueued_at, notification, future, on_result))
+        with self._metrics_lock:
+            self._lanes[LANES[priority]]['queued'] += len(notifications)
+        return list(await asyncio.gather(*futures))
+
+    async def _next(self):
+        """Take the most urgent queued notification, once the rate limit allows a send"""
+        if self._bucket is None:
+            item = await self._queue.get()
+        else:
+            async with self._token_lock:
+                # Wait for the token before choosing, so the choice reflects the latest arrivals
+                waited = await self._bucket.wait()
+                item = await self._queue.get()
+                # Retries and other processes may have taken the token while the lanes were empty
+                waited += await self._bucket.wait()
+                self._bucket.take()
+            with self._metrics_lock:
+                self._throttled += waited
+
+        priority, _, enqueued_at, *_ = item
+        wait = time.monotonic() - enqueued_at
+        with self._metrics_lock:
+            stats = self._lanes[LANES[priority]]
+            stats['queued'] -= 1
+            stats['dequeued'] += 1
+            stats['total_wait'] += wait
+            stats['max_wait'] = max(stats['max_wait'], wait)
+            self._in_flight += 1
+        return item
+
+    async def _throttle(self):
+        """Take a token for a retry attempt"""
+        if self._bucket is None:
+            return
+        # Not under the token lock: its holder may be waiting for new notifications
+        waited = await self._bucket.acquire()
+        with self._metrics_lock:
+            self._throttled += waited
+
+    async def _worker(self):
+        """Pull notifications off the queue and deliver them one at a time"""
+        while True:
+            _, _, _, notification, future, on_result = await self._next()
+            try:
+                result = await self._deliver_one(notification)
+                if on_result is not None:
+                    on_result(notification, result)
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                with self._metrics_lock:
+                    self._in_flight -= 1
+                self._queue.task_done()
+
+    async def _deliver_one(self, notification):
+        """Send one notification with timeout and retry"""
+        started = time.perf_counter()
+        error = None
+        for attempt in range(1, self.max_retries + 2):
+            try:
+                if attempt > 1:
+                    # The first attempt's token was taken when the notification was dequeued
+                    await self._throttle()
+                await asyncio.wait_for(self.transport.send(notification), self.timeout)
+                return {
+                    'status': 'sent',
+                    'attempts': attempt,
+                    'elapsed': time.perf_counter() - started
+                }
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = 'timeout' if isinstance(e, asyncio.TimeoutError) else str(e)
+                if attempt <= self.max_retries:
+                    await asyncio.sleep(self._retry_delay(attempt))
+
+        return {
+            'status': 'failed',
+            'attempts': self.max_retries + 1,
+            'elapsed': time.perf_counter() - started,
+            'error': error
+        }
+
+    def _retry_delay(self, attempt):
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** (attempt - 1))))
@@ -1,93 +1,255 @@
+import numpy as np
 import pandas as pd
 from datetime import datetime
 import json
 import os
 
+from .agent_logging import get_logger
 from .alert_agent import AlertAgent
 from .selection_agent import SelectionAgent
+from .delivery_engine import PRIORITY_ALERT, PRIORITY_BULK
 from .notification_agent import NotificationAgent
+from .roster_index import parse_student_ids
+from .roster_manager import RosterManager
+from .emergency_jobs import EmergencyDispatcher
+from .history_store import HistoryStore
+from .outbox import Outbox
+from .shared_state import SharedStateStore
+from .status_broadcaster import StatusBroadcaster
+
+logger = get_logger('coordinator')
 
 class EmergencyCoordinator:
-    def __init__(self):
+    IDLE_STATUS = {
+        'active': False,
+        'emergency_id': None,
+        'emergency_message': None,
+        'emergency_type': None,
+        'timestamp': None
+    }
+    
+    # Columns returned by get_students_batch unless others are requested
+    BATCH_COLUMNS = ('student_id', 'name')
+    
+    def __init__(self, delivery_engine=None, history_path=None, roster_path=None, roster_poll_interval=2.0,
+                 state_path=None, shared=False, outbox_path=None, data_dir=None):
+        """
+        Args:
+            delivery_engine: DeliveryEngine used for notifications (default: console transport)
+            history_path: emergency history database (default: data/history.db)
+            roster_path: students CSV (default: data/students.csv)
+            roster_poll_interval: seconds between roster change checks
+            state_path: shared state database (default: data/state.db)
+            shared: several server worker processes run a coordinator over the same data files
+            outbox_path: durable delivery outbox database (default: data/outbox.db)
+            data_dir: directory holding the default data files (default: the project's data/ directory)
+        """
+        data_dir = data_dir or os.path.join(os.path.dirname(__file__), '..', 'data')
+        # Every recipient's delivery state, so deliveries interrupted by a crash are resumed
+        self.outbox = Outbox(outbox_path or os.path.join(data_dir, 'outbox.db'), on_orphans=self._resume_orphans)
+        
         self.alert_agent = AlertAgent()
         self.selection_agent = SelectionAgent()
-        self.notification_agent = NotificationAgent()
+        self.notification_agent = NotificationAgent(delivery_engine, outbox=self.outbox)
         
-        # Initialize emergency history storage
-        self.emergency_history = []
-        self.notifications_history = []
+        # Current emergency status and (for multiple workers) job progress, visible to every worker
+        self.shared_state = SharedStateStore(state_path or os.path.join(data_dir, 'state.db'))
+        # Workers sending through one provider share its rate limit instead of each sending at the full rate
+        delivery_engine = self.notification_agent.delivery_engine
+        if shared and delivery_engine.rate_limit_store is None:
+            delivery_engine.rate_limit_store = self.shared_state
+        # Pushes current emergency status changes to dashboards (see stream_current_emergency)
+        self.status_broadcaster = StatusBroadcaster(self.shared_state, 'current_emergency', dict(self.IDLE_STATUS))
         
-        # Load students data
-        self.students_data = self._load_students_data()
+        # Background executor for non-blocking emergency dispatch
+        self.dispatcher = EmergencyDispatcher(progress_store=self.shared_state if shared else None)
+        
+        # Initialize durable emergency/notification history storage
+        if history_path is None:
+            history_path = os.path.join(data_dir, 'history.db')
+        self.history_store = HistoryStore(history_path, shared=shared)
+        
+        # Load students data and keep it in sync with the CSV (reloaded when the file changes);
+        # workers share the pages of the compiled roster's numeric columns and category codes
+        # through the OS page cache, while names and emails are loaded by each worker
+        if roster_path is None:
+            roster_path = os.path.join(data_dir, 'students.csv')
+        self.roster = RosterManager(roster_path, poll_interval=roster_poll_interval)
+        self.roster.start()
+        
+        # Adopts emergencies left unfinished by a stopped process once their lease expires
+        self.outbox.start()
     
-    def _load_students_data(self):
-        """Load students data from CSV file"""
-        try:
-            csv_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'students.csv')
-            students_df = pd.read_csv(csv_path)
-            print(f"✅ Loaded {len(students_df)} students from dataset")
-            return students_df
-        except Exception as e:
-            print(f"❌ Error loading students data: {e}")
-            return pd.DataFrame()
+    @property
+    def students_data(self):
+        """Students DataFrame of the current roster snapshot"""
+        return self.roster.snapshot.students_data
+    
+    @property
+    def roster_index(self):
+        """Branch/section index of the current roster snapshot"""
+        return self.roster.snapshot.roster_index
     
-    def trigger_emergency(self, emergency_type, emergency_message, branch=None, section=None, selected_students=None):
+    def trigger_emergency(self, emergency_type, emergency_message, branch=None, section=None, selected_students=None,
+                          response_mode='compact'):
         """
         Main method to trigger emergency and coordinate all agents
         
+        Runs the whole pipeline synchronously; use dispatch_emergency to return
+        immediately and process the emergency in the background.
+        
         Args:
             emergency_type: 'all', 'branch', or 'section'
             emergency_message: Description of the emergency
             branch: Branch name (required for branch/section emergencies)
             section: Section name (required for section emergencies)
             selected_students: List of student IDs who are safe (checked) - alerts will be sent to unchecked students
+            response_mode: 'compact' returns IDs and counts (details are stored once and
+                served by get_emergency); 'full' also embeds the affected students and notifications
         
         Returns:
-            dict: Complete emergency response details
-        """
-        print(f"\n🚨 INITIATING EMERGENCY RESPONSE")
-        print(f"Type: {emergency_type}")
-        print(f"Message: {emergency_message}")
-        if branch:
-            print(f"Branch: {branch}")
-        if section:
-            print(f"Section: {section}")
-        print("=" * 60)
-        
-        # Step 1: Alert Agent - Trigger the emergency
-        alert_data = self.alert_agent.trigger_emergency(
-            emergency_type, emergency_message, self.students_data
+            dict: Emergency response summary (plus details in 'full' mode)
+        """
+        alert_data = self._start_emergency(emergency_type, emergency_message, branch, section, selected_students)
+        return self._process_emergency(alert_data, response_mode=response_mode)
+    
+    def dispatch_emergency(self, emergency_type, emergency_message, branch=None, section=None, selected_students=None):
+        """
+        Trigger an emergency and queue its selection and notification work
+        
+        Takes the same arguments as trigger_emergency but returns as soon as the
+        emergency ID has been assigned. Progress can be polled with get_emergency_progress.
+        
+        Returns:
+            dict: Emergency ID, timestamp and initial job progress
+        """
+        alert_data = self._start_emergency(emergency_type, emergency_message, branch, section, selected_students)
+        
+        job = self.dispatcher.submit(
+            alert_data['emergency_id'],
+            lambda job: self._process_emergency(alert_data, job)
         )
         
-        # Step 2: Selection Agent - Filter affected students
-        filter_criteria = {
+        return {
+            'emergency_id': alert_data['emergency_id'],
+            'status': 'queued',
             'emergency_type': emergency_type,
-            'branch': branch,
-            'section': section,
-            'selected_students': selected_students or []  # Safe students (checked)
+            'emergency_message': emergency_message,
+            'timestamp': alert_data['timestamp'],
+            'progress': job.to_dict()
         }
+    
+    def get_emergency_progress(self, emergency_id):
+        """Get progress counters for a dispatched emergency, or None if unknown"""
+        return self.dispatcher.get_progress(emergency_id)
+    
+    def get_current_emergency(self):
+        """Get the status of the current (most recently triggered, unresolved) emergency"""
+        return self.shared_state.get('current_emergency', dict(self.IDLE_STATUS))
+    
+    def get_current_emergency_version(self):
+        """Version of the current emergency status (changes whenever the status is set, by any worker)"""
+        return self.shared_state.version('current_emergency')
+    
+    def get_roster_tag(self):
+        """Identifier of the loaded roster version, shared by every worker that loaded the same file"""
+        return self.roster.snapshot.tag
+    
+    def wait_for_current_emergency(self, last_version=0, timeout=None):
+        """
+        Wait for the current emergency status to change
         
+        Args:
+            last_version: status version the caller already has (0 for none)
+            timeout: maximum seconds to wait
+        
+        Returns:
+            tuple: (status, version), or None if nothing changed before the timeout
+        """
+        return self.status_broadcaster.wait(last_version, timeout)
+    
+    def set_current_emergency(self, emergency_id, emergency_type, emergency_message, timestamp):
+        """Mark an emergency as the current one"""
+        self.status_broadcaster.publish({
+            'active': True,
+            'emergency_id': emergency_id,
+            'emergency_message': emergency_message,
+            'emergency_type': emergency_type,
+            'timestamp': timestamp
+        })
+    
+    def resolve_current_emergency(self):
+        """Clear the current emergency status"""
+        self.status_broadcaster.publish(dict(self.IDLE_STATUS))
+    
+    def _start_emergency(self, emergency_type, emergency_message, branch=None, section=None, selected_students=None):
+        """
+        Step 1: Alert Agent - Trigger the emergency and assign its ID
+        
+        Raises:
+            ValueError: if selected_students is not a list of student IDs (checked before
+                an ID is assigned, so invalid input never starts an emergency)
+        """
+        selected_students = parse_student_ids(selected_students).tolist()
+        target = '-'.join(part for part in (branch, section) if part)
+        logger.info(
+            f"🚨 INITIATING EMERGENCY RESPONSE | Type: {emergency_type}" + (f" | Target: {target}" if target else "")
+            + f" | Message: {emergency_message}",
+            extra={'emergency_type': emergency_type, 'branch': branch, 'section': section}
+        )
+        
+        # The target keeps this snapshot, so a roster reload mid-emergency does not change who is notified
+        snapshot = self.roster.snapshot
+        return self.alert_agent.trigger_emergency(
+            emergency_type, emergency_message, snapshot.students_data, branch, section,
+            selected_students, snapshot.roster_index
+        )
+    
+    def _process_emergency(self, alert_data, job=None, response_mode='compact'):
+        """Steps 2-3: select affected students, notify their parents and record the emergency"""
+        emergency_type = alert_data['emergency_type']
+        emergency_message = alert_data['emergency_message']
+        target = alert_data['target']
+        
+        # Step 2: Selection Agent - Resolve the lazy target into affected students
         affected_students = self.selection_agent.filter_students(
-            self.students_data, filter_criteria
+            target.students_data, target.filter_criteria(), target.roster_index
         )
         
-        # Update alert data with affected students
-        alert_data['affected_students'] = affected_students.to_dict('records')
+        # Update alert data with affected students (IDs only; the per-student
+        # details live once, in the stored notifications) and keep the
+        # JSON descriptor of the target rather than the object
+        alert_data['target'] = target.to_dict()
+        alert_data['affected_student_ids'] = affected_students['student_id'].tolist() if not affected_students.empty else []
         alert_data['affected_count'] = len(affected_students)
         
         # Step 3: Notification Agent - Send notifications
-        notification_result = self.notification_agent.send_emergency_notifications(
-            alert_data, affected_students
-        )
-        
-        # Store emergency in history
-        emergency_record = {
-            'alert_data': alert_data,
-            'notification_result': notification_result,
-            'timestamp': datetime.now().isoformat()
-        }
-        self.emergency_history.append(emergency_record)
-        self.notifications_history.extend(notification_result.get('details', []))
+        if job is not None:
+            job.set_affected(len(affected_students))
+            job.set_status('notifying')
+        try:
+            # Siblings share a guardian, so there can be fewer notifications than students
+            # Targeted alerts are delivered ahead of whole-school ones
+            notification_result = self.notification_agent.send_emergency_notifications(
+                alert_data, affected_students,
+                job.record_result if job is not None else None,
+                job.set_queued if job is not None else None,
+                PRIORITY_BULK if emergency_type == 'all' else PRIORITY_ALERT
+            )
+            # Store emergency in history; notifications are stored separately, keyed by emergency ID
+            notifications = notification_result.pop('details', [])
+            emergency_record = {
+                'alert_data': alert_data,
+                'notification_result': notification_result,
+                'timestamp': datetime.now().isoformat()
+            }
+            self.history_store.append_emergency(emergency_record)
+            self.history_store.append_notifications(alert_data['emergency_id'], notifications)
+            self._complete_delivery(alert_data['emergency_id'])
+        except Exception:
+            # This process stays alive, so without a release nobody would ever resume the pending remainder
+            self.outbox.release(alert_data['emergency_id'])
+            raise
         
         # Prepare response
         response = {
@@ -97,62 +259,255 @@ class EmergencyCoordinator:
             'emergency_message': emergency_message,
             'affected_students_count': len(affected_students),
             'notifications_sent': notification_result.get('notifications_sent', 0),
+            'notifications_failed': notification_result.get('notifications_failed', 0),
+            'sends_saved': notification_result.get('sends_saved', 0),
             'timestamp': datetime.now().isoformat(),
-            'details': {
+            'details_url': f"/api/emergency/{alert_data['emergency_id']}"
+        }
+        if response_mode == 'full':
+            response['details'] = {
                 'alert_data': alert_data,
                 'affected_students': affected_students.to_dict('records'),
-                'notification_result': notification_result
+                'notification_result': dict(notification_result, details=notifications)
             }
-        }
         
-        print("=" * 60)
-        print(f"✅ EMERGENCY RESPONSE COMPLETED")
-        print(f"Emergency ID: {response['emergency_id']}")
-        print(f"Students Affected: {response['affected_students_count']}")
-        print(f"Notifications Sent: {response['notifications_sent']}")
+        logger.info(
+            f"✅ EMERGENCY RESPONSE COMPLETED | Emergency ID: {response['emergency_id']} | "
+            f"Students Affected: {response['affected_students_count']} | Notifications Sent: {response['notifications_sent']} | Sends Saved: {response['sends_saved']}",
+            extra={
+                'emergency_id': response['emergency_id'],
+                'affected': response['affected_students_count'],
+                'sent': response['notifications_sent'],
+                'failed': response['notifications_failed'],
+                'sends_saved': response['sends_saved']
+            }
+        )
         
         return response
     
-    def get_emergency_history(self):
-        """Get history of all emergencies"""
-        return self.emergency_history
+    def _complete_delivery(self, emergency_id):
+        """Close an emergency's outbox entry once its history is durably recorded"""
+        self.history_store.flush()
+        self.outbox.complete(emergency_id)
+    
+    def _resume_orphans(self, emergency_ids):
+        """Outbox callback: resume emergencies claimed from a stopped process"""
+        for emergency_id in emergency_ids:
+            self.dispatcher.submit(emergency_id, lambda job, emergency_id=emergency_id: self._resume_emergency(emergency_id, job))
+    
+    def _resume_emergency(self, emergency_id, job=None):
+        """Deliver an interrupted emergency's pending notifications and record it in history"""
+        alert_data, priority = self.outbox.get_emergency(emergency_id)
+        if alert_data is None:
+            return
+        
+        try:
+            self._resume_delivery(emergency_id, alert_data, priority, job)
+        except Exception:
+            # Tried again after the lease, until the resume deadline passes
+            self.outbox.release(emergency_id)
+            raise
+    
+    def _resume_delivery(self, emergency_id, alert_data, priority, job):
+        """Send the pending remainder, record the emergency in history and close its outbox entry"""
+        # Recorded already: the process stopped after writing history, before closing the outbox entry
+        if self.history_store.get_emergency(emergency_id) is None:
+            pending = self.outbox.pending(emergency_id)
+            if job is not None:
+                job.set_affected(alert_data.get('affected_count'))
+                job.set_status('notifying')
+            if pending:
+                self.notification_agent.resume_notifications(
+                    alert_data, pending,
+                    job.record_result if job is not None else None,
+                    job.set_queued if job is not None else None,
+                    priority
+                )
+            
+            counts = self.outbox.counts(emergency_id)
+            notifications = self.outbox.notifications(emergency_id)
+            emergency_record = {
+                'alert_data': alert_data,
+                'notification_result': {
+                    'status': 'success' if not counts['failed'] else 'partial_failure',
+                    'notifications_sent': counts['sent'],
+                    'notifications_failed': counts['failed'],
+                    'students_notified': alert_data.get('affected_count', 0),
+                    'sends_saved': (alert_data.get('affected_count') or 0) - len(notifications),
+                    'resumed': True
+                },
+                'timestamp': datetime.now().isoformat()
+            }
+            self.history_store.append_emergency(emergency_record)
+            self.history_store.append_notifications(emergency_id, notifications)
+            logger.info(
+                f"♻️ EMERGENCY DELIVERY RESUMED | Emergency ID: {emergency_id} | Resent: {len(pending)} | "
+                f"Sent: {counts['sent']} | Failed: {counts['failed']}",
+                extra={'emergency_id': emergency_id, 'sent': counts['sent'], 'failed': counts['failed']}
+            )
+        
+        self._complete_delivery(emergency_id)
+    
+    def get_emergency_history(self, start=None, end=None):
+        """Get history of all emergencies, optionally limited to a time range"""
+        return self.history_store.get_emergencies(start, end)
+    
+    def get_emergency_history_page(self, cursor=None, limit=50, detail=False):
+        """
+        Get one page of emergency history, newest first
+        
+        Args:
+            cursor: cursor returned with the previous page (None for the first page)
+            limit: number of emergencies per page
+            detail: include full records (affected student IDs, delivery results) instead of summaries
+        
+        Returns:
+            dict: {'emergencies': [...], 'next_cursor': str or None}
+        """
+        emergencies, next_cursor = self.history_store.page_emergencies(cursor, limit, detail)
+        return {'emergencies': emergencies, 'next_cursor': next_cursor}
+    
+    def iter_emergency_history_json(self, cursor=None, limit=None, detail=False):
+        """Stream emergency history newest first as one JSON document per emergency"""
+        return self.history_store.iter_emergencies_json(cursor, limit, detail)
+    
+    def count_emergencies(self):
+        """Get the total number of recorded emergencies"""
+        return self.history_store.count_emergencies()
+    
+    def get_emergency(self, emergency_id, detail=False):
+        """
+        Get a recorded emergency by ID, or None if unknown
+        
+        Args:
+            emergency_id: ID of the emergency
+            detail: also include every notification sent for it
+        """
+        record = self.history_store.get_emergency(emergency_id)
+        if record is not None and detail:
+            record = dict(record, notifications=self.history_store.get_notifications(emergency_id))
+        return record
     
     def get_recent_notifications(self, limit=10):
         """Get recent notifications"""
-        return self.notifications_history[-limit:] if self.notifications_history else []
+        return self.history_store.recent_notifications(limit)
+    
+    def get_notification_stats(self):
+        """Get this process's cumulative notification counters, including sends saved by coalescing"""
+        return self.notification_agent.get_stats()
     
     def get_available_branches(self):
-        """Get list of available branches"""
-        return self.selection_agent.get_available_branches(self.students_data)
+        """Get list of available branches (from the roster's precomputed catalog)"""
+        return list(self.roster.snapshot.catalog.branches)
     
     def get_available_sections(self, branch=None):
-        """Get list of available sections"""
-        return self.selection_agent.get_available_sections(self.students_data, branch)
+        """Get list of available sections (from the roster's precomputed catalog)"""
+        return self.roster.snapshot.catalog.sections_for(branch)
+    
+    def get_catalog(self):
+        """Get every branch with its sections and student counts"""
+        snapshot = self.roster.snapshot
+        return dict(snapshot.catalog.to_dict(), roster_version=snapshot.tag)
     
     def get_students_for_branch_section(self, branch, section=None):
         """Get students for a specific branch and section"""
-        filtered_students = self.students_data.copy()
+        # Section is optional: without it the whole branch is returned
+        return self.roster_index.select(branch, section).to_dict('records')
+    
+    def get_students_columnar(self, branch, section=None):
+        """
+        Get students for a branch (and section) as parallel column arrays
         
-        # Filter by branch
-        filtered_students = filtered_students[filtered_students['branch'] == branch]
+        Branch and section are dictionary-encoded: 'data' holds integer codes
+        into the lists in 'dictionaries'.
         
-        # Filter by section if provided
-        if section:
-            filtered_students = filtered_students[filtered_students['section'] == section]
+        Returns:
+            dict: 'count', 'columns', 'dictionaries' and 'data' (column name -> values)
+        """
+        snapshot = self.roster.snapshot
+        positions = snapshot.roster_index.positions(branch, section)
+        columns = list(snapshot.students_data.columns)
+        data, dictionaries = snapshot.roster_index.columnar(positions, columns)
+        return {
+            'roster_version': snapshot.tag,
+            'count': len(positions),
+            'columns': columns,
+            'dictionaries': dictionaries,
+            'data': data
+        }
+    
+    def get_students_batch(self, groups, columns=None):
+        """
+        Get the students of many branch/section groups in one columnar payload
         
-        return filtered_students.to_dict('records')
+        Args:
+            groups: list of (branch, section) pairs; a section of None means the whole
+                branch split into its sections
+            columns: roster columns to return (default: student_id and name)
+        
+        Returns:
+            dict: 'groups' lists each (branch, section) with the offset and count of its
+                rows in 'data', which maps every column to a list of values
+        
+        Raises:
+            ValueError: if columns is not a list of roster column names, or a branch or
+                section is not a string
+        """
+        if columns is not None and (
+                not isinstance(columns, (list, tuple)) or not all(isinstance(column, str) for column in columns)):
+            raise ValueError("columns must be a list of column names")
+        for branch, section in groups:
+            if not isinstance(branch, str) or not (section is None or isinstance(section, str)):
+                raise ValueError("Branch and section must be strings")
+        
+        snapshot = self.roster.snapshot
+        roster_index = snapshot.roster_index
+        columns = list(columns or self.BATCH_COLUMNS)
+        unknown = [column for column in columns if column not in snapshot.students_data.columns]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+        
+        pairs = []
+        for branch, section in groups:
+            if section:
+                pairs.append((branch, section))
+            else:
+                pairs.extend((branch, branch_section) for branch_section in snapshot.catalog.sections_for(branch))
+        
+        listed, offset, all_positions = [], 0, []
+        for branch, section in pairs:
+            positions = roster_index.positions(branch, section)
+            listed.append({'branch': branch, 'section': section, 'offset': offset, 'count': len(positions)})
+            all_positions.append(positions)
+            offset += len(positions)
+        
+        positions = np.concatenate(all_positions) if all_positions else np.empty(0, dtype=np.intp)
+        return {
+            'roster_version': snapshot.tag,
+            'columns': columns,
+            'groups': listed,
+            'data': roster_index.column_values(positions, columns)
+        }
     
     def send_status_update(self, emergency_id, update_message):
         """Send status update for existing emergency"""
-        # Find the emergency in history
-        emergency = None
-        for record in self.emergency_history:
-            if record['alert_data']['emergency_id'] == emergency_id:
-                emergency = record['alert_data']
-                break
+        # Keyed lookup: constant cost regardless of history length
+        record = self.history_store.get_emergency(emergency_id)
+        emergency = record['alert_data'] if record else None
         
         if not emergency:
             return {'status': 'error', 'message': 'Emergency not found'}
         
-        update_result = self.notification_agent.send_status_update(emergency, update_message)
+        # One update per guardian already notified of the emergency
+        recipients = {}
+        for notification in self.history_store.get_notifications(emergency_id):
+            email = notification.get('parent_email')
+            if isinstance(email, str) and email.strip():
+                recipients.setdefault(email.strip().lower(), notification)
+        
+        update_result = self.notification_agent.send_status_update(emergency, update_message, list(recipients.values()))
         return update_result
+    
+    def get_delivery_metrics(self):
+        """Get the delivery engine's queue depth, wait time and rate-limit metrics"""
+        return self.notification_agent.delivery_engine.metrics()
@@ -0,0 +1,98 @@
+import re
+import secrets
+import threading
+import time
+from datetime import datetime
+
+PREFIX = 'EMRG'
+
+# EMRG_<YYYYMMDD>_<HHMMSS>_<milliseconds>_<sequence><random>, in the server's local time
+ID_PATTERN = re.compile(r'^EMRG_(\d{8})_(\d{6})(?:_(\d{3})_([0-9A-F]{4})([0-9A-F]{6}))?$')
+
+SEQUENCE_LIMIT = 0x10000
+
+
+class EmergencyIdGenerator:
+    """
+    Generates unique emergency IDs that sort in creation order.
+
+    An ID reads as its creation time in the server's local time (like every
+    other timestamp of an emergency) down to the millisecond, followed by a
+    4-digit hex sequence number and 6 random hex digits:
+
+        EMRG_20240927_102630_512_0000A3F19C
+
+    Every field has a fixed width, so comparing IDs as strings compares
+    their creation times, which makes the ID itself a usable index and
+    pagination key; IDs of the older EMRG_<YYYYMMDD>_<HHMMSS> form, also in
+    local time, sort among them. IDs created in the same millisecond are told
+    apart by the sequence number. IDs are strictly increasing within a
+    process even if the local clock steps backwards (clock corrections, the
+    end of daylight saving time): they then stay on the last millisecond
+    until the clock catches up. The random digits keep IDs created by
+    different processes in the same millisecond apart.
+    """
+
+    def __init__(self, clock=time.time):
+        """
+        Args:
+            clock: function returning the current time in seconds since the epoch
+        """
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+
+    def new_id(self):
+        """Generate the next emergency ID"""
+        with self._lock:
+            now = self.clock()
+            # Local wall-clock milliseconds, so the guard below also covers daylight saving changes
+            now_ms = int(now * 1000) + time.localtime(now).tm_gmtoff * 1000
+            if now_ms > self._last_ms:
+                self._last_ms, self._sequence = now_ms, 0
+            else:
+                # Same millisecond, or the clock stepped back: stay on the last one
+                self._sequence += 1
+                if self._sequence == SEQUENCE_LIMIT:
+                    self._last_ms, self._sequence = self._last_ms + 1, 0
+            ms, sequence = self._last_ms, self._sequence
+
+        # ms already counts local time, so formatting it as UTC prints the local wall clock
+        created = time.strftime('%Y%m%d_%H%M%S', time.gmtime(ms // 1000))
+        return (
+            f"{PREFIX}_{created}_{ms % 1000:03d}_"
+            f"{sequence:04X}{secrets.randbits(24):06X}"
+        )
+
+
+def emergency_id_time(emergency_id):
+    """
+    Creation time encoded in an emergency ID
+
+    Returns:
+        datetime: naive local time (millisecond precision for the current
+            form, seconds for the older one), or None if the ID is not an
+            emergency ID
+    """
+    match = ID_PATTERN.match(emergency_id or '')
+    if match is None:
+        return None
+    date, clock, millis = match.group(1), match.group(2), match.group(3)
+    created = datetime.strptime(f"{date}{clock}", '%Y%m%d%H%M%S')
+    if millis is None:
+        return created
+    return created.replace(microsecond=int(millis) * 1000)
+
+
+def is_emergency_id(value):
+    """Whether value is an emergency ID (of either form)"""
+    return isinstance(value, str) and ID_PATTERN.match(value) is not None
+
+
+_generator = EmergencyIdGenerator()
+
+
+def new_emergency_id():
+    """Generate an emergency ID from the process-wide generator"""
+    return _generator.new_id()
@@ -0,0 +1,178 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from .agent_logging import get_logger
+
+logger = get_logger('jobs')
+
+
+class EmergencyJob:
+    """Progress of one emergency being processed in the background"""
+
+    def __init__(self, emergency_id, on_change=None, publish_interval=0.25):
+        """
+        Args:
+            emergency_id: ID of the emergency
+            on_change: optional callback(job) invoked when the progress changes
+            publish_interval: minimum seconds between on_change calls for delivery results
+        """
+        self.emergency_id = emergency_id
+        self.on_change = on_change
+        self.publish_interval = publish_interval
+        self.status = 'queued'
+        self.queued = 0
+        self.sent = 0
+        self.failed = 0
+        self.affected_count = None
+        self.error = None
+        self.created_at = datetime.now().isoformat()
+        self.finished_at = None
+        self._lock = threading.Lock()
+        self._last_published = 0.0
+
+    def set_status(self, status):
+        with self._lock:
+            self.status = status
+        self._changed(force=True)
+
+    def set_affected(self, count):
+        """Record how many students the emergency affects"""
+        with self._lock:
+            self.affected_count = count
+        self._changed(force=True)
+
+    def set_queued(self, count):
+        """Record how many notifications were handed to the delivery engine"""
+        with self._lock:
+            self.queued = count
+        self._changed(force=True)
+
+    def record_result(self, notification, result):
+        """Delivery callback: count each finished notification"""
+        with self._lock:
+            if result['status'] == 'sent':
+                self.sent += 1
+            else:
+                self.failed += 1
+        # Results arrive per notification: publish at most every publish_interval
+        self._changed()
+
+    def finish(self, error=None):
+        with self._lock:
+            self.status = 'failed' if error else 'completed'
+            self.error = error
+            self.finished_at = datetime.now().isoformat()
+        self._changed(force=True)
+
+    def to_dict(self):
+        """Snapshot of the job's progress counters"""
+        with self._lock:
+            return {
+                'emergency_id': self.emergency_id,
+                'status': self.status,
+                'affected_students_count': self.affected_count,
+                'queued': self.queued,
+                'sent': self.sent,
+                'failed': self.failed,
+                'pending': self.queued - self.sent - self.failed,
+                'error': self.error,
+                'created_at': self.created_at,
+                'finished_at': self.finished_at
+            }
+
+    def _changed(self, force=False):
+        if self.on_change is None:
+            return
+        now = time.monotonic()
+        if force or now - self._last_published >= self.publish_interval:
+            self._last_published = now
+            self.on_change(self)
+
+
+class EmergencyDispatcher:
+    """
+    Runs emergency selection and notification work on a background executor.
+
+    Keeps the progress of the most recent jobs in memory so the API can be
+    polled while a job runs. With a progress store (a SharedStateStore), the
+    progress is also published there, so other server worker processes can
+    answer progress requests for jobs they are not running.
+    """
+
+    PROGRESS_KEY = 'progress:{}'
+
+    def __init__(self, max_workers=4, max_jobs=1000, progress_store=None):
+        """
+        Args:
+            max_workers: number of emergencies processed concurrently
+            max_jobs: number of finished jobs to keep progress for
+            progress_store: optional SharedStateStore to publish progress to
+        """
+        self.max_jobs = max_jobs
+        self.progress_store = progress_store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='emergency')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, emergency_id, work):
+        """
+        Queue work for an emergency
+
+        Args:
+            emergency_id: ID the job is tracked under
+            work: callable(job) doing the selection and notification work
+
+        Returns:
+            EmergencyJob: The job tracking the work's progress
+        """
+        job = EmergencyJob(emergency_id, self._publish if self.progress_store is not None else None)
+        with self._lock:
+            self._jobs[emergency_id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+
+        self._executor.submit(self._run, job, work)
+        return job
+
+    def get_job(self, emergency_id):
+        """Get the job for an emergency, or None if unknown or expired"""
+        with self._lock:
+            return self._jobs.get(emergency_id)
+
+    def get_progress(self, emergency_id):
+        """Get progress counters for a job run by this or (with a progress store) any worker, or None"""
+        job = self.get_job(emergency_id)
+        if job is not None:
+            return job.to_dict()
+        if self.progress_store is not None:
+            return self.progress_store.get(self.PROGRESS_KEY.format(emergency_id))
+        return None
+
+    def _publish(self, job):
+        progress = job.to_dict()
+        try:
+            self.progress_store.set(self.PROGRESS_KEY.format(job.emergency_id), progress)
+            if progress['finished_at'] is not None:
+                self.progress_store.prune(self.PROGRESS_KEY.format(''), self.max_jobs)
+        except Exception as e:
+            # Progress is advisory: never let it interrupt delivery
+            logger.warning(
+                f"⚠️ Could not publish progress for {job.emergency_id}: {e}",
+                extra={'emergency_id': job.emergency_id}
+            )
+
+    def _run(self, job, work):
+        job.set_status('running')
+        try:
+            work(job)
+        except Exception as e:
+            logger.exception(f"❌ Error processing emergency {job.emergency_id}: {e}", extra={'emergency_id': job.emergency_id})
+            job.finish(error=str(e))
+        else:
+            job.finish()
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,55 @@
+class EmergencyTarget:
+    """
+    Lazy description of the students an emergency targets.
+
+    Carries only the emergency type, branch, section and the set of students
+    marked safe, plus the roster snapshot they refer to. The SelectionAgent
+    looks up the targeted rows from filter_criteria(), so creating an alert
+    never copies the roster.
+    """
+
+    DESCRIPTIONS = {
+        'all': "All Students",
+        'branch': "Specific Branch",
+        'section': "Specific Section"
+    }
+
+    def __init__(self, emergency_type, branch=None, section=None, excluded_ids=None,
+                 students_data=None, roster_index=None):
+        """
+        Args:
+            emergency_type: 'all', 'branch', or 'section'
+            branch: Branch name (branch/section emergencies)
+            section: Section name (section emergencies)
+            excluded_ids: student IDs marked safe, who are not notified
+            students_data: DataFrame the target refers to
+            roster_index: optional RosterIndex over students_data, used instead of scanning it
+        """
+        self.emergency_type = emergency_type
+        self.branch = branch
+        self.section = section
+        self.excluded_ids = list(excluded_ids or [])
+        self.students_data = students_data
+        self.roster_index = roster_index
+
+    @property
+    def description(self):
+        return self.DESCRIPTIONS.get(self.emergency_type, "Unknown Target")
+
+    def filter_criteria(self):
+        """Criteria for SelectionAgent.filter_students"""
+        return {
+            'emergency_type': self.emergency_type,
+            'branch': self.branch,
+            'section': self.section,
+            'selected_students': self.excluded_ids  # Safe students (checked)
+        }
+
+    def to_dict(self):
+        """JSON-friendly descriptor (what is stored with the emergency)"""
+        return {
+            'emergency_type': self.emergency_type,
+            'branch': self.branch,
+            'section': self.section,
+            'excluded_count': len(self.excluded_ids)
+        }
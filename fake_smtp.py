@@ -0,0 +1,167 @@
+import asyncio
+import threading
+import time
+
+
+class FakeSMTPServer:
+    """
+    Minimal local SMTP server for tests and benchmarks.
+
+    Speaks just enough SMTP (EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT)
+    for smtplib and the notification transports, and records every accepted
+    message in memory instead of relaying it. Runs its own event loop in a
+    background thread so it can be used from synchronous code:
+
+        with FakeSMTPServer() as server:
+            transport = SMTPTransport(port=server.port)
+            ...
+            server.messages  # list of received messages
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, delay=0.0, fail_every=0):
+        """
+        Args:
+            host: interface to listen on
+            port: port to listen on (0 picks a free port)
+            delay: seconds to wait before acknowledging each message, to simulate a slow provider
+            fail_every: reject every Nth message with a transient 451 error (0 disables)
+        """
+        self.host = host
+        self.port = port
+        self.delay = delay
+        self.fail_every = fail_every
+        self.messages = []
+        self.connections = 0
+        self._received = 0
+        self._lock = threading.Lock()
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._sessions = set()
+
+    def start(self):
+        """Start listening in a background thread"""
+        ready = threading.Event()
+        self._loop = asyncio.new_event_loop()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle_client, self.host, self.port)
+            )
+            self.port = self._server.sockets[0].getsockname()[1]
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name='fake-smtp', daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        """Stop the server and its event loop"""
+        if self._loop is None:
+            return
+
+        async def shutdown():
+            self._server.close()
+            # Pooled clients keep sessions open: end them with the server
+            for session in self._sessions:
+                session.cancel()
+            await asyncio.gather(*self._sessions, return_exceptions=True)
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    async def _handle_client(self, reader, writer):
+        """Serve one SMTP session"""
+        with self._lock:
+            self.connections += 1
+        session = asyncio.current_task()
+        self._sessions.add(session)
+        envelope = {'mail_from': None, 'rcpt_to': []}
+
+        async def reply(line):
+            writer.write(f"{line}\r\n".encode())
+            await writer.drain()
+
+        await reply('220 fake-smtp ready')
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode(errors='replace').rstrip('\r\n')
+                verb = command[:4].upper()
+
+                if verb == 'EHLO':
+                    writer.write(b'250-fake-smtp\r\n250-PIPELINING\r\n250 8BITMIME\r\n')
+                    await writer.drain()
+                elif verb == 'HELO':
+                    await reply('250 fake-smtp')
+                elif verb == 'MAIL':
+                    envelope = {'mail_from': command[10:].strip(), 'rcpt_to': []}
+                    await reply('250 OK')
+                elif verb == 'RCPT':
+                    envelope['rcpt_to'].append(command[8:].strip())
+                    await reply('250 OK')
+                elif verb == 'DATA':
+                    await reply('354 End data with <CR><LF>.<CR><LF>')
+                    data = await self._read_data(reader)
+                    await reply(await self._accept(envelope, data))
+                    envelope = {'mail_from': None, 'rcpt_to': []}
+                elif verb == 'RSET':
+                    envelope = {'mail_from': None, 'rcpt_to': []}
+                    await reply('250 OK')
+                elif verb == 'NOOP':
+                    await reply('250 OK')
+                elif verb == 'QUIT':
+                    await reply('221 Bye')
+                    break
+                else:
+                    await reply('502 Command not implemented')
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            self._sessions.discard(session)
+            writer.close()
+
+    async def _read_data(self, reader):
+        """Read a DATA payload up to the terminating dot line"""
+        lines = []
+        while True:
+            line = await reader.readline()
+            if not line or line in (b'.\r\n', b'.\n'):
+                break
+            # Undo dot-stuffing
+            if line.startswith(b'..'):
+                line = line[1:]
+            lines.append(line)
+        return b''.join(lines)
+
+    async def _accept(self, envelope, data):
+        """Record a message and return the SMTP reply for it"""
+        if self.delay:
+            await asyncio.sleep(self.delay)
+
+        with self._lock:
+            self._received += 1
+            if self.fail_every and self._received % self.fail_every == 0:
+                return '451 Temporary failure, try again'
+            self.messages.append({
+                'mail_from': envelope['mail_from'],
+                'rcpt_to': list(envelope['rcpt_to']),
+                'data': data.decode(errors='replace'),
+                'received_at': time.time()
+            })
+        return '250 OK: queued'
@@ -0,0 +1,360 @@
+import atexit
+import json
+import sqlite3
+import threading
+from collections import OrderedDict, deque
+
+from .agent_logging import get_logger
+from .emergency_ids import is_emergency_id
+
+logger = get_logger('history')
+
+
+class HistoryStore:
+    """
+    Durable, append-only store for emergency and notification history.
+
+    Records are appended to a SQLite database in WAL mode. Appends are
+    buffered in memory and written in one transaction per batch (when the
+    buffer reaches `batch_size` or every `flush_interval` seconds), so the
+    cost of the fsync is shared by the whole batch instead of paid per
+    record. Emergencies are indexed by `emergency_id` and time, notifications
+    by `emergency_id` and time, and the most recent notifications are also
+    kept in a bounded in-memory window for the dashboard.
+
+    Recent emergencies are additionally kept in a keyed in-memory index that
+    is maintained on insert, so looking up an emergency (status updates, the
+    detail endpoint) is a dictionary hit however long the history is.
+
+    With `shared` set, several processes (server workers) write the same
+    database: the recent notifications are then read from the database
+    rather than from this process's window, so every worker sees all of them.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS emergencies (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            emergency_id TEXT NOT NULL UNIQUE,
+            created_at TEXT NOT NULL,
+            record TEXT NOT NULL,
+            summary TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_emergencies_created_at ON emergencies (created_at);
+        CREATE TABLE IF NOT EXISTS notifications (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            emergency_id TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            record TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_notifications_emergency_id ON notifications (emergency_id);
+        CREATE INDEX IF NOT EXISTS idx_notifications_created_at ON notifications (created_at);
+    """
+
+    def __init__(self, path, batch_size=500, flush_interval=1.0, hot_window=1000, index_size=1000,
+                 shared=False):
+        """
+        Args:
+            path: SQLite database file (':memory:' for a throwaway store)
+            batch_size: number of buffered records that triggers a write
+            flush_interval: maximum seconds a record stays buffered
+            hot_window: number of recent notifications kept in memory
+            index_size: number of recent emergencies kept in the keyed index
+            shared: other processes append to the same database
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.index_size = index_size
+        self.shared = shared
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        # One fsync per committed batch
+        self._conn.execute('PRAGMA synchronous=FULL')
+        self._conn.executescript(self.SCHEMA)
+        self._migrate()
+        self._conn.commit()
+
+        self._lock = threading.RLock()
+        self._pending_emergencies = []
+        self._pending_notifications = []
+        self._recent_notifications = deque(self._load_recent(hot_window), maxlen=hot_window)
+        self._emergency_index = OrderedDict()
+
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_periodically, name='history-flush', daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def append_emergency(self, record):
+        """Append an emergency record ({'alert_data': ..., 'notification_result': ..., 'timestamp': ...})"""
+        alert_data = record['alert_data']
+        row = (
+            alert_data['emergency_id'],
+            alert_data['timestamp'],
+            self._encode(record),
+            self._encode(self.summarize(record))
+        )
+        with self._lock:
+            self._pending_emergencies.append(row)
+            self._index_emergency(alert_data['emergency_id'], record)
+            self._flush_if_full()
+
+    def append_notifications(self, emergency_id, notifications):
+        """Append the notifications sent for an emergency"""
+        rows = [
+            (emergency_id, self._normalize_time(notification['timestamp']), self._encode(notification))
+            for notification in notifications
+        ]
+        with self._lock:
+            self._pending_notifications.extend(rows)
+            self._recent_notifications.extend(notifications)
+            self._flush_if_full()
+
+    def get_emergency(self, emergency_id):
+        """Get an emergency record by ID, or None if unknown"""
+        with self._lock:
+            record = self._emergency_index.get(emergency_id)
+            if record is not None:
+                self._emergency_index.move_to_end(emergency_id)
+                return record
+
+        # Older than the keyed index: fall back to the database's unique index
+        rows = self._query(
+            'SELECT record FROM emergencies WHERE emergency_id = ?', (emergency_id,)
+        )
+        if not rows:
+            return None
+        with self._lock:
+            self._index_emergency(emergency_id, rows[0])
+        return rows[0]
+
+    def get_emergencies(self, start=None, end=None, limit=None):
+        """
+        Get emergency records in chronological order
+
+        Args:
+            start: ISO timestamp; only emergencies at or after it
+            end: ISO timestamp; only emergencies before it
+            limit: maximum number of records
+        """
+        where, params = self._time_range(start, end)
+        sql = f'SELECT record FROM emergencies {where} ORDER BY created_at, seq'
+        return self._query(sql + self._limit(limit), params)
+
+    def page_emergencies(self, cursor=None, limit=50, detail=False):
+        """
+        Get one page of emergencies, newest first
+        
+        Args:
+            cursor: next_cursor from a previous page (None for the first page); it is
+                the ID of the last emergency returned, as IDs sort by creation time
+            limit: page size
+            detail: return full records instead of summaries
+
+        Returns:
+            tuple: (records, next_cursor); next_cursor is None on the last page
+
+        Raises:
+            ValueError: if the cursor is not an emergency ID or limit is not positive
+        """
+        self._check_limit(limit)
+        rows = self._fetch_page(cursor, limit + 1, detail)
+        next_cursor = str(rows[limit - 1][0]) if len(rows) > limit else None
+        return [json.loads(text) for _, text in rows[:limit]], next_cursor
+
+    def iter_emergencies_json(self, cursor=None, limit=None, detail=False, page_size=500):
+        """
+        Stream emergencies newest first as stored JSON text, one page at a time
+
+        The stored JSON is yielded as-is, so streaming never decodes and
+        re-encodes records, and only one page is held in memory.
+        """
+        if limit is not None:
+            self._check_limit(limit)
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = page_size if remaining is None else min(page_size, remaining)
+            rows = self._fetch_page(cursor, size, detail)
+            for _, text in rows:
+                yield text
+            if len(rows) < size:
+                return
+            cursor = str(rows[-1][0])
+            if remaining is not None:
+                remaining -= len(rows)
+
+    @staticmethod
+    def summarize(record):
+        """Summary projection of an emergency record: no per-student or per-message payloads"""
+        alert_data = record['alert_data']
+        notification_result = record.get('notification_result') or {}
+        return {
+            'emergency_id': alert_data['emergency_id'],
+            'emergency_type': alert_data.get('emergency_type'),
+            'emergency_message': alert_data.get('emergency_message'),
+            'target_description': alert_data.get('target_description'),
+            'status': alert_data.get('status'),
+            'timestamp': alert_data.get('timestamp'),
+            'completed_at': record.get('timestamp'),
+            'affected_count': alert_data.get('affected_count'),
+            'notifications_sent': notification_result.get('notifications_sent', 0),
+            'notifications_failed': notification_result.get('notifications_failed', 0),
+            'sends_saved': notification_result.get('sends_saved', 0)
+        }
+
+    def get_notifications(self, emergency_id=None, start=None, end=None, limit=None):
+        """Get notifications in sending order, optionally for one emergency and/or a time range"""
+        where, params = self._time_range(start, end)
+        if emergency_id is not None:
+            where = f"{where} AND emergency_id = ?" if where else 'WHERE emergency_id = ?'
+            params.append(emergency_id)
+        sql = f'SELECT record FROM notifications {where} ORDER BY seq'
+        return self._query(sql + self._limit(limit), params)
+
+    def count_emergencies(self):
+        """Number of emergencies recorded"""
+        self.flush()
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM emergencies').fetchone()[0]
+
+    def recent_notifications(self, limit=10):
+        """Most recent notifications from the in-memory window, oldest first"""
+        if self.shared:
+            self.flush()
+            with self._lock:
+                return self._load_recent(limit)
+        with self._lock:
+            if limit >= len(self._recent_notifications):
+                return list(self._recent_notifications)
+            return list(self._recent_notifications)[-limit:]
+
+    def flush(self):
+        """Write all buffered records in a single transaction"""
+        with self._lock:
+            if not self._pending_emergencies and not self._pending_notifications:
+                return
+            with self._conn:
+                # History is append-only: an emergency recorded twice keeps its first record
+                duplicates = set()
+                for row in self._pending_emergencies:
+                    cursor = self._conn.execute(
+                        'INSERT INTO emergencies (emergency_id, created_at, record, summary) VALUES (?, ?, ?, ?) '
+                        'ON CONFLICT(emergency_id) DO NOTHING',
+                        row
+                    )
+                    if not cursor.rowcount:
+                        duplicates.add(row[0])
+                notifications = self._pending_notifications
+                if duplicates:
+                    notifications = [row for row in notifications if row[0] not in duplicates]
+                self._conn.executemany(
+                    'INSERT INTO notifications (emergency_id, created_at, record) VALUES (?, ?, ?)',
+                    notifications
+                )
+            self._pending_emergencies = []
+            self._pending_notifications = []
+            for emergency_id in duplicates:
+                # The index holds the rejected record: reload the stored one on the next lookup
+                self._emergency_index.pop(emergency_id, None)
+                logger.warning(
+                    f"⚠️ Emergency {emergency_id} is already in history; kept the first record",
+                    extra={'emergency_id': emergency_id}
+                )
+
+    def close(self):
+        """Flush outstanding records and close the database"""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._flusher.join()
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    def _index_emergency(self, emergency_id, record):
+        self._emergency_index[emergency_id] = record
+        self._emergency_index.move_to_end(emergency_id)
+        while len(self._emergency_index) > self.index_size:
+            self._emergency_index.popitem(last=False)
+
+    def _flush_if_full(self):
+        if len(self._pending_emergencies) + len(self._pending_notifications) >= self.batch_size:
+            self.flush()
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                logger.error(f"❌ Error writing emergency history: {e}")
+
+    def _query(self, sql, params):
+        # Reads go through the buffer first so callers always see their own appends
+        self.flush()
+        with self._lock:
+            return [json.loads(row[0]) for row in self._conn.execute(sql, params)]
+
+    def _fetch_page(self, cursor, limit, detail):
+        """Keyset page of (emergency_id, JSON text) rows created strictly before the cursor's emergency"""
+        column = 'record' if detail else 'summary'
+        if cursor is not None and not is_emergency_id(cursor):
+            raise ValueError(f"Invalid cursor: {cursor}")
+        self.flush()
+        # Emergency IDs sort by creation time: the unique index on them is the page index
+        with self._lock:
+            if cursor is None:
+                return self._conn.execute(
+                    f'SELECT emergency_id, {column} FROM emergencies ORDER BY emergency_id DESC LIMIT ?', (limit,)
+                ).fetchall()
+            return self._conn.execute(
+                f'SELECT emergency_id, {column} FROM emergencies WHERE emergency_id < ? '
+                f'ORDER BY emergency_id DESC LIMIT ?',
+                (cursor, limit)
+            ).fetchall()
+
+    def _migrate(self):
+        """Add and backfill the summary column for databases created before it existed"""
+        columns = [row[1] for row in self._conn.execute('PRAGMA table_info(emergencies)')]
+        if 'summary' not in columns:
+            self._conn.execute('ALTER TABLE emergencies ADD COLUMN summary TEXT')
+        rows = self._conn.execute('SELECT seq, record FROM emergencies WHERE summary IS NULL').fetchall()
+        self._conn.executemany(
+            'UPDATE emergencies SET summary = ? WHERE seq = ?',
+            [(self._encode(self.summarize(json.loads(record))), seq) for seq, record in rows]
+        )
+
+    def _load_recent(self, limit):
+        rows = self._conn.execute(
+            'SELECT record FROM notifications ORDER BY seq DESC LIMIT ?', (limit,)
+        ).fetchall()
+        return [json.loads(row[0]) for row in reversed(rows)]
+
+    @staticmethod
+    def _time_range(start, end):
+        clauses, params = [], []
+        if start is not None:
+            clauses.append('created_at >= ?')
+            params.append(HistoryStore._normalize_time(start))
+        if end is not None:
+            clauses.append('created_at < ?')
+            params.append(HistoryStore._normalize_time(end))
+        return ('WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+    @staticmethod
+    def _check_limit(limit):
+        if limit < 1:
+            raise ValueError(f"Invalid limit: {limit} (must be at least 1)")
+
+    @staticmethod
+    def _limit(limit):
+        return f' LIMIT {int(limit)}' if limit is not None else ''
+
+    @staticmethod
+    def _normalize_time(timestamp):
+        """Index times as ISO strings ('2024-09-27 10:26:30' -> '2024-09-27T10:26:30')"""
+        return str(timestamp).replace(' ', 'T', 1)
+
+    @staticmethod
+    def _encode(record):
+        return json.dumps(record, default=str)
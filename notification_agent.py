@@ -1,112 +1,193 @@
+import threading
 import pandas as pd
 from datetime import datetime
 
+from .agent_logging import get_logger
+from .delivery_engine import PRIORITY_ALERT, PRIORITY_STATUS, DeliveryEngine
+from .notification_renderer import NotificationRenderer
+from .outbox import idempotency_key
+
+logger = get_logger('notification_agent')
+
 class NotificationAgent:
-    def __init__(self):
+    def __init__(self, delivery_engine=None, coalesce=True, outbox=None):
         self.role = 'Emergency Notification Specialist'
         self.goal = 'Send formatted emergency updates to parents and stakeholders'
         self.backstory = 'You are responsible for crafting and delivering clear, concise emergency notifications to parents and ensuring proper communication protocols are followed.'
+        
+        # Delivers over the console transport unless another engine/transport is configured
+        self.delivery_engine = delivery_engine or DeliveryEngine()
+        self.renderer = NotificationRenderer()
+        # Optional durable record of every recipient's delivery state (see Outbox)
+        self.outbox = outbox
+        
+        # One combined message per guardian instead of one per student
+        self.coalesce = coalesce
+        self._stats_lock = threading.Lock()
+        self._stats = {'students_notified': 0, 'notifications_rendered': 0, 'sends_saved': 0}
     
-    def send_emergency_notifications(self, alert_data, affected_students):
+    def send_emergency_notifications(self, alert_data, affected_students, on_result=None, on_queued=None,
+                                     priority=PRIORITY_ALERT):
         """
         Send emergency notifications to parents of affected students
         
         Args:
             alert_data: dict containing emergency alert information
             affected_students: DataFrame containing affected student information
+            on_result: optional callback(notification, result) called as each delivery finishes
+            on_queued: optional callback(count) called with the number of notifications before delivery
+            priority: delivery lane (PRIORITY_ALERT for targeted alerts, PRIORITY_BULK for whole-school ones)
         
         Returns:
             dict: Notification results
         """
-        notifications_sent = []
-        
         if affected_students.empty:
-            print("⚠️ No students to notify")
-            return {'status': 'no_students', 'notifications_sent': 0}
+            logger.warning("⚠️ No students to notify", extra={'emergency_id': alert_data['emergency_id']})
+            return {'status': 'no_students', 'notifications_sent': 0, 'students_notified': 0, 'sends_saved': 0}
         
-        print(f"\n📧 SENDING EMERGENCY NOTIFICATIONS")
-        print(f"Emergency ID: {alert_data['emergency_id']}")
-        print(f"Affected Students: {len(affected_students)}")
-        print("-" * 50)
+        logger.info(
+            f"📧 SENDING EMERGENCY NOTIFICATIONS | Emergency ID: {alert_data['emergency_id']} | Affected Students: {len(affected_students)}",
+            extra={'emergency_id': alert_data['emergency_id'], 'affected': len(affected_students)}
+        )
         
-        for _, student in affected_students.iterrows():
-            notification = self._create_notification(alert_data, student)
-            notifications_sent.append(notification)
-            
-            # Simulate sending email (print to console)
-            print(f"\n📨 EMAIL SENT:")
-            print(f"To: {student['parent_email']}")
-            print(f"Subject: {notification['subject']}")
-            print(f"Message: {notification['message']}")
-            print(f"Student: {student['name']} ({student['student_id']})")
-            print(f"Branch/Section: {student['branch']}-{student['section']}")
+        # Render every subject/body in one vectorized pass with a single timestamp
+        if self.coalesce:
+            notifications = self.renderer.render_by_guardian(alert_data, affected_students)
+        else:
+            notifications = self.renderer.render(alert_data, affected_students)
+        sends_saved = len(affected_students) - len(notifications)
+        self._record_stats(len(affected_students), len(notifications), sends_saved)
+        if sends_saved:
+            logger.info(
+                f"👪 Coalesced {len(affected_students)} students into {len(notifications)} guardian notifications | Sends saved: {sends_saved}",
+                extra={'emergency_id': alert_data['emergency_id'], 'sends_saved': sends_saved}
+            )
         
-        print("-" * 50)
-        print(f"✅ Total notifications sent: {len(notifications_sent)}")
+        for notification in notifications:
+            notification['idempotency_key'] = idempotency_key(alert_data['emergency_id'], notification)
         
-        return {
-            'status': 'success',
-            'notifications_sent': len(notifications_sent),
-            'details': notifications_sent
-        }
+        result = self._deliver(alert_data, notifications, on_result, on_queued, priority, record_pending=True)
+        result['students_notified'] = len(affected_students)
+        result['sends_saved'] = sends_saved
+        return result
     
-    def _create_notification(self, alert_data, student):
-        """Create a formatted notification for a specific student"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    def resume_notifications(self, alert_data, notifications, on_result=None, on_queued=None, priority=PRIORITY_ALERT):
+        """
+        Deliver the pending remainder of an interrupted emergency from the outbox
         
-        subject = f"URGENT: Emergency Alert - {alert_data['emergency_id']}"
+        Args:
+            alert_data: dict containing emergency alert information
+            notifications: pending notification dicts, as recorded in the outbox
+            on_result: optional callback(notification, result) called as each delivery finishes
+            on_queued: optional callback(count) called with the number of notifications before delivery
+            priority: delivery lane the emergency was sent in
         
-        message = f"""
-Dear Parent/Guardian of {student['name']},
-
-URGENT EMERGENCY NOTIFICATION
-
-Emergency ID: {alert_data['emergency_id']}
-Time: {timestamp}
-Student: {student['name']} (ID: {student['student_id']})
-Branch/Section: {student['branch']}-{student['section']}
-
-EMERGENCY DETAILS:
-{alert_data['emergency_message']}
-
-PLEASE TAKE IMMEDIATE ACTION:
-- Ensure your child's safety
-- Follow official emergency procedures
-- Stay tuned for further updates
-- Contact the school if you have any concerns
-
-This is an automated emergency notification system.
-Please do not reply to this email.
-
-School Emergency Communication System
-Generated at: {timestamp}
-
----
-This message was sent to all parents of affected students.
-        """.strip()
+        Returns:
+            dict: Results of the resumed deliveries only
+        """
+        logger.info(
+            f"♻️ RESUMING EMERGENCY NOTIFICATIONS | Emergency ID: {alert_data['emergency_id']} | Pending: {len(notifications)}",
+            extra={'emergency_id': alert_data['emergency_id'], 'pending': len(notifications)}
+        )
+        return self._deliver(alert_data, notifications, on_result, on_queued, priority)
+    
+    def _deliver(self, alert_data, notifications, on_result, on_queued, priority, record_pending=False):
+        """Deliver rendered notifications, recording each outcome (and with record_pending, each recipient) in the outbox"""
+        if on_queued is not None:
+            on_queued(len(notifications))
+        
+        if self.outbox is not None:
+            callback = on_result
+            
+            def on_result(notification, result):
+                self.outbox.record_result(notification['idempotency_key'], result)
+                if callback is not None:
+                    callback(notification, result)
+        
+        if record_pending and self.outbox is not None:
+            # Every recipient is durably pending before the first send, so a crash
+            # at any point of the delivery can be resumed without losing anyone
+            self.outbox.add(alert_data, notifications, priority)
+        
+        # Deliver concurrently; each notification records its own outcome
+        results = self.delivery_engine.deliver(notifications, on_result, priority)
+        if self.outbox is not None:
+            self.outbox.flush()
+        for notification, result in zip(notifications, results):
+            notification['status'] = result['status']
+            notification['attempts'] = result['attempts']
+            if result['status'] == 'failed':
+                notification['error'] = result.get('error')
+        
+        sent_count = sum(1 for result in results if result['status'] == 'sent')
+        failed_count = len(results) - sent_count
+        
+        logger.info(
+            f"✅ Total notifications sent: {sent_count}" + (f" | ❌ Notifications failed: {failed_count}" if failed_count else ""),
+            extra={'emergency_id': alert_data['emergency_id'], 'sent': sent_count, 'failed': failed_count}
+        )
         
         return {
-            'student_id': student['student_id'],
-            'parent_email': student['parent_email'],
-            'subject': subject,
-            'message': message,
-            'timestamp': timestamp,
-            'status': 'sent'
+            'status': 'success' if not failed_count else 'partial_failure',
+            'notifications_sent': sent_count,
+            'notifications_failed': failed_count,
+            'details': notifications
         }
     
-    def send_status_update(self, alert_data, update_message):
-        """Send status update for ongoing emergency"""
+    def get_stats(self):
+        """Cumulative coalescing counters since the agent was created"""
+        with self._stats_lock:
+            return dict(self._stats)
+    
+    def _record_stats(self, students, notifications, sends_saved):
+        with self._stats_lock:
+            self._stats['students_notified'] += students
+            self._stats['notifications_rendered'] += notifications
+            self._stats['sends_saved'] += sends_saved
+    
+    def send_status_update(self, alert_data, update_message, recipients=None):
+        """
+        Send status update for ongoing emergency
+        
+        The update is queued in the delivery engine's status lane, behind every
+        initial alert, and delivered in the background.
+        
+        Args:
+            alert_data: dict containing emergency alert information
+            update_message: text of the update
+            recipients: notifications previously sent for the emergency (one per guardian)
+        
+        Returns:
+            dict: Update details, including how many recipients were queued
+        """
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
-        print(f"\n📢 EMERGENCY STATUS UPDATE")
-        print(f"Emergency ID: {alert_data['emergency_id']}")
-        print(f"Time: {timestamp}")
-        print(f"Update: {update_message}")
-        print("-" * 50)
+        logger.info(
+            f"📢 EMERGENCY STATUS UPDATE | Emergency ID: {alert_data['emergency_id']} | Time: {timestamp} | Update: {update_message}",
+            extra={'emergency_id': alert_data['emergency_id']}
+        )
+        
+        notifications = self.renderer.render_status_update(alert_data, update_message, recipients or [], timestamp)
+        if notifications:
+            future = self.delivery_engine.submit(notifications, priority=PRIORITY_STATUS)
+            future.add_done_callback(lambda done: self._log_status_update(alert_data['emergency_id'], done))
         
         return {
             'emergency_id': alert_data['emergency_id'],
             'update_message': update_message,
             'timestamp': timestamp,
-            'status': 'update_sent'
+            'status': 'update_queued' if notifications else 'no_recipients',
+            'recipients': len(notifications)
         }
+    
+    def _log_status_update(self, emergency_id, future):
+        """Log the outcome of a status update's deliveries"""
+        if future.exception() is not None:
+            logger.error(f"❌ Status update delivery failed: {future.exception()}", extra={'emergency_id': emergency_id})
+            return
+        results = future.result()
+        sent_count = sum(1 for result in results if result['status'] == 'sent')
+        logger.info(
+            f"📢 Status update delivered: {sent_count}/{len(results)}",
+            extra={'emergency_id': emergency_id, 'sent': sent_count, 'failed': len(results) - sent_count}
+        )
@@ -0,0 +1,340 @@
+import string
+from itertools import repeat
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+
+EMERGENCY_SUBJECT_TEMPLATE = "URGENT: Emergency Alert - {emergency_id}"
+
+EMERGENCY_MESSAGE_TEMPLATE = """
+Dear Parent/Guardian of {name},
+
+URGENT EMERGENCY NOTIFICATION
+
+Emergency ID: {emergency_id}
+Time: {timestamp}
+Student: {name} (ID: {student_id})
+Branch/Section: {branch}-{section}
+
+EMERGENCY DETAILS:
+{emergency_message}
+
+PLEASE TAKE IMMEDIATE ACTION:
+- Ensure your child's safety
+- Follow official emergency procedures
+- Stay tuned for further updates
+- Contact the school if you have any concerns
+
+This is an automated emergency notification system.
+Please do not reply to this email.
+
+School Emergency Communication System
+Generated at: {timestamp}
+
+---
+This message was sent to all parents of affected students.
+""".strip()
+
+GUARDIAN_MESSAGE_TEMPLATE = """
+Dear Parent/Guardian,
+
+URGENT EMERGENCY NOTIFICATION
+
+Emergency ID: {emergency_id}
+Time: {timestamp}
+Your children affected by this emergency:
+{students}
+
+EMERGENCY DETAILS:
+{emergency_message}
+
+PLEASE TAKE IMMEDIATE ACTION:
+- Ensure your children's safety
+- Follow official emergency procedures
+- Stay tuned for further updates
+- Contact the school if you have any concerns
+
+This is an automated emergency notification system.
+Please do not reply to this email.
+
+School Emergency Communication System
+Generated at: {timestamp}
+
+---
+This message was sent to all parents of affected students.
+""".strip()
+
+GUARDIAN_STUDENT_LINE_TEMPLATE = "- {name} (ID: {student_id}), Branch/Section: {branch}-{section}"
+
+STATUS_UPDATE_SUBJECT_TEMPLATE = "UPDATE: Emergency Alert - {emergency_id}"
+
+STATUS_UPDATE_MESSAGE_TEMPLATE = """
+Dear Parent/Guardian,
+
+EMERGENCY STATUS UPDATE
+
+Emergency ID: {emergency_id}
+Time: {timestamp}
+
+{update_message}
+
+This is an automated emergency notification system.
+Please do not reply to this email.
+
+School Emergency Communication System
+""".strip()
+
+
+def guardian_codes(emails):
+    """
+    Group parent emails by guardian
+
+    Emails are compared trimmed and case-insensitively. Only the distinct
+    emails are normalized, so siblings' repeated emails cost one lookup.
+    Emails that are empty once trimmed count as missing.
+
+    Returns:
+        ndarray: One code per email; every missing email gets a code of its own
+    """
+    codes, uniques = pd.factorize(emails)
+    normalized = pd.Index(uniques).astype(str).str.strip().str.lower()
+    # Blank emails factorize to -1, like missing ones
+    guardians, _ = pd.factorize(normalized.where(normalized != ''))
+    codes = guardians[codes] if len(guardians) else codes
+    codes[pd.isna(emails)] = -1
+    missing = codes < 0
+    if missing.any():
+        codes[missing] = codes.max(initial=-1) + 1 + np.arange(missing.sum())
+    return codes
+
+
+class CompiledTemplate:
+    """
+    A str.format-style template parsed once into literal and field parts.
+
+    Fields are either per-emergency constants (folded into the literals once
+    per render) or roster columns (converted to strings once per column), and
+    every message is then assembled in a single join pass over the columns, so
+    rendering never re-parses the template or touches pandas rows one at a time.
+    """
+
+    def __init__(self, template):
+        self.template = template
+        self.parts = []
+        for literal, field, _, _ in string.Formatter().parse(template):
+            if literal:
+                self.parts.append((True, literal))
+            if field is not None:
+                self.parts.append((False, field))
+
+    def render(self, frame, constants):
+        """
+        Render the template for every row of a frame
+
+        Args:
+            frame: DataFrame supplying the column fields
+            constants: dict of per-render values; takes precedence over columns
+
+        Returns:
+            list: One rendered string per row, in frame order
+        """
+        # Fold constants into the neighbouring literals so each column is converted once
+        chunks = []
+        columns = {}
+        for is_literal, value in self.parts:
+            if is_literal:
+                text = value
+            elif value in constants:
+                text = str(constants[value])
+            else:
+                if value not in columns:
+                    columns[value] = frame[value].astype(str).tolist()
+                chunks.append(columns[value])
+                continue
+            if chunks and isinstance(chunks[-1], str):
+                chunks[-1] += text
+            else:
+                chunks.append(text)
+
+        if not columns:
+            return [''.join(chunks)] * len(frame)
+
+        # One join per row over the column lists: a single C-level pass with one allocation per message
+        streams = [repeat(chunk) if isinstance(chunk, str) else chunk for chunk in chunks]
+        return list(map(''.join, zip(*streams)))
+
+
+class NotificationRenderer:
+    """Renders the emergency notifications for a whole affected-students frame in one pass"""
+
+    def __init__(self, subject_template=EMERGENCY_SUBJECT_TEMPLATE, message_template=EMERGENCY_MESSAGE_TEMPLATE,
+                 guardian_message_template=GUARDIAN_MESSAGE_TEMPLATE,
+                 guardian_student_line_template=GUARDIAN_STUDENT_LINE_TEMPLATE,
+                 status_update_subject_template=STATUS_UPDATE_SUBJECT_TEMPLATE,
+                 status_update_message_template=STATUS_UPDATE_MESSAGE_TEMPLATE):
+        self.subject_template = CompiledTemplate(subject_template)
+        self.message_template = CompiledTemplate(message_template)
+        self.guardian_message_template = CompiledTemplate(guardian_message_template)
+        self.guardian_student_line_template = CompiledTemplate(guardian_student_line_template)
+        self.status_update_subject_template = status_update_subject_template
+        self.status_update_message_template = status_update_message_template
+
+    def render(self, alert_data, affected_students, timestamp=None):
+        """
+        Render one notification per affected student
+
+        Args:
+            alert_data: dict containing emergency alert information
+            affected_students: DataFrame containing affected student information
+            timestamp: time stamped on every notification (default: now, computed once)
+
+        Returns:
+            list: Notification dicts in affected_students order
+        """
+        if timestamp is None:
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        constants = {
+            'emergency_id': alert_data['emergency_id'],
+            'emergency_message': alert_data['emergency_message'],
+            'timestamp': timestamp
+        }
+
+        columns = {
+            'student_id': affected_students['student_id'].tolist(),
+            'student_name': affected_students['name'].astype(str).tolist(),
+            'branch': affected_students['branch'].astype(str).tolist(),
+            'section': affected_students['section'].astype(str).tolist(),
+            'parent_email': affected_students['parent_email'].tolist(),
+            'subject': self.subject_template.render(affected_students, constants),
+            'message': self.message_template.render(affected_students, constants),
+            'timestamp': repeat(timestamp),
+            'status': repeat('queued')
+        }
+        keys = list(columns)
+        return [dict(zip(keys, row)) for row in zip(*columns.values())]
+
+    def render_by_guardian(self, alert_data, affected_students, timestamp=None):
+        """
+        Render one notification per guardian
+
+        Students are grouped by normalized parent email. A guardian with one
+        affected student gets the regular message; a guardian with several
+        gets a single combined message listing every affected child. Students
+        without a parent email are never grouped.
+
+        Args:
+            alert_data: dict containing emergency alert information
+            affected_students: DataFrame containing affected student information
+            timestamp: time stamped on every notification (default: now, computed once)
+
+        Returns:
+            list: Notification dicts ordered by each guardian's first affected student;
+                'student_ids' lists the students a notification covers
+        """
+        if timestamp is None:
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        codes = guardian_codes(affected_students['parent_email'])
+        shared = np.bincount(codes)[codes] > 1
+
+        # Each notification goes in the slot of its first student; the other slots stay empty
+        slots = [None] * len(affected_students)
+        single_positions = np.flatnonzero(~shared)
+        singles = self.render(alert_data, affected_students.iloc[single_positions], timestamp)
+        for position, notification in zip(single_positions.tolist(), singles):
+            notification['student_ids'] = [notification['student_id']]
+            slots[position] = notification
+
+        shared_positions = np.flatnonzero(shared)
+        if len(shared_positions):
+            for position, notification in self._render_combined(
+                alert_data, affected_students, shared_positions, codes[shared_positions], timestamp
+            ):
+                slots[position] = notification
+
+        return [notification for notification in slots if notification is not None]
+
+    def _render_combined(self, alert_data, affected_students, positions, codes, timestamp):
+        """Render combined notifications for guardians with several affected students"""
+        siblings = affected_students.iloc[positions]
+        lines = self.guardian_student_line_template.render(siblings, {})
+        student_ids = siblings['student_id'].tolist()
+        names = siblings['name'].astype(str).tolist()
+        branches = siblings['branch'].astype(str).tolist()
+        sections = siblings['section'].astype(str).tolist()
+        emails = siblings['parent_email'].tolist()
+
+        # Stable sort keeps each guardian's children in roster order
+        order = np.argsort(codes, kind='stable')
+        bounds = [0] + (np.flatnonzero(np.diff(codes[order])) + 1).tolist() + [len(order)]
+        order = order.tolist()
+        groups = [order[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+        positions = positions.tolist()
+        guardians = pd.DataFrame({
+            'students': ['\n'.join(lines[row] for row in rows) for rows in groups],
+        })
+
+        constants = {
+            'emergency_id': alert_data['emergency_id'],
+            'emergency_message': alert_data['emergency_message'],
+            'timestamp': timestamp
+        }
+        subjects = self.subject_template.render(guardians, constants)
+        messages = self.guardian_message_template.render(guardians, constants)
+
+        for rows, subject, message in zip(groups, subjects, messages):
+            first = rows[0]
+            yield positions[first], {
+                'student_id': student_ids[first],
+                'student_ids': [student_ids[row] for row in rows],
+                'student_name': ', '.join(names[row] for row in rows),
+                'branch': ', '.join(dict.fromkeys(branches[row] for row in rows)),
+                'section': ', '.join(dict.fromkeys(sections[row] for row in rows)),
+                'parent_email': emails[first],
+                'subject': subject,
+                'message': message,
+                'timestamp': timestamp,
+                'status': 'queued'
+            }
+
+    def render_status_update(self, alert_data, update_message, recipients, timestamp=None):
+        """
+        Render a status update for the guardians already notified of an emergency
+
+        The text does not depend on the recipient, so it is rendered once and shared.
+
+        Args:
+            alert_data: dict containing emergency alert information
+            update_message: text of the update
+            recipients: notifications previously sent for the emergency (one per guardian)
+            timestamp: time stamped on every notification (default: now)
+
+        Returns:
+            list: One notification dict per recipient
+        """
+        if timestamp is None:
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        fields = {
+            'emergency_id': alert_data['emergency_id'],
+            'update_message': update_message,
+            'timestamp': timestamp
+        }
+        subject = self.status_update_subject_template.format(**fields)
+        message = self.status_update_message_template.format(**fields)
+        return [
+            {
+                'student_id': recipient.get('student_id'),
+                'student_ids': recipient.get('student_ids') or [recipient.get('student_id')],
+                'student_name': recipient.get('student_name'),
+                'parent_email': recipient['parent_email'],
+                'subject': subject,
+                'message': message,
+                'timestamp': timestamp,
+                'status': 'queued'
+            }
+            for recipient in recipients
+        ]
@@ -0,0 +1,397 @@
+import atexit
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from .agent_logging import get_logger
+
+logger = get_logger('outbox')
+
+
+def idempotency_key(emergency_id, notification):
+    """
+    Stable key of one notification of an emergency
+
+    Every student is covered by exactly one notification, so the first
+    student it covers identifies it, with or without guardian coalescing.
+    """
+    return f"{emergency_id}/{notification['student_id']}"
+
+
+class Outbox:
+    """
+    Crash-safe record of every notification an emergency must deliver.
+
+    Before delivery starts, every recipient of an emergency gets a row in a
+    SQLite database (WAL mode) keyed by its idempotency key, in state
+    'pending', all in one transaction: a crash before it commits leaves
+    nothing recorded and nothing sent. Delivery results are buffered and
+    written in batches ('sent' or 'failed', with the attempt count and error)
+    by a background thread, so a crash loses at most `batch_size` results or
+    `flush_interval` seconds of them; the notifications behind them are the
+    only ones that can be sent twice, and they reuse their idempotency key as
+    the email's Message-ID, so duplicates can still be recognized.
+
+    Each emergency is owned by the process delivering it, which proves it is
+    alive by a heartbeat. Emergencies whose owner stopped heartbeating for
+    `lease` seconds are orphans: the watcher thread of any live process
+    claims them and hands them to `on_orphans`, which resumes exactly the
+    pending remainder. A live process whose delivery of an emergency fails
+    releases it, and it is claimed again like an orphan once `lease` seconds
+    have passed. Emergencies created more than `resume_deadline` seconds ago
+    are not resumed: their pending notifications are marked 'abandoned'.
+    Completed emergencies are deleted `retention` seconds after completion.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS outbox_emergencies (
+            emergency_id TEXT PRIMARY KEY,
+            alert_data TEXT NOT NULL,
+            priority INTEGER NOT NULL,
+            owner TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            completed_at REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_outbox_emergencies_completed_at ON outbox_emergencies (completed_at);
+        CREATE TABLE IF NOT EXISTS outbox (
+            idempotency_key TEXT PRIMARY KEY,
+            emergency_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            parent_email TEXT,
+            state TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            notification TEXT,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_outbox_emergency_state ON outbox (emergency_id, state);
+        CREATE TABLE IF NOT EXISTS outbox_owners (
+            owner TEXT PRIMARY KEY,
+            heartbeat REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path, batch_size=100, flush_interval=0.2, heartbeat_interval=2.0, lease=15.0,
+                 on_orphans=None, resume_deadline=1800.0, retention=7 * 24 * 3600.0):
+        """
+        Args:
+            path: SQLite database file (':memory:' for a throwaway outbox)
+            batch_size: number of buffered delivery results that triggers a write
+            flush_interval: maximum seconds a delivery result stays buffered
+            heartbeat_interval: seconds between heartbeats (and orphan checks)
+            lease: seconds without a heartbeat after which an owner's emergencies are orphans
+            on_orphans: optional callback(emergency_ids) for emergencies claimed from dead owners
+            resume_deadline: seconds after an emergency was created after which it is abandoned
+                rather than resumed (None to always resume)
+            retention: seconds completed emergencies are kept for (None to keep them forever)
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.lease = lease
+        self.on_orphans = on_orphans
+        self.resume_deadline = resume_deadline
+        self.retention = retention
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._conn = sqlite3.connect(path, timeout=10.0, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=FULL')
+        self._conn.executescript(self.SCHEMA)
+        self._conn.commit()
+        # Guards the connection, held during database writes
+        self._lock = threading.RLock()
+        # Guards only the results buffer, so recording a result never waits for an fsync
+        self._results_lock = threading.Lock()
+        self._results = []
+        self._heartbeat()
+
+        self._stopped = threading.Event()
+        self._flush_wanted = threading.Event()
+        self._watcher = None
+        atexit.register(self.close)
+
+    def start(self):
+        """Start heartbeating, flushing results and adopting orphans in the background"""
+        if self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, name='outbox-watcher', daemon=True)
+        self._watcher.start()
+
+    def add(self, alert_data, notifications, priority):
+        """
+        Record every notification of an emergency as pending, in one transaction
+
+        Call before the first notification is sent. Notifications whose
+        idempotency key is already recorded keep their state.
+
+        Args:
+            alert_data: dict containing emergency alert information
+            notifications: notification dicts, each with an 'idempotency_key'
+            priority: delivery lane the notifications are sent in
+        """
+        now = time.time()
+        # Encoded while the rows are inserted, so no second copy of a large emergency is held
+        rows = (
+            (
+                notification['idempotency_key'], alert_data['emergency_id'], seq,
+                notification.get('parent_email'), _encode(notification), now
+            )
+            for seq, notification in enumerate(notifications)
+        )
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO outbox_emergencies (emergency_id, alert_data, priority, owner, created_at) '
+                'VALUES (?, ?, ?, ?, ?) ON CONFLICT(emergency_id) DO UPDATE SET owner = excluded.owner',
+                (alert_data['emergency_id'], _encode(alert_data), priority, self.owner, now)
+            )
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO outbox '
+                '(idempotency_key, emergency_id, seq, parent_email, notification, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                rows
+            )
+
+    def record_result(self, key, result):
+        """Buffer a delivery result; written with the next batch"""
+        row = (result['status'], result.get('attempts', 0), result.get('error'), time.time(), key)
+        with self._results_lock:
+            self._results.append(row)
+            full = len(self._results) >= self.batch_size
+        if full:
+            # Written by the watcher thread: results arrive on the delivery event loop, which must not block
+            self._flush_wanted.set()
+
+    def flush(self):
+        """Write all buffered delivery results in a single transaction"""
+        with self._lock:
+            with self._results_lock:
+                if not self._results:
+                    return
+                rows, self._results = self._results, []
+            with self._conn:
+                self._conn.executemany(
+                    'UPDATE outbox SET state = ?, attempts = attempts + ?, error = ?, updated_at = ? '
+                    'WHERE idempotency_key = ?',
+                    rows
+                )
+
+    def get_emergency(self, emergency_id):
+        """
+        Get an emergency's alert data and delivery priority
+
+        Returns:
+            tuple: (alert_data, priority), or (None, None) if unknown
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT alert_data, priority FROM outbox_emergencies WHERE emergency_id = ?', (emergency_id,)
+            ).fetchone()
+        if row is None:
+            return None, None
+        return json.loads(row[0]), row[1]
+
+    def pending(self, emergency_id):
+        """Notifications of an emergency not yet delivered, in their original order"""
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT notification FROM outbox WHERE emergency_id = ? AND state = 'pending' ORDER BY seq",
+                (emergency_id,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def notifications(self, emergency_id):
+        """Every notification of an emergency with its delivery state, attempts and error"""
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT notification, state, attempts, error FROM outbox WHERE emergency_id = ? ORDER BY seq',
+                (emergency_id,)
+            ).fetchall()
+        notifications = []
+        for record, state, attempts, error in rows:
+            notification = json.loads(record) if record else {}
+            notification.update(status=state, attempts=attempts)
+            if error:
+                notification['error'] = error
+            notifications.append(notification)
+        return notifications
+
+    def counts(self, emergency_id):
+        """Number of an emergency's notifications per state"""
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT state, COUNT(*) FROM outbox WHERE emergency_id = ? GROUP BY state', (emergency_id,)
+            ).fetchall()
+        counts = {'pending': 0, 'sent': 0, 'failed': 0}
+        counts.update(dict(rows))
+        return counts
+
+    def release(self, emergency_id):
+        """
+        Give up an emergency whose delivery failed in this process
+
+        It is claimed again, by any live process including this one, once
+        `lease` seconds have passed, as if its owner had stopped.
+        """
+        self.flush()
+        released = f"released:{self.owner}"
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                'UPDATE outbox_emergencies SET owner = ? WHERE emergency_id = ? AND owner = ? AND completed_at IS NULL',
+                (released, emergency_id, self.owner)
+            )
+            if cursor.rowcount:
+                # A pseudo owner whose last heartbeat is now: its lease runs out like a stopped process's
+                self._conn.execute(
+                    'INSERT INTO outbox_owners (owner, heartbeat) VALUES (?, ?) '
+                    'ON CONFLICT(owner) DO UPDATE SET heartbeat = excluded.heartbeat',
+                    (released, time.time())
+                )
+
+    def complete(self, emergency_id):
+        """
+        Mark an emergency as fully handled once its history is recorded
+
+        The per-recipient rows (who was reached, attempts, errors) are kept;
+        the message bodies are dropped, as they will not be sent again.
+        """
+        self.flush()
+        with self._lock, self._conn:
+            self._conn.execute(
+                'UPDATE outbox_emergencies SET completed_at = ? WHERE emergency_id = ?', (time.time(), emergency_id)
+            )
+            self._conn.execute(
+                "UPDATE outbox SET notification = NULL WHERE emergency_id = ? AND state != 'pending'", (emergency_id,)
+            )
+
+    def claim_orphans(self):
+        """
+        Take over the unfinished emergencies of owners whose lease expired
+
+        Orphans created before the resume deadline are claimed too, but closed
+        at once: their pending notifications are marked 'abandoned' instead of
+        being sent long after the emergency.
+
+        Returns:
+            list: IDs of the emergencies now owned by this process and to be resumed
+        """
+        now = time.time()
+        claimed = []
+        abandoned = []
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                'SELECT e.emergency_id, e.owner, e.created_at FROM outbox_emergencies e '
+                'LEFT JOIN outbox_owners o ON o.owner = e.owner '
+                'WHERE e.completed_at IS NULL AND e.owner != ? AND (o.heartbeat IS NULL OR o.heartbeat < ?)',
+                (self.owner, now - self.lease)
+            ).fetchall()
+            for emergency_id, owner, created_at in rows:
+                # Compare-and-set: another live process may claim the same orphan
+                cursor = self._conn.execute(
+                    'UPDATE outbox_emergencies SET owner = ? WHERE emergency_id = ? AND owner = ?',
+                    (self.owner, emergency_id, owner)
+                )
+                if not cursor.rowcount:
+                    continue
+                if self.resume_deadline is not None and created_at < now - self.resume_deadline:
+                    self._conn.execute(
+                        "UPDATE outbox SET state = 'abandoned', error = 'resume deadline passed', updated_at = ? "
+                        "WHERE emergency_id = ? AND state = 'pending'",
+                        (now, emergency_id)
+                    )
+                    self._conn.execute(
+                        'UPDATE outbox_emergencies SET completed_at = ? WHERE emergency_id = ?', (now, emergency_id)
+                    )
+                    abandoned.append(emergency_id)
+                else:
+                    claimed.append(emergency_id)
+        if abandoned:
+            logger.warning(
+                f"⌛ Abandoned {len(abandoned)} unfinished emergencies past the resume deadline: {', '.join(abandoned)}"
+            )
+        return claimed
+
+    def prune(self):
+        """
+        Delete emergencies completed more than `retention` seconds ago, with their notifications
+
+        Returns:
+            int: Number of emergencies deleted
+        """
+        if self.retention is None:
+            return 0
+        cutoff = time.time() - self.retention
+        with self._lock, self._conn:
+            self._conn.execute(
+                'DELETE FROM outbox WHERE emergency_id IN '
+                '(SELECT emergency_id FROM outbox_emergencies WHERE completed_at < ?)',
+                (cutoff,)
+            )
+            cursor = self._conn.execute('DELETE FROM outbox_emergencies WHERE completed_at < ?', (cutoff,))
+        return cursor.rowcount
+
+    def close(self):
+        """Stop the watcher, write buffered results and close the database"""
+        self._stopped.set()
+        self._flush_wanted.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+        with self._lock:
+            if self._conn is None:
+                return
+            self.flush()
+            self._conn.close()
+            self._conn = None
+
+    def _heartbeat(self):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO outbox_owners (owner, heartbeat) VALUES (?, ?) '
+                'ON CONFLICT(owner) DO UPDATE SET heartbeat = excluded.heartbeat',
+                (self.owner, now)
+            )
+            # Long-dead owners: a missing owner counts as dead anyway
+            self._conn.execute('DELETE FROM outbox_owners WHERE heartbeat < ?', (now - 10 * self.lease,))
+
+    def _watch(self):
+        last_heartbeat = 0.0
+        while not self._stopped.is_set():
+            self._flush_wanted.wait(self.flush_interval)
+            self._flush_wanted.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                self.flush()
+                if time.monotonic() - last_heartbeat < self.heartbeat_interval:
+                    continue
+                last_heartbeat = time.monotonic()
+                self._heartbeat()
+                orphans = self.claim_orphans()
+                if orphans:
+                    logger.warning(f"♻️ Resuming {len(orphans)} emergencies left unfinished by a stopped worker")
+                    if self.on_orphans is not None:
+                        self.on_orphans(orphans)
+                self.prune()
+            except Exception as e:
+                logger.exception(f"❌ Outbox watcher error: {e}")
+
+
+def _encode(value):
+    if orjson is not None:
+        return orjson.dumps(value, default=str, option=orjson.OPT_SERIALIZE_NUMPY).decode('utf-8')
+    return json.dumps(value, default=str)
@@ -0,0 +1,64 @@
+import gzip
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def dumps(payload):
+    """
+    Serialize a payload to compact JSON bytes
+
+    Uses orjson when it is installed (NumPy arrays are serialized natively);
+    otherwise the standard library, with NumPy arrays converted to lists.
+    """
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, separators=(',', ':'), default=_to_list).encode('utf-8')
+
+
+def negotiate_encoding(accept_encoding):
+    """
+    Pick the response compression from an Accept-Encoding header
+
+    Returns:
+        str or None: 'br' (if brotli is installed), 'gzip', or None
+    """
+    accepted = set()
+    for token in (accept_encoding or '').split(','):
+        name, _, params = token.partition(';')
+        # 'gzip;q=0' explicitly refuses an encoding
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(name.strip().lower())
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding):
+    """Compress a response body with the encoding chosen by negotiate_encoding"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    return body
+
+
+def _to_list(value):
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,340 @@
+import numpy as np
+import pandas as pd
+
+
+# Use a dense bitmap for exclusion sets whose ID span is at most this many
+# entries per excluded ID (or under BITMAP_MIN_SPAN); otherwise binary search
+BITMAP_DENSITY = 64
+BITMAP_MIN_SPAN = 1 << 20
+
+
+def parse_student_ids(student_ids):
+    """
+    Parse student IDs sent by the dashboard (ints or numeric strings) into a typed array
+
+    Returns:
+        ndarray: Sorted, unique int64 student IDs
+
+    Raises:
+        ValueError: if student_ids is not a list of integers or numeric strings
+    """
+    if student_ids is None:
+        return np.empty(0, dtype=np.int64)
+    if isinstance(student_ids, (str, bytes, dict)):
+        raise ValueError("Student IDs must be a list")
+    values = np.asarray(student_ids)
+    if values.ndim != 1:
+        raise ValueError("Student IDs must be a flat list")
+    if not len(values):
+        return np.empty(0, dtype=np.int64)
+    try:
+        ids = values.astype(np.int64)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError("Student IDs must be integers") from None
+    if values.dtype.kind == 'b' or (values.dtype.kind == 'f' and not np.array_equal(ids, values)):
+        raise ValueError("Student IDs must be integers")
+    return np.unique(ids)
+
+
+def exclusion_mask(student_ids, excluded_ids):
+    """
+    Mark which student IDs are in an exclusion set
+
+    Args:
+        student_ids: int64 array of IDs to test
+        excluded_ids: sorted, unique int64 array (see parse_student_ids)
+
+    Returns:
+        ndarray: Boolean mask, True where the student is excluded
+    """
+    mask = np.zeros(len(student_ids), dtype=bool)
+    if not len(student_ids) or not len(excluded_ids):
+        return mask
+
+    low, high = excluded_ids[0], excluded_ids[-1]
+    in_range = (student_ids >= low) & (student_ids <= high)
+    candidates = student_ids[in_range]
+    span = int(high - low) + 1
+
+    if span <= max(BITMAP_MIN_SPAN, BITMAP_DENSITY * len(excluded_ids)):
+        bitmap = np.zeros(span, dtype=bool)
+        bitmap[excluded_ids - low] = True
+        mask[in_range] = bitmap[candidates - low]
+    else:
+        positions = np.searchsorted(excluded_ids, candidates)
+        mask[in_range] = excluded_ids[positions] == candidates
+    return mask
+
+
+class RosterIndex:
+    """
+    Prebuilt positional index over the student roster.
+
+    The branch and section columns are categorical-encoded and the row
+    positions for every branch and every (branch, section) pair are computed
+    once, so resolving an emergency target is a dictionary lookup followed by
+    an array slice instead of a full-table copy and scan.
+    """
+
+    CATEGORICAL_COLUMNS = ('branch', 'section')
+
+    def __init__(self, students_data):
+        """
+        Build the index for a roster
+
+        Args:
+            students_data: DataFrame containing student information
+
+        The DataFrame is encoded in place (branch/section become categoricals)
+        and kept as the frame that all positions refer to.
+        """
+        self.students_data = self.encode(students_data)
+        self.student_ids = (
+            students_data['student_id'].to_numpy(dtype=np.int64)
+            if 'student_id' in students_data.columns else np.empty(0, dtype=np.int64)
+        )
+        self.branch_positions = {}
+        self.section_positions = {}
+        self._empty = np.empty(0, dtype=np.intp)
+
+        if not self.students_data.empty and all(
+            column in self.students_data.columns for column in self.CATEGORICAL_COLUMNS
+        ):
+            self._build()
+
+    @classmethod
+    def rebuild(cls, previous, students_data):
+        """
+        Build the index for a new version of a roster, reusing a previous index where possible
+
+        Positions depend only on the student_id, branch and section columns. If
+        those are unchanged for every row of the previous roster (edits to other
+        columns, or rows appended at the end), the previous groups are kept and
+        only the appended rows are grouped; otherwise the index is built from scratch.
+
+        Args:
+            previous: RosterIndex over the previous version of the roster (or None)
+            students_data: DataFrame with the new version of the roster
+
+        Returns:
+            RosterIndex: Index over students_data
+        """
+        columns = ('student_id',) + cls.CATEGORICAL_COLUMNS
+        if (previous is None or not previous.branch_positions or len(students_data) < len(previous)
+                or not all(column in students_data.columns for column in columns)):
+            return cls(students_data)
+
+        index = cls.__new__(cls)
+        index.students_data = cls.encode(students_data)
+        index.student_ids = students_data['student_id'].to_numpy(dtype=np.int64)
+        index._empty = previous._empty
+
+        n = len(previous)
+        if not np.array_equal(index.student_ids[:n], previous.student_ids) or not all(
+            index._same_prefix(previous, column, n) for column in cls.CATEGORICAL_COLUMNS
+        ):
+            return cls(students_data)
+
+        index.branch_positions = dict(previous.branch_positions)
+        index.section_positions = dict(previous.section_positions)
+        if len(students_data) > n:
+            index._build(start=n)
+        return index
+
+    def _same_prefix(self, previous, column, n):
+        """Check that the first n values of a categorical column match the previous index's frame"""
+        old = previous.students_data[column].cat
+        new = self.students_data[column].cat
+        # Translate the old codes into the new categories and compare integers
+        translation = np.append(new.categories.get_indexer(old.categories), -1)
+        old_codes = translation[old.codes.to_numpy().astype(np.intp)]
+        return np.array_equal(old_codes, new.codes.to_numpy()[:n])
+
+    @classmethod
+    def encode(cls, students_data):
+        """Convert branch/section to categorical columns (no-op if already encoded)"""
+        for column in cls.CATEGORICAL_COLUMNS:
+            if column in students_data.columns and not isinstance(
+                students_data[column].dtype, pd.CategoricalDtype
+            ):
+                students_data[column] = students_data[column].astype('category')
+        return students_data
+
+    def _build(self, start=0):
+        """Group row positions by branch and by (branch, section), for rows from `start` on"""
+        branch_col = self.students_data['branch']
+        section_col = self.students_data['section']
+        branches = branch_col.cat.categories
+        sections = section_col.cat.categories
+
+        branch_codes = branch_col.cat.codes.to_numpy()[start:].astype(np.intp)
+        section_codes = section_col.cat.codes.to_numpy()[start:].astype(np.intp)
+        # Rows missing a branch have no (branch, section) pair either
+        pair_codes = np.where(
+            (branch_codes >= 0) & (section_codes >= 0), branch_codes * len(sections) + section_codes, -1
+        )
+
+        for code, positions in self._group_positions(branch_codes, len(branches)):
+            self._add_group(self.branch_positions, branches[code], positions + start)
+
+        for code, positions in self._group_positions(pair_codes, len(branches) * len(sections)):
+            branch_code, section_code = divmod(code, len(sections))
+            self._add_group(self.section_positions, (branches[branch_code], sections[section_code]), positions + start)
+
+    @staticmethod
+    def _add_group(groups, key, positions):
+        """Add positions to a group, appending to (never mutating) any existing array"""
+        existing = groups.get(key)
+        groups[key] = positions if existing is None else np.concatenate((existing, positions))
+
+    @staticmethod
+    def _group_positions(codes, n_groups):
+        """Yield (code, sorted row positions) for every non-empty group of codes"""
+        # Rows with missing values are encoded as -1 and are never targeted
+        valid = codes >= 0
+        counts = np.bincount(codes[valid], minlength=n_groups)
+        order = np.argsort(np.where(valid, codes, n_groups), kind='stable')
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+        for code in np.flatnonzero(counts):
+            yield int(code), order[offsets[code]:offsets[code + 1]]
+
+    def __len__(self):
+        return len(self.students_data)
+
+    def positions(self, branch, section=None):
+        """
+        Get row positions for a branch, or for a branch and section
+
+        Returns:
+            ndarray: Sorted row positions (empty if the target does not exist)
+        """
+        if section:
+            return self.section_positions.get((branch, section), self._empty)
+        return self.branch_positions.get(branch, self._empty)
+
+    def exclude(self, positions, excluded_ids):
+        """
+        Drop excluded students from a target
+
+        Args:
+            positions: row positions of the target, or None for the whole roster
+            excluded_ids: sorted, unique int64 student IDs (see parse_student_ids)
+
+        Returns:
+            ndarray: Row positions of the target's students that are not excluded
+        """
+        if positions is None:
+            return np.flatnonzero(~exclusion_mask(self.student_ids, excluded_ids))
+        return positions[~exclusion_mask(self.student_ids[positions], excluded_ids)]
+
+    def take(self, positions):
+        """Materialize the roster rows at the given positions"""
+        return self.students_data.iloc[positions]
+
+    def select(self, branch, section=None):
+        """Get the roster rows for a branch, or for a branch and section"""
+        return self.take(self.positions(branch, section))
+
+    def column_values(self, positions, columns):
+        """
+        Read columns at the given positions without materializing a DataFrame
+
+        Returns:
+            dict: Column name -> list of values
+        """
+        return {
+            column: self.students_data[column].to_numpy()[positions].tolist()
+            for column in columns
+        }
+
+    def columnar(self, positions, columns):
+        """
+        Read columns at the given positions in a compact columnar form
+
+        Categorical columns (branch, section) are dictionary-encoded: their
+        values are integer codes into a list of categories (-1 is missing).
+        Numeric columns stay NumPy arrays so fast JSON encoders can write them
+        directly.
+
+        Returns:
+            tuple: (data, dictionaries) - column name -> values, and column name ->
+                categories for the dictionary-encoded columns
+        """
+        data, dictionaries = {}, {}
+        for column in columns:
+            series = self.students_data[column]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                dictionaries[column] = [_native(category) for category in series.cat.categories]
+                data[column] = series.cat.codes.to_numpy()[positions]
+            elif series.dtype.kind in 'biuf':
+                data[column] = series.to_numpy()[positions]
+            else:
+                data[column] = series.to_numpy()[positions].tolist()
+        return data, dictionaries
+
+    def catalog(self):
+        """Build the RosterCatalog (branches, sections and counts) of this roster"""
+        return RosterCatalog(self)
+
+
+class RosterCatalog:
+    """
+    Branches, sections per branch and student counts of one roster version.
+
+    Built once from a RosterIndex's groups (no column scans) and then served
+    from memory. Branches and sections are listed in order of first
+    appearance in the roster, like Series.unique().
+    """
+
+    def __init__(self, roster_index):
+        """
+        Args:
+            roster_index: RosterIndex of the roster version to describe
+        """
+        self.total = len(roster_index)
+        self.branch_counts = {}
+        self.section_counts = {}
+        self.sections_by_branch = {}
+
+        for branch, positions in sorted(roster_index.branch_positions.items(), key=lambda item: item[1][0]):
+            branch = _native(branch)
+            self.branch_counts[branch] = len(positions)
+            self.sections_by_branch[branch] = []
+
+        section_first_rows = {}
+        for (branch, section), positions in sorted(roster_index.section_positions.items(), key=lambda item: item[1][0]):
+            branch, section = _native(branch), _native(section)
+            self.sections_by_branch[branch].append(section)
+            self.section_counts[(branch, section)] = len(positions)
+            section_first_rows.setdefault(section, positions[0])
+
+        self.branches = list(self.branch_counts)
+        self.sections = sorted(section_first_rows, key=section_first_rows.get)
+
+    def sections_for(self, branch=None):
+        """Sections of a branch (all sections if branch is None; empty for an unknown branch)"""
+        if branch:
+            return list(self.sections_by_branch.get(branch, []))
+        return list(self.sections)
+
+    def to_dict(self):
+        """The whole branch/section tree with counts"""
+        return {
+            'total_students': self.total,
+            'branches': [
+                {
+                    'branch': branch,
+                    'count': self.branch_counts[branch],
+                    'sections': [
+                        {'section': section, 'count': self.section_counts[(branch, section)]}
+                        for section in self.sections_by_branch[branch]
+                    ]
+                }
+                for branch in self.branches
+            ]
+        }
+
+
+def _native(value):
+    """Convert NumPy scalars (e.g. numeric section names) to Python values"""
+    return value.item() if isinstance(value, np.generic) else value
@@ -0,0 +1,114 @@
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+
+CHUNK_SIZE = 100_000
+
+# Columns read with explicit compact dtypes; anything else keeps pandas' default
+CATEGORICAL_COLUMNS = ('branch', 'section')
+DEDUPLICATED_COLUMNS = ('parent_email',)
+
+
+def read_roster_csv(csv_path, chunk_size=CHUNK_SIZE):
+    """
+    Read a roster CSV in chunks with compact dtypes
+
+    Only one chunk of raw parsed text is alive at a time. Branch and section
+    are read as categoricals, student_id as int32 (int64 if the IDs do not
+    fit), and repeated parent emails (siblings share a parent) are stored
+    once and shared between rows.
+
+    Args:
+        csv_path: path to the roster CSV file
+        chunk_size: rows parsed per chunk
+
+    Returns:
+        DataFrame: The roster
+    """
+    dtypes = {column: 'category' for column in CATEGORICAL_COLUMNS}
+    dtypes['student_id'] = 'int64'
+
+    parts = {}
+    columns = None
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_size, dtype=dtypes):
+        columns = list(chunk.columns)
+        for column in columns:
+            if column in CATEGORICAL_COLUMNS:
+                values = chunk[column].array
+            elif column == 'student_id':
+                values = _downcast_ids(chunk[column].to_numpy())
+            elif column in DEDUPLICATED_COLUMNS:
+                # Within the chunk first, so duplicates are not held until the end
+                values = _deduplicate(chunk[column])
+            else:
+                # Copy out of the chunk's block so the chunk can be freed
+                values = chunk[column].to_numpy(copy=True)
+            parts.setdefault(column, []).append(values)
+
+    if columns is None:
+        # Header only (or empty file): fall back to pandas for the column names
+        return pd.read_csv(csv_path, dtype=dtypes)
+
+    data = {}
+    for column in columns:
+        data[column] = _concat(column, parts.pop(column))
+        if column in DEDUPLICATED_COLUMNS:
+            # Then across chunks
+            data[column] = _deduplicate(data[column])
+    return pd.DataFrame(data, columns=columns, copy=False)
+
+
+class PeakMemory:
+    """
+    Peak memory allocated inside a `with` block, in MB (`peak_mb`, set on exit)
+
+    Measured with tracemalloc, which sees Python objects and NumPy/pandas
+    buffers, relative to what was allocated when the block started. Memory
+    mapped files (a compiled roster's columns) are not allocations and are not
+    counted. Tracing slows allocation down, so it only runs inside the block.
+    """
+
+    def __init__(self):
+        self.peak_mb = None
+        self._started = False
+        self._baseline = 0
+
+    def __enter__(self):
+        self._started = not tracemalloc.is_tracing()
+        if self._started:
+            tracemalloc.start()
+        else:
+            tracemalloc.reset_peak()
+        self._baseline = tracemalloc.get_traced_memory()[0]
+        return self
+
+    def __exit__(self, *exc_info):
+        peak = tracemalloc.get_traced_memory()[1]
+        if self._started:
+            tracemalloc.stop()
+        self.peak_mb = max(0, peak - self._baseline) / (1024 * 1024)
+
+
+def _downcast_ids(student_ids):
+    info = np.iinfo(np.int32)
+    if len(student_ids) and (student_ids.min() < info.min or student_ids.max() > info.max):
+        return student_ids
+    return student_ids.astype(np.int32)
+
+
+def _deduplicate(values):
+    """Replace every string with one shared copy of each distinct value"""
+    codes, uniques = pd.factorize(values)
+    shared = np.append(np.asarray(uniques, dtype=object), np.nan)
+    # Missing values are coded -1, which picks the trailing NaN
+    return shared[codes]
+
+
+def _concat(column, parts):
+    if column in CATEGORICAL_COLUMNS:
+        return union_categoricals(parts)
+    # IDs are promoted to int64 if any chunk needed it
+    return np.concatenate(parts)
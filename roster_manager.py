@@ -0,0 +1,212 @@
+import os
+import threading
+import time
+
+import pandas as pd
+
+from .agent_logging import get_logger
+from .compiled_roster import compile_roster, load_compiled_roster, retire_compiled_versions
+from .roster_index import RosterIndex
+from .roster_loader import PeakMemory, read_roster_csv
+
+logger = get_logger('roster')
+
+
+class RosterSnapshot:
+    """
+    One loaded version of the student roster and its index.
+
+    Snapshots are never modified after they are published: a reload builds a
+    new snapshot and swaps it in, so anything holding a snapshot (such as an
+    emergency being processed) keeps a consistent view of the roster.
+    """
+
+    __slots__ = ('students_data', 'roster_index', 'catalog', 'version', 'signature', 'loaded_at')
+
+    def __init__(self, roster_index, version, signature, loaded_at=None):
+        self.students_data = roster_index.students_data
+        self.roster_index = roster_index
+        # Branch/section catalog, built once per roster version
+        self.catalog = roster_index.catalog()
+        self.version = version
+        self.signature = signature
+        self.loaded_at = loaded_at or time.time()
+
+    @property
+    def tag(self):
+        """
+        Identifier of this roster version, the same in every process that loaded
+        the same file (the version counter is per process)
+        """
+        if self.signature is None:
+            return 'roster-empty'
+        mtime_ns, size = self.signature
+        return f"roster-{mtime_ns:x}-{size:x}"
+
+    def __len__(self):
+        return len(self.students_data)
+
+
+class RosterManager:
+    """
+    Keeps the current roster snapshot in sync with the roster CSV.
+
+    A background watcher compares the file's modification time and size every
+    `poll_interval` seconds and only re-reads the file when they change. The
+    new roster is parsed and validated on the watcher thread and published by
+    swapping a single reference, so readers never block on a reload and never
+    see a half-loaded roster. A roster that fails validation is logged and
+    ignored; the previous snapshot stays current.
+
+    With `compiled` enabled, every CSV that is parsed is also written in the
+    compiled roster format (see compiled_roster.py) and later loads of the
+    same CSV version are memory-mapped from it instead of parsed.
+    """
+
+    REQUIRED_COLUMNS = ('student_id', 'name', 'branch', 'section', 'parent_email')
+
+    def __init__(self, csv_path, poll_interval=2.0, compiled=True):
+        """
+        Load the roster synchronously
+
+        Args:
+            csv_path: path to the students CSV file
+            poll_interval: seconds between change checks once the watcher is started
+            compiled: load from (and maintain) the compiled roster next to the CSV
+        """
+        self.csv_path = csv_path
+        self.poll_interval = poll_interval
+        self.compiled = compiled
+
+        self._reload_lock = threading.Lock()
+        self._rejected_signature = None
+        self._stopped = threading.Event()
+        self._watcher = None
+
+        self._snapshot = None
+        if not self.reload():
+            self._snapshot = RosterSnapshot(RosterIndex(pd.DataFrame()), version=0, signature=None)
+
+    @property
+    def snapshot(self):
+        """The current RosterSnapshot (read it once and use that object throughout an operation)"""
+        return self._snapshot
+
+    def start(self):
+        """Start watching the roster file for changes in the background"""
+        if self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, name='roster-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        """Stop the background watcher"""
+        self._stopped.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def check(self):
+        """
+        Reload the roster if the file changed since the current snapshot was loaded
+
+        Returns:
+            bool: True if a new snapshot was published
+        """
+        signature = self._signature()
+        if signature is None or signature == self._rejected_signature:
+            return False
+        current = self._snapshot
+        if current is not None and signature == current.signature:
+            return False
+        return self.reload()
+
+    def reload(self):
+        """
+        Parse, validate and publish the roster file
+
+        Returns:
+            bool: True if a new snapshot was published
+        """
+        with self._reload_lock:
+            signature = self._signature()
+            started = time.perf_counter()
+            try:
+                with PeakMemory() as memory:
+                    students_df = load_compiled_roster(self.csv_path) if self.compiled else None
+                    source = 'compiled' if students_df is not None else 'csv'
+                    if students_df is None:
+                        students_df = read_roster_csv(self.csv_path)
+                    self.validate(students_df)
+            except Exception as e:
+                self._rejected_signature = signature
+                logger.error(f"❌ Error loading students data: {e}", extra={'path': self.csv_path})
+                return False
+
+            # The file changed while it was being read: wait for the writer to finish
+            if self._signature() != signature:
+                logger.info("⏳ Roster file changed while loading; will retry", extra={'path': self.csv_path})
+                return False
+
+            if source == 'csv' and self.compiled:
+                self._compile(students_df)
+
+            previous = self._snapshot
+            roster_index = RosterIndex.rebuild(previous.roster_index if previous else None, students_df)
+            version = previous.version + 1 if previous else 1
+            self._snapshot = RosterSnapshot(roster_index, version, signature)
+            self._rejected_signature = None
+            if self.compiled:
+                # Older snapshots keep their mappings; where mapped files cannot be deleted they are retried next reload
+                retire_compiled_versions(self.csv_path)
+
+        logger.info(
+            f"✅ Loaded {len(students_df)} students from dataset (roster version {version}, "
+            f"{source}, {(time.perf_counter() - started) * 1000:.0f} ms, load peak memory {memory.peak_mb:.1f} MB)",
+            extra={
+                'students': len(students_df), 'roster_version': version, 'source': source,
+                'peak_memory_mb': round(memory.peak_mb, 1)
+            }
+        )
+        return True
+
+    @classmethod
+    def validate(cls, students_df):
+        """
+        Check that a parsed roster is usable
+
+        Raises:
+            ValueError: if required columns are missing or student IDs are missing, non-numeric or duplicated
+        """
+        missing = [column for column in cls.REQUIRED_COLUMNS if column not in students_df.columns]
+        if missing:
+            raise ValueError(f"missing columns: {', '.join(missing)}")
+
+        student_ids = pd.to_numeric(students_df['student_id'], errors='coerce')
+        if student_ids.isna().any():
+            raise ValueError("student_id values must be present and numeric")
+        if student_ids.duplicated().any():
+            duplicates = student_ids[student_ids.duplicated()].unique()[:5]
+            raise ValueError(f"duplicate student_id values: {', '.join(str(int(sid)) for sid in duplicates)}")
+
+    def _compile(self, students_df):
+        """Write the compiled roster; failing to is not fatal, the CSV is still loaded"""
+        try:
+            compile_roster(students_df, self.csv_path)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not write compiled roster: {e}", extra={'path': self.csv_path})
+
+    def _signature(self):
+        """(mtime, size) of the roster file, or None if it cannot be read"""
+        try:
+            stat = os.stat(self.csv_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _watch(self):
+        while not self._stopped.wait(self.poll_interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.exception(f"❌ Roster watcher error: {e}")
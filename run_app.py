@@ -1,36 +1,132 @@
 #!/usr/bin/env python3
 """
 Simple script to run the Flask app with error handling
+
+    python run_app.py                           # development server (debug, auto-reload)
+    python run_app.py --production --workers 4  # multi-process production server
 """
 
-import sys
+import argparse
+import importlib.util
 import os
+import socket
+import sys
 
 # Add current directory to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-try:
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def print_banner(port):
     print("🚀 Starting Emergency Communication System...")
-    print("📊 Dashboard: http://localhost:5000")
-    print("📧 Notifications: http://localhost:5000/notifications")
+    print(f"📊 Dashboard: http://localhost:{port}")
+    print(f"📧 Notifications: http://localhost:{port}/notifications")
     print("🔧 API Documentation:")
     print("  - POST /api/emergency/trigger - Trigger emergency")
     print("  - GET /api/emergency/status - Get current status")
+    print("  - GET /api/emergency/stream - Stream status changes (Server-Sent Events)")
+    print("  - GET /api/emergency/<id> - Get a single emergency")
+    print("  - GET /api/emergency/<id>/progress - Get delivery progress")
     print("  - GET /api/emergency/history - Get emergency history")
     print("  - GET /api/notifications/recent - Get recent notifications")
     print("  - POST /api/emergency/resolve - Resolve emergency")
     print("=" * 50)
+
+
+def run_production(host, port, workers, threads):
+    """
+    Serve the app from `workers` processes sharing emergency state
+
+    Uses gunicorn when it is installed. Otherwise the listening socket is
+    opened once and each forked worker serves it with a threaded werkzeug
+    server; the kernel spreads connections across the workers. Workers import
+    the app only after forking, so each has its own database connections and
+    background threads.
+    """
+    os.environ['EMERGENCY_SHARED_STATE'] = '1'
+    
+    if importlib.util.find_spec('gunicorn') is not None:
+        print(f"🏭 Production mode: gunicorn with {workers} workers x {threads} threads")
+        os.execvp(sys.executable, [
+            sys.executable, '-m', 'gunicorn',
+            '--chdir', PROJECT_DIR,
+            '--workers', str(workers),
+            '--worker-class', 'gthread',
+            '--threads', str(threads),
+            '--bind', f"{host}:{port}",
+            'wsgi:app'
+        ])
+    
+    if not hasattr(os, 'fork'):
+        # No fork() on Windows: fall back to one threaded process
+        print("⚠️ Multiple workers need gunicorn or fork(); serving from a single process")
+        from wsgi import app
+        app.run(host=host, port=port, debug=False, threaded=True)
+        return
+    
+    from werkzeug.serving import make_server
+    
+    listener = socket.create_server((host, port), backlog=1024)
+    listener.set_inheritable(True)
+    print(f"🏭 Production mode: {workers} worker processes")
+    
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                from wsgi import app
+                make_server(host, port, app, threaded=True, fd=listener.fileno()).serve_forever()
+            finally:
+                os._exit(0)
+        children.append(pid)
+    
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        for pid in children:
+            try:
+                os.kill(pid, 15)
+            except ProcessLookupError:
+                pass
+    finally:
+        listener.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the Emergency Communication System')
+    parser.add_argument('--production', action='store_true',
+                        help='run without debug mode, with several worker processes')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='worker processes in production mode (default: one per core)')
+    parser.add_argument('--threads', type=int, default=64,
+                        help='threads per worker when running under gunicorn (each open status stream holds one)')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    args = parser.parse_args()
+    
+    print_banner(args.port)
+    
+    if args.production:
+        run_production(args.host, args.port, args.workers, args.threads)
+        return
     
     # Import and run the app
     from app import app
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    app.run(debug=True, host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    try:
+        main()
     
-except ImportError as e:
-    print(f"❌ Import Error: {e}")
-    print("Make sure all dependencies are installed:")
-    print("pip install pandas flask")
+    except ImportError as e:
+        print(f"❌ Import Error: {e}")
+        print("Make sure all dependencies are installed:")
+        print("pip install pandas flask")
     
-except Exception as e:
-    print(f"❌ Error: {e}")
-    print("Check the error details above.")
-
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        print("Check the error details above.")
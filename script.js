@@ -136,7 +136,29 @@ function toggleFilters() {
     }
 }
 
-// Load sections for selected branch
+// Students of the selected branch, fetched once per branch: {sections: {section: [students]}}
+let branchRoster = null;
+
+// Fetch every section of a branch (students included) in one request
+async function fetchBranchRoster(branch) {
+    const response = await fetch(`/api/students/batch?branch=${encodeURIComponent(branch)}`);
+    const payload = await response.json();
+    const sections = {};
+    payload.groups.forEach(group => {
+        sections[group.section] = [];
+        for (let row = group.offset; row < group.offset + group.count; row++) {
+            sections[group.section].push({
+                student_id: payload.data.student_id[row],
+                name: payload.data.name[row],
+                branch: group.branch,
+                section: group.section
+            });
+        }
+    });
+    return { branch: branch, sections: sections };
+}
+
+// Load sections (and their students) for selected branch
 async function loadSections() {
     const branch = document.getElementById('branch').value;
     const sectionSelect = document.getElementById('section');
@@ -145,15 +167,15 @@ async function loadSections() {
     if (!branch) {
         sectionSelect.innerHTML = '<option value="">Select Section</option>';
         studentSelectionGroup.style.display = 'none';
+        branchRoster = null;
         return;
     }
     
     try {
-        const response = await fetch(`/api/sections?branch=${encodeURIComponent(branch)}`);
-        const sections = await response.json();
+        branchRoster = await fetchBranchRoster(branch);
         
         sectionSelect.innerHTML = '<option value="">Select Section</option>';
-        sections.forEach(section => {
+        Object.keys(branchRoster.sections).forEach(section => {
             const option = document.createElement('option');
             option.value = section;
             option.textContent = section;
@@ -163,7 +185,7 @@ async function loadSections() {
         // Hide student selection until section is also selected
         studentSelectionGroup.style.display = 'none';
         
-        // Add change event listener to load students when section is selected
+        // Add change event listener to show students when section is selected
         sectionSelect.onchange = loadStudents;
     } catch (error) {
         console.error('Error loading sections:', error);
@@ -171,7 +193,7 @@ async function loadSections() {
     }
 }
 
-// Load students for selected branch and section
+// Show students for selected branch and section (already loaded with the branch)
 async function loadStudents() {
     const branch = document.getElementById('branch').value;
     const section = document.getElementById('section').value;
@@ -184,10 +206,12 @@ async function loadStudents() {
     }
     
     try {
-        const response = await fetch(`/api/students?branch=${encodeURIComponent(branch)}&section=${encodeURIComponent(section)}`);
-        const students = await response.json();
+        if (!branchRoster || branchRoster.branch !== branch) {
+            branchRoster = await fetchBranchRoster(branch);
+        }
+        const students = branchRoster.sections[section] || [];
         
-        if (students && students.length > 0) {
+        if (students.length > 0) {
             displayStudentChecklist(students);
             studentSelectionGroup.style.display = 'block';
         } else {
@@ -302,11 +326,11 @@ async function triggerEmergency(event) {
         const result = await response.json();
         
         if (response.ok) {
-            showMessage(`Emergency alert sent successfully! ${result.notifications_sent} notifications sent.`, 'success');
+            showMessage(`Emergency alert ${result.emergency_id} dispatched. Sending notifications...`, 'success');
             
-            // Reload status and activity
+            // Reload status now and activity once delivery finishes
             await loadEmergencyStatus();
-            await loadRecentActivity();
+            trackEmergencyProgress(result.emergency_id, 'Emergency alert');
             
             // Reset form
             event.target.reset();
@@ -350,11 +374,11 @@ async function quickEmergency(type) {
         const result = await response.json();
         
         if (response.ok) {
-            showMessage(`${type.toUpperCase()} emergency alert sent! ${result.notifications_sent} notifications sent.`, 'success');
+            showMessage(`${type.toUpperCase()} emergency alert dispatched. Sending notifications...`, 'success');
             
-            // Reload status and activity
+            // Reload status now and activity once delivery finishes
             await loadEmergencyStatus();
-            await loadRecentActivity();
+            trackEmergencyProgress(result.emergency_id, `${type.toUpperCase()} emergency alert`);
         } else {
             showMessage(`Error: ${result.error}`, 'error');
         }
@@ -366,6 +390,32 @@ async function quickEmergency(type) {
     }
 }
 
+// Poll delivery progress of a dispatched emergency until it finishes
+async function trackEmergencyProgress(emergencyId, label) {
+    try {
+        const response = await fetch(`/api/emergency/${encodeURIComponent(emergencyId)}/progress`);
+        const progress = await response.json();
+        
+        if (!response.ok) {
+            showMessage(`Error: ${progress.error}`, 'error');
+            return;
+        }
+        
+        if (progress.status === 'completed') {
+            const failed = progress.failed ? `, ${progress.failed} failed` : '';
+            showMessage(`${label} sent successfully! ${progress.sent} notifications sent${failed}.`, progress.failed ? 'error' : 'success');
+            await loadRecentActivity();
+        } else if (progress.status === 'failed') {
+            showMessage(`Error: ${progress.error}`, 'error');
+        } else {
+            setTimeout(() => trackEmergencyProgress(emergencyId, label), 500);
+        }
+    } catch (error) {
+        console.error('Error loading emergency progress:', error);
+        showMessage('Error loading emergency progress', 'error');
+    }
+}
+
 // Resolve emergency
 async function resolveEmergency() {
     if (!confirm('Are you sure you want to resolve the current emergency?')) {
@@ -462,6 +512,25 @@ window.onclick = function(event) {
     }
 }
 
-// Auto-refresh status every 30 seconds
-setInterval(loadEmergencyStatus, 30000);
+// Receive status changes as they happen; poll every 30 seconds where Server-Sent Events are unavailable
+function connectStatusStream() {
+    if (!window.EventSource) {
+        setInterval(loadEmergencyStatus, 30000);
+        return;
+    }
+
+    const source = new EventSource('/api/emergency/stream');
+    source.addEventListener('status', function(event) {
+        currentEmergencyStatus = JSON.parse(event.data);
+        updateEmergencyStatusDisplay();
+    });
+    source.onerror = function() {
+        // The browser reconnects by itself unless the stream was refused outright
+        if (source.readyState === EventSource.CLOSED) {
+            setInterval(loadEmergencyStatus, 30000);
+        }
+    };
+}
+
+connectStatusStream();
 
@@ -1,12 +1,19 @@
+import logging
+
 import pandas as pd
 
+from .agent_logging import get_logger
+from .roster_index import exclusion_mask, parse_student_ids
+
+logger = get_logger('selection_agent')
+
 class SelectionAgent:
     def __init__(self):
         self.role = 'Student Selection Specialist'
         self.goal = 'Filter and select students based on emergency criteria'
         self.backstory = 'You are an expert at quickly identifying and filtering student populations based on branch, section, or other criteria for emergency notifications.'
     
-    def filter_students(self, students_data, filter_criteria):
+    def filter_students(self, students_data, filter_criteria, roster_index=None):
         """
         Filter students based on the provided criteria
         
@@ -17,10 +24,62 @@ class SelectionAgent:
                 - section: specific section to filter by
                 - emergency_type: 'all', 'branch', or 'section'
                 - selected_students: list of student IDs who are safe (checked)
+            roster_index: optional RosterIndex built over students_data; when given,
+                branch/section targets are resolved by position lookup instead of a scan
         
         Returns:
             DataFrame: Filtered student data (students who need alerts - unchecked/safe ones)
         """
+        # Safe (checked) students, parsed straight into a sorted typed ID array
+        selected_students = parse_student_ids(filter_criteria.get('selected_students'))
+        
+        if roster_index is not None:
+            # Narrow to the target by position, drop safe students from that slice only,
+            # then materialize the remaining rows in a single take
+            positions = self._target_positions(roster_index, filter_criteria)
+            if len(selected_students):
+                positions = roster_index.exclude(positions, selected_students)
+            filtered_students = roster_index.students_data if positions is None else roster_index.take(positions)
+        else:
+            filtered_students = self._scan_target(students_data, filter_criteria)
+            if len(selected_students):
+                student_ids = filtered_students['student_id'].to_numpy(dtype='int64')
+                filtered_students = filtered_students[~exclusion_mask(student_ids, selected_students)]
+        
+        if len(selected_students):
+            logger.info(
+                f"📋 AFFECTED: {len(filtered_students)} students need alerts (unchecked/in danger), "
+                f"SAFE: {len(selected_students)} students are safe (checked)",
+                extra={'affected': len(filtered_students), 'safe': len(selected_students)}
+            )
+        
+        # Per-student lines only in verbose (DEBUG) mode, sampled
+        if filtered_students.empty:
+            logger.info("✅ All students are safe - no alerts needed")
+        elif logger.isEnabledFor(logging.DEBUG):
+            for student in filtered_students.itertuples(index=False):
+                logger.debug(
+                    f"  - {student.name} ({student.student_id}) - {student.branch}-{student.section}",
+                    extra={'sampled': True, 'student_id': student.student_id}
+                )
+        
+        return filtered_students
+    
+    def _target_positions(self, roster_index, filter_criteria):
+        """Resolve the branch/section target to row positions (None means the whole roster)"""
+        if filter_criteria['emergency_type'] == 'branch':
+            positions = roster_index.positions(filter_criteria.get('branch'))
+            logger.info(f"📋 FILTERING: {len(positions)} students from {filter_criteria.get('branch')} branch")
+        elif filter_criteria['emergency_type'] == 'section':
+            positions = roster_index.positions(filter_criteria.get('branch'), filter_criteria.get('section'))
+            logger.info(f"📋 FILTERING: {len(positions)} students from {filter_criteria.get('branch')}-{filter_criteria.get('section')}")
+        else:
+            # For 'all' type, we still need to filter by selected_students
+            positions = None
+        return positions
+    
+    def _scan_target(self, students_data, filter_criteria):
+        """Resolve the branch/section target by scanning the whole roster"""
         filtered_students = students_data.copy()
         
         # First filter by branch/section
@@ -30,32 +89,14 @@ class SelectionAgent:
         elif filter_criteria['emergency_type'] == 'branch':
             if 'branch' in filter_criteria:
                 filtered_students = filtered_students[filtered_students['branch'] == filter_criteria['branch']]
-                print(f"📋 FILTERING: {len(filtered_students)} students from {filter_criteria['branch']} branch")
+                logger.info(f"📋 FILTERING: {len(filtered_students)} students from {filter_criteria['branch']} branch")
         elif filter_criteria['emergency_type'] == 'section':
             if 'branch' in filter_criteria and 'section' in filter_criteria:
                 filtered_students = filtered_students[
                     (filtered_students['branch'] == filter_criteria['branch']) &
                     (filtered_students['section'] == filter_criteria['section'])
                 ]
-                print(f"📋 FILTERING: {len(filtered_students)} students from {filter_criteria['branch']}-{filter_criteria['section']}")
-        
-        # Now filter out the selected (safe) students - we want to send alerts to the unchecked ones
-        selected_students = filter_criteria.get('selected_students', [])
-        if selected_students:
-            # Convert selected_students to integers if they're strings
-            selected_students = [int(sid) if isinstance(sid, str) else sid for sid in selected_students]
-            # Keep only students who are NOT in the selected (safe) list
-            filtered_students = filtered_students[~filtered_students['student_id'].isin(selected_students)]
-            print(f"📋 AFFECTED: {len(filtered_students)} students need alerts (unchecked/in danger)")
-            print(f"📋 SAFE: {len(selected_students)} students are safe (checked)")
-        
-        # Display affected students
-        if not filtered_students.empty:
-            print("Students needing alerts (unchecked/in danger):")
-            for _, student in filtered_students.iterrows():
-                print(f"  - {student['name']} ({student['student_id']}) - {student['branch']}-{student['section']}")
-        else:
-            print("✅ All students are safe - no alerts needed")
+                logger.info(f"📋 FILTERING: {len(filtered_students)} students from {filter_criteria['branch']}-{filter_criteria['section']}")
         
         return filtered_students
     
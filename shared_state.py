@@ -0,0 +1,141 @@
+import json
+import sqlite3
+import threading
+import time
+
+
+class SharedStateStore:
+    """
+    Small key/value store for state that every server worker must agree on.
+
+    Values are JSON documents kept in a SQLite database in WAL mode, so any
+    number of worker processes can read and write the same file concurrently.
+    Every write bumps the key's version, which lets readers cheaply tell
+    whether a value changed. Used for the current emergency status and the
+    delivery progress of emergencies being processed by other workers.
+
+    It also holds token buckets shared by every worker, so a provider's rate
+    limit holds for all of them together rather than for each one.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS state (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_state_updated_at ON state (updated_at);
+        CREATE TABLE IF NOT EXISTS token_buckets (
+            name TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path, timeout=5.0):
+        """
+        Args:
+            path: SQLite database file (':memory:' for a single-process store)
+            timeout: seconds to wait for another process's write lock
+        """
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        # Losing the last status write in a power cut is acceptable; history is what must be durable
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(self.SCHEMA)
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Get the value stored under key, or default"""
+        value, _ = self.get_versioned(key)
+        return default if value is None else value
+
+    def get_versioned(self, key):
+        """
+        Get a value and its version
+
+        Returns:
+            tuple: (value, version), or (None, 0) if the key is not set
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT value, version FROM state WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None, 0
+        return json.loads(row[0]), row[1]
+
+    def version(self, key):
+        """Get a key's version without reading its value (0 if the key is not set)"""
+        with self._lock:
+            row = self._conn.execute('SELECT version FROM state WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else 0
+
+    def set(self, key, value):
+        """
+        Store a value under key
+
+        Returns:
+            int: The key's new version
+        """
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                'INSERT INTO state (key, value, version, updated_at) VALUES (?, ?, 1, ?) '
+                'ON CONFLICT(key) DO UPDATE SET value = excluded.value, version = state.version + 1, '
+                'updated_at = excluded.updated_at RETURNING version',
+                (key, json.dumps(value, default=str), time.time())
+            ).fetchone()
+        return row[0]
+
+    def delete(self, key):
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM state WHERE key = ?', (key,))
+
+    def prune(self, prefix, keep):
+        """Delete all but the `keep` most recently updated keys starting with prefix"""
+        pattern = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM state WHERE key LIKE ? ESCAPE '\\' AND key NOT IN ("
+                "SELECT key FROM state WHERE key LIKE ? ESCAPE '\\' ORDER BY updated_at DESC LIMIT ?)",
+                (pattern, pattern, keep)
+            )
+
+    def bucket_tokens(self, name, rate, burst):
+        """Tokens a shared token bucket holds now (a full bucket if it was never used)"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT tokens, updated_at FROM token_buckets WHERE name = ?', (name,)
+            ).fetchone()
+        if row is None:
+            return burst
+        tokens, updated_at = row
+        return min(burst, tokens + max(0.0, time.time() - updated_at) * rate)
+
+    def take_token(self, name, rate, burst):
+        """
+        Refill a shared token bucket up to now and take one token from it
+
+        The refill and the take are one statement, so concurrent takers never
+        lose a take. A taker that found a token free a moment ago may still
+        find the bucket empty; the bucket then goes into debt and every
+        taker's next delay grows, so the sustained rate still holds.
+
+        Returns:
+            float: Tokens left (negative while the bucket is in debt)
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                'INSERT INTO token_buckets (name, tokens, updated_at) VALUES (?, ?, ?) '
+                'ON CONFLICT(name) DO UPDATE SET '
+                'tokens = MIN(?, token_buckets.tokens + MAX(0, excluded.updated_at - token_buckets.updated_at) * ?) - 1, '
+                'updated_at = MAX(token_buckets.updated_at, excluded.updated_at) RETURNING tokens',
+                (name, burst - 1, now, burst, rate)
+            ).fetchone()
+        return row[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
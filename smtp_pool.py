@@ -0,0 +1,238 @@
+import asyncio
+import smtplib
+import socket
+import time
+from email.policy import SMTP as SMTP_POLICY
+
+from .agent_logging import get_logger
+from .delivery_engine import build_email
+
+logger = get_logger('smtp_pool')
+
+
+class SMTPConnection:
+    """
+    One persistent asyncio SMTP session.
+
+    Sends any number of messages over the same connection. When the server
+    advertises PIPELINING, MAIL, RCPT and DATA go out in a single write, so a
+    message costs two round trips (envelope, then content) instead of four.
+    """
+
+    def __init__(self, host, port, timeout=10.0, local_hostname=None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.local_hostname = local_hostname or socket.getfqdn()
+        self.pipelining = False
+        self.messages_sent = 0
+        self.last_used = 0.0
+        self._reader = None
+        self._writer = None
+
+    @property
+    def connected(self):
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def connect(self):
+        """Open the connection, read the greeting and negotiate extensions"""
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout
+        )
+        try:
+            await self._expect(220)
+            code, lines = await self._command(f"EHLO {self.local_hostname}")
+            if code == 250:
+                self.pipelining = any(line.upper().startswith('PIPELINING') for line in lines[1:])
+            else:
+                await self._command(f"HELO {self.local_hostname}", expect=250)
+        except Exception:
+            self.abort()
+            raise
+        self.messages_sent = 0
+        self.last_used = time.monotonic()
+
+    async def send(self, sender, recipients, content):
+        """
+        Send one message
+
+        Args:
+            sender: envelope sender address
+            recipients: list of envelope recipient addresses
+            content: message bytes with CRLF line endings
+
+        Raises:
+            smtplib.SMTPResponseException: the server rejected the message (the session stays usable)
+        """
+        envelope = [f"MAIL FROM:<{sender}>"] + [f"RCPT TO:<{recipient}>" for recipient in recipients]
+        if self.pipelining:
+            self._write(envelope + ['DATA'])
+            replies = [await self._read_reply() for _ in range(len(envelope) + 1)]
+        else:
+            replies = []
+            for command in envelope + ['DATA']:
+                replies.append(await self._command(command))
+                if replies[-1][0] >= 400:
+                    break
+
+        rejected = next(((code, lines) for code, lines in replies[:-1] if code != 250), None)
+        data_code, data_lines = replies[-1]
+        if rejected is not None or data_code != 354:
+            if data_code == 354:
+                # The server is waiting for content we must not send: drop the session
+                self.abort()
+            else:
+                await self._command('RSET')
+            code, lines = rejected or (data_code, data_lines)
+            raise smtplib.SMTPResponseException(code, '\n'.join(lines))
+
+        self._writer.write(_dot_stuff(content) + b'.\r\n')
+        code, lines = await self._read_reply()
+        self.last_used = time.monotonic()
+        if code != 250:
+            raise smtplib.SMTPResponseException(code, '\n'.join(lines))
+        self.messages_sent += 1
+
+    async def noop(self):
+        """Check the session is alive"""
+        await self._command('NOOP', expect=250)
+        self.last_used = time.monotonic()
+
+    async def quit(self):
+        """End the session politely, ignoring a server that already went away"""
+        if not self.connected:
+            return
+        try:
+            await self._command('QUIT')
+        except (OSError, asyncio.TimeoutError, smtplib.SMTPException):
+            pass
+        self.abort()
+
+    def abort(self):
+        """Close the socket without a QUIT"""
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    def _write(self, commands):
+        self._writer.write(''.join(f"{command}\r\n" for command in commands).encode())
+
+    async def _command(self, command, expect=None):
+        self._write([command])
+        if expect is None:
+            return await self._read_reply()
+        return await self._expect(expect)
+
+    async def _expect(self, expect):
+        code, lines = await self._read_reply()
+        if code != expect:
+            raise smtplib.SMTPResponseException(code, '\n'.join(lines))
+        return code, lines
+
+    async def _read_reply(self):
+        """Read one (possibly multi-line) reply"""
+        lines = []
+        while True:
+            line = await asyncio.wait_for(self._reader.readline(), self.timeout)
+            if not line:
+                self.abort()
+                raise smtplib.SMTPServerDisconnected('Connection closed by server')
+            text = line.decode(errors='replace').rstrip('\r\n')
+            lines.append(text[4:])
+            if text[3:4] != '-':
+                return int(text[:3]), lines
+
+
+class PooledSMTPTransport:
+    """
+    Transport that delivers notifications over a pool of persistent SMTP sessions.
+
+    Each send borrows a session from the pool, so at most `pool_size`
+    messages are in flight and connection setup (TCP, greeting, EHLO) is paid
+    once per session instead of once per message. Sessions are recycled after
+    `max_messages` messages, checked with NOOP when they have been idle for
+    `health_check_interval` seconds, and reopened transparently when the
+    server drops them. Set the engine's concurrency to at least `pool_size`.
+    """
+
+    name = 'smtp-pool'
+
+    def __init__(self, host='localhost', port=25, sender='emergency@school.local',
+                 pool_size=10, timeout=10.0, max_messages=1000, health_check_interval=30.0, rate_limit=None):
+        """
+        Args:
+            host: SMTP server host
+            port: SMTP server port
+            sender: envelope and From address
+            pool_size: number of sessions kept open
+            timeout: seconds allowed for connecting and for each server reply
+            max_messages: messages sent over a session before it is reopened
+            health_check_interval: idle seconds after which a session is checked with NOOP
+            rate_limit: provider's messages-per-second cap, enforced by the DeliveryEngine
+        """
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_messages = max_messages
+        self.health_check_interval = health_check_interval
+        self.rate_limit = rate_limit
+        self.sessions_opened = 0
+        self._idle = None
+        self._connections = []
+
+    async def send(self, notification):
+        content = build_email(notification, self.sender).as_bytes(policy=SMTP_POLICY)
+        connection = await self._acquire()
+        try:
+            await self._ready(connection)
+            await connection.send(self.sender, [notification['parent_email']], content)
+        except smtplib.SMTPResponseException:
+            # Rejected message: the session is still usable
+            raise
+        except (OSError, asyncio.TimeoutError, asyncio.CancelledError):
+            # Broken session, or cancelled mid-conversation: reopened on its next use
+            connection.abort()
+            raise
+        finally:
+            self._idle.put_nowait(connection)
+
+    async def aclose(self):
+        """QUIT every open session (called by the engine on its event loop)"""
+        await asyncio.gather(*(connection.quit() for connection in self._connections))
+
+    async def _acquire(self):
+        if self._idle is None:
+            # Created on first use so the queue belongs to the engine's event loop
+            self._idle = asyncio.Queue()
+            self._connections = [
+                SMTPConnection(self.host, self.port, self.timeout) for _ in range(self.pool_size)
+            ]
+            for connection in self._connections:
+                self._idle.put_nowait(connection)
+        return await self._idle.get()
+
+    async def _ready(self, connection):
+        """Make sure a borrowed session is open and healthy"""
+        if connection.connected and connection.messages_sent >= self.max_messages:
+            await connection.quit()
+        elif connection.connected and time.monotonic() - connection.last_used > self.health_check_interval:
+            try:
+                await connection.noop()
+            except (OSError, asyncio.TimeoutError, smtplib.SMTPException) as e:
+                logger.debug(f"🔌 Idle SMTP session failed its health check: {e}")
+                connection.abort()
+        if not connection.connected:
+            await connection.connect()
+            self.sessions_opened += 1
+
+
+def _dot_stuff(content):
+    """Escape lines starting with '.' and make sure the content ends with CRLF"""
+    if content.startswith(b'.'):
+        content = b'.' + content
+    content = content.replace(b'\r\n.', b'\r\n..')
+    if not content.endswith(b'\r\n'):
+        content += b'\r\n'
+    return content
@@ -0,0 +1,103 @@
+import threading
+
+from .agent_logging import get_logger
+
+logger = get_logger('status')
+
+
+class StatusBroadcaster:
+    """
+    Pushes changes of a shared status value to waiting listeners.
+
+    The value lives in a SharedStateStore under `key`. Writes made through
+    publish() wake this process's listeners immediately; writes made by other
+    worker processes are picked up by a watcher thread that checks the key's
+    version every `poll_interval` seconds (a single indexed read). Listeners
+    only ever receive the latest value, so a burst of changes costs each
+    listener one message.
+    """
+
+    def __init__(self, state_store, key='current_emergency', default=None, poll_interval=0.25):
+        """
+        Args:
+            state_store: SharedStateStore holding the value
+            key: key of the value in the store
+            default: value reported while the key is not set
+            poll_interval: seconds between checks for changes made by other processes
+        """
+        self.state_store = state_store
+        self.key = key
+        self.default = default
+        self.poll_interval = poll_interval
+
+        self._condition = threading.Condition()
+        self._value, self._version = self._read()
+        self._watcher = None
+        self._stopped = threading.Event()
+
+    def publish(self, value):
+        """Store a new value and wake every listener"""
+        version = self.state_store.set(self.key, value)
+        self._update(value, version)
+        return version
+
+    def current(self):
+        """
+        Get the latest value and its version
+
+        Returns:
+            tuple: (value, version)
+        """
+        with self._condition:
+            return self._value, self._version
+
+    def wait(self, last_version=0, timeout=None):
+        """
+        Block until the value's version is newer than last_version
+
+        Args:
+            last_version: version the caller already has (0 for none)
+            timeout: maximum seconds to wait
+
+        Returns:
+            tuple: (value, version), or None if the timeout expired first
+        """
+        self._ensure_watching()
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._version != last_version, timeout):
+                return None
+            return self._value, self._version
+
+    def close(self):
+        """Stop the watcher thread"""
+        self._stopped.set()
+        if self._watcher is not None:
+            self._watcher.join()
+
+    def _read(self):
+        value, version = self.state_store.get_versioned(self.key)
+        return (self.default if value is None else value), version
+
+    def _update(self, value, version):
+        with self._condition:
+            # Versions only grow; ignore a read that raced with a newer publish
+            if version > self._version:
+                self._value, self._version = value, version
+                self._condition.notify_all()
+
+    def _ensure_watching(self):
+        # Started by the first listener: processes nobody listens to never poll
+        if self._watcher is not None:
+            return
+        with self._condition:
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch, name='status-watcher', daemon=True)
+                self._watcher.start()
+
+    def _watch(self):
+        while not self._stopped.wait(self.poll_interval):
+            try:
+                value, version = self._read()
+                self._update(value, version)
+            except Exception as e:
+                logger.warning(f"⚠️ Could not read {self.key} status: {e}")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Tests for the queued logging layer: summary-only output by default, JSON
+lines with structured fields, and sampling of per-row lines
+"""
+
+import io
+import json
+import logging
+import os
+import sys
+
+import pytest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agents import agent_logging
+from agents.agent_logging import LOGGER_NAME, configure_logging, get_logger
+
+
+@pytest.fixture
+def capture_logs():
+    """Reconfigure logging into a buffer; returns a function that stops the listener and reads the lines"""
+    previous_stream = agent_logging._listener.handlers[0].stream if agent_logging._listener else None
+    previous_level = logging.getLogger(LOGGER_NAME).level
+    buffer = io.StringIO()
+
+    def configure(**kwargs):
+        configure_logging(stream=buffer, **kwargs)
+
+        def read():
+            # Stopping the listener writes out everything still queued
+            agent_logging._listener.stop()
+            agent_logging._listener = None
+            return buffer.getvalue().splitlines()
+        return read
+
+    yield configure
+    configure_logging(level=previous_level or 'INFO', stream=previous_stream)
+
+
+def test_default_level_prints_summaries_only(capture_logs):
+    read = capture_logs(level='INFO', log_format='text')
+    logger = get_logger('test')
+
+    logger.info('✅ Total notifications sent: 2')
+    for i in range(3):
+        logger.debug(f"  - Student {i}", extra={'sampled': True})
+
+    assert read() == ['✅ Total notifications sent: 2']
+
+
+def test_json_lines_carry_the_extra_fields(capture_logs):
+    read = capture_logs(level='INFO', log_format='json')
+
+    get_logger('test').info('Sent', extra={'emergency_id': 'EMRG_1', 'sent': 2})
+
+    entry, = [json.loads(line) for line in read()]
+    assert (entry['level'], entry['logger'], entry['message']) == ('INFO', f"{LOGGER_NAME}.test", 'Sent')
+    assert (entry['emergency_id'], entry['sent']) == ('EMRG_1', 2)
+    assert 'sampled' not in entry
+
+
+def test_per_row_lines_are_sampled(capture_logs):
+    read = capture_logs(level='DEBUG', log_format='text', sample_rate=3)
+    logger = get_logger('test')
+
+    for i in range(10):
+        logger.debug(f"row {i}", extra={'sampled': True})
+    logger.debug('not sampled')
+
+    assert read() == ['row 0', 'row 3', 'row 6', 'row 9', 'not sampled']
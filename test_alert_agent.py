@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Tests for triggering alerts: the alert carries a lazy target instead of
+roster rows, and the selection agent resolves it
+"""
+
+import json
+import os
+import sys
+
+import pandas as pd
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agents.alert_agent import AlertAgent
+from agents.emergency_ids import is_emergency_id
+from agents.roster_index import RosterIndex
+from agents.selection_agent import SelectionAgent
+
+
+def make_roster():
+    return pd.DataFrame({
+        'student_id': [1001, 1002, 1003, 2001],
+        'name': ['Asha', 'Ben', 'Chen', 'Dara'],
+        'branch': ['CSE', 'CSE', 'CSE', 'ECE'],
+        'section': ['A', 'A', 'B', 'A'],
+        'parent_email': ['a@email.com', 'b@email.com', 'c@email.com', 'd@email.com'],
+    })
+
+
+def test_all_emergency_does_not_copy_the_roster():
+    roster = make_roster()
+    index = RosterIndex(roster)
+
+    alert_data = AlertAgent().trigger_emergency('all', 'Fire drill', roster, selected_students=[1002],
+                                                roster_index=index)
+
+    target = alert_data['target']
+    assert is_emergency_id(alert_data['emergency_id'])
+    assert target.students_data is roster and target.roster_index is index
+    # Only the descriptor is stored with the emergency
+    assert json.loads(json.dumps(target.to_dict())) == {
+        'emergency_type': 'all', 'branch': None, 'section': None, 'excluded_count': 1
+    }
+    assert alert_data['target_description'] == 'All Students'
+
+
+def test_selection_resolves_the_target_with_or_without_an_index():
+    roster = make_roster()
+    alert_data = AlertAgent().trigger_emergency('branch', 'Fire drill', roster, 'CSE', selected_students=['1003'])
+    criteria = alert_data['target'].filter_criteria()
+
+    scanned = SelectionAgent().filter_students(roster, criteria)
+    indexed = SelectionAgent().filter_students(roster, criteria, RosterIndex(roster.copy()))
+
+    assert scanned['student_id'].tolist() == indexed['student_id'].tolist() == [1001, 1002]
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Tests for the HTTP API, run against a private copy of the sample roster and
+private databases
+"""
+
+import gzip
+import importlib
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import copy_sample_roster
+
+
+@pytest.fixture(scope='module')
+def app_module(tmp_path_factory):
+    data_dir = tmp_path_factory.mktemp('data')
+    copy_sample_roster(data_dir)
+    previous = os.environ.get('EMERGENCY_DATA_DIR')
+    os.environ['EMERGENCY_DATA_DIR'] = str(data_dir)
+    try:
+        sys.modules.pop('app', None)
+        module = importlib.import_module('app')
+    finally:
+        if previous is None:
+            del os.environ['EMERGENCY_DATA_DIR']
+        else:
+            os.environ['EMERGENCY_DATA_DIR'] = previous
+    yield module
+    module.emergency_coordinator.roster.stop()
+    module.emergency_coordinator.dispatcher.shutdown()
+    module.emergency_coordinator.outbox.close()
+    sys.modules.pop('app', None)
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+def trigger(client, **fields):
+    body = dict({'emergency_type': 'section', 'emergency_message': 'Fire drill', 'branch': 'CSE', 'section': 'A'}, **fields)
+    return client.post('/api/emergency/trigger', json=body)
+
+
+def wait_for_progress(client, emergency_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        progress = client.get(f"/api/emergency/{emergency_id}/progress").get_json()
+        if progress['status'] in ('completed', 'failed'):
+            return progress
+        time.sleep(0.02)
+    raise AssertionError(f"{emergency_id} still {progress['status']}")
+
+
+def test_trigger_returns_before_delivery_and_reports_progress(client):
+    response = trigger(client)
+
+    assert response.status_code == 202
+    queued = response.get_json()
+    assert queued['status'] == 'queued'
+    assert queued['progress_url'] == f"/api/emergency/{queued['emergency_id']}/progress"
+
+    progress = wait_for_progress(client, queued['emergency_id'])
+    assert progress['status'] == 'completed'
+    assert (progress['affected_students_count'], progress['sent'], progress['pending']) == (2, 2, 0)
+    assert client.get('/api/emergency/status').get_json()['emergency_id'] == queued['emergency_id']
+
+
+def test_trigger_can_wait_for_delivery(client):
+    response = trigger(client, wait=True, selected_students=['1001'])
+
+    assert response.status_code == 200
+    result = response.get_json()
+    # Student 1001 was marked safe
+    assert (result['status'], result['affected_students_count'], result['notifications_sent']) == ('completed', 1, 1)
+
+
+def test_invalid_trigger_requests_are_rejected(client):
+    assert trigger(client, emergency_type='building').status_code == 400
+    assert trigger(client, section=None).status_code == 400
+    response = trigger(client, selected_students='1001')
+    assert response.status_code == 400 and 'list' in response.get_json()['error']
+    assert client.get('/api/emergency/EMRG_20000101_000000_000_0000000000/progress').status_code == 404
+
+
+def test_history_pages_and_stream_agree(client):
+    for _ in range(3):
+        assert trigger(client, wait=True).status_code == 200
+
+    paged, cursor = [], None
+    while True:
+        query = {'limit': 2} if cursor is None else {'limit': 2, 'cursor': cursor}
+        page = client.get('/api/emergency/history', query_string=query).get_json()
+        assert len(page['emergencies']) <= 2
+        paged.extend(record['emergency_id'] for record in page['emergencies'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+
+    response = client.get('/api/emergency/history?format=ndjson')
+    assert response.mimetype == 'application/x-ndjson'
+    streamed = [json.loads(line)['emergency_id'] for line in response.get_data(as_text=True).splitlines()]
+
+    assert len(paged) >= 3
+    assert paged == streamed == sorted(paged, reverse=True)
+
+
+def test_history_rejects_bad_paging(client):
+    assert client.get('/api/emergency/history?limit=0').status_code == 400
+    assert client.get('/api/emergency/history?cursor=not-an-id').status_code == 400
+    assert client.get('/api/emergency/history?format=ndjson&cursor=not-an-id').status_code == 400
+
+
+def test_trigger_response_is_compact_and_details_are_stored_once(client):
+    result = trigger(client, wait=True).get_json()
+
+    assert 'details' not in result
+    assert result['details_url'] == f"/api/emergency/{result['emergency_id']}"
+    record = client.get(result['details_url']).get_json()
+    # Students are referenced by ID; their details live in the stored notifications only
+    assert sorted(record['alert_data']['affected_student_ids']) == [1001, 1002]
+    assert 'affected_students' not in record['alert_data'] and 'notifications' not in record
+
+    detail = client.get(result['details_url'], query_string={'detail': 'full'}).get_json()
+    assert sorted(n['student_id'] for n in detail['notifications']) == [1001, 1002]
+
+
+def test_full_response_mode_embeds_the_details(client):
+    result = trigger(client, wait=True, response_mode='full').get_json()
+
+    assert [s['student_id'] for s in result['details']['affected_students']] == [1001, 1002]
+    assert len(result['details']['notification_result']['details']) == 2
+
+
+def test_status_stream_pushes_changes(client, app_module):
+    coordinator = app_module.emergency_coordinator
+    coordinator.resolve_current_emergency()
+    _, version = coordinator.status_broadcaster.current()
+
+    # A reconnecting dashboard that has seen the current status only gets the next change
+    response = client.get('/api/emergency/stream', headers={'Last-Event-ID': str(version)}, buffered=False)
+    try:
+        assert response.mimetype == 'text/event-stream'
+        events = iter(response.response)
+        assert next(events) == b'retry: 1000\n\n'
+        threading.Timer(0.1, coordinator.set_current_emergency,
+                        args=('EMRG_STREAM', 'all', 'Lockdown', '2024-09-27T10:26:30')).start()
+        event = next(events).decode()
+    finally:
+        response.close()
+
+    lines = event.strip().split('\n')
+    assert lines[:2] == [f"id: {version + 1}", 'event: status']
+    assert json.loads(lines[2][len('data: '):])['emergency_id'] == 'EMRG_STREAM'
+
+
+def test_status_is_revalidated_with_etags(client, app_module):
+    first = client.get('/api/emergency/status')
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'no-cache'
+
+    unchanged = client.get('/api/emergency/status', headers={'If-None-Match': etag})
+    assert unchanged.status_code == 304 and unchanged.get_data() == b''
+    assert unchanged.headers['ETag'] == etag
+
+    app_module.emergency_coordinator.set_current_emergency('EMRG_ETAG', 'all', 'Lockdown', '2024-09-27T10:26:30')
+    changed = client.get('/api/emergency/status', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+    assert changed.get_json()['emergency_id'] == 'EMRG_ETAG'
+
+
+def test_roster_responses_are_cacheable_and_compressed(client, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'MIN_COMPRESS_SIZE', 0)
+
+    plain = client.get('/api/branches')
+    assert plain.headers['Cache-Control'] == f"public, max-age={app_module.ROSTER_MAX_AGE}"
+    assert 'Content-Encoding' not in plain.headers
+
+    compressed = client.get('/api/branches', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert gzip.decompress(compressed.get_data()) == plain.get_data()
+    # Each representation has its own tag; either one revalidates
+    assert compressed.headers['ETag'] == plain.headers['ETag'][:-1] + '-gzip"'
+    for etag in (plain.headers['ETag'], compressed.headers['ETag']):
+        assert client.get('/api/branches', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_catalog_lists_branches_sections_and_counts(client):
+    catalog = client.get('/api/catalog').get_json()
+
+    assert catalog['total_students'] == 20
+    assert catalog['roster_version'] == client.get('/api/catalog').headers['ETag'].strip('"')
+    cse = next(branch for branch in catalog['branches'] if branch['branch'] == 'CSE')
+    assert sum(section['count'] for section in cse['sections']) == cse['count']
+    assert {section['section'] for section in cse['sections']} == set(
+        client.get('/api/sections', query_string={'branch': 'CSE'}).get_json()
+    )
+    assert [branch['branch'] for branch in catalog['branches']] == client.get('/api/branches').get_json()
+    assert client.get('/api/sections', query_string={'branch': 'NONE'}).get_json() == []
+
+
+def test_students_batch_returns_many_groups_in_one_response(client):
+    batch = client.get('/api/students/batch', query_string=[('branch', 'CSE'), ('branch', 'ECE')]).get_json()
+
+    assert batch['columns'] == ['student_id', 'name']
+    assert [(g['branch'], g['section'], g['offset'], g['count']) for g in batch['groups']] == [
+        ('CSE', 'A', 0, 2), ('CSE', 'B', 2, 2), ('CSE', 'C', 4, 1),
+        ('ECE', 'A', 5, 2), ('ECE', 'B', 7, 2), ('ECE', 'C', 9, 1),
+    ]
+    # Each group's slice holds the same students as a single-section request
+    for group in batch['groups']:
+        rows = slice(group['offset'], group['offset'] + group['count'])
+        students = client.get('/api/students', query_string={'branch': group['branch'], 'section': group['section']})
+        assert batch['data']['student_id'][rows] == [s['student_id'] for s in students.get_json()]
+
+    posted = client.post('/api/students/batch', json={
+        'groups': [{'branch': 'MECH', 'section': 'C'}, {'branch': 'CSE', 'section': 'A'}],
+        'columns': ['student_id', 'parent_email']
+    }).get_json()
+    assert posted['data'] == {
+        'student_id': [3005, 1001, 1002],
+        'parent_email': ['steven.jackson.parent@email.com', 'john.smith.parent@email.com',
+                         'sarah.johnson.parent@email.com']
+    }
+
+
+def test_students_batch_rejects_bad_requests(client):
+    assert client.get('/api/students/batch').status_code == 400
+    assert client.get('/api/students/batch?branch=CSE&columns=student_id,password').status_code == 400
+    for body in ({}, {'groups': 'CSE'}, {'groups': [{'section': 'A'}]}, {'groups': [{'branch': ['CSE']}]},
+                 {'groups': [{'branch': 'CSE'}], 'columns': 'name'}):
+        response = client.post('/api/students/batch', json=body)
+        assert response.status_code == 400 and 'error' in response.get_json()
+
+
+def test_columnar_students_match_the_row_format(client):
+    query = {'branch': 'CSE', 'format': 'columnar'}
+    columnar = client.get('/api/students', query_string=query).get_json()
+    rows = client.get('/api/students', query_string={'branch': 'CSE'}).get_json()
+
+    assert columnar['count'] == len(rows) == 5
+    # Branch and section are integer codes into their dictionaries
+    data, dictionaries = columnar['data'], columnar['dictionaries']
+    assert set(dictionaries) == {'branch', 'section'}
+    for column in dictionaries:
+        data[column] = [dictionaries[column][code] for code in data[column]]
+    assert [dict(zip(columnar['columns'], values)) for values in zip(*(data[c] for c in columnar['columns']))] == rows
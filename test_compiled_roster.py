@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Tests for the compiled roster: loads match a CSV load column for column,
+stale compiled copies are ignored, and recompiling never touches the files
+an earlier load has memory-mapped
+"""
+
+import os
+import sys
+
+import pandas as pd
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agents.compiled_roster import (
+    compile_roster, compiled_path_for, load_compiled_roster, retire_compiled_versions
+)
+from agents.roster_loader import read_roster_csv
+
+
+def version_dirs(csv_path):
+    compiled_path = compiled_path_for(str(csv_path))
+    return sorted(name for name in os.listdir(compiled_path) if os.path.isdir(os.path.join(compiled_path, name)))
+
+
+def touch(csv_path, seconds):
+    """Move the CSV's modification time, as an edit would"""
+    stat = os.stat(csv_path)
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + seconds * 1_000_000_000))
+
+
+def test_compiled_load_matches_csv_load(students_csv):
+    students_df = read_roster_csv(str(students_csv))
+    compile_roster(students_df, str(students_csv))
+
+    loaded = load_compiled_roster(str(students_csv))
+
+    # Only branch and section are categorical; names and emails stay text as in a CSV load
+    assert loaded.dtypes.to_dict() == students_df.dtypes.to_dict()
+    assert str(loaded['parent_email'].dtype) == 'object'
+    assert str(loaded['branch'].dtype) == 'category'
+    pd.testing.assert_frame_equal(loaded, students_df)
+
+
+def test_compiled_roster_of_another_csv_version_is_ignored(students_csv):
+    compile_roster(read_roster_csv(str(students_csv)), str(students_csv))
+    touch(students_csv, 5)
+
+    assert load_compiled_roster(str(students_csv)) is None
+
+
+def test_recompiling_leaves_mapped_versions_until_retired(students_csv):
+    students_df = read_roster_csv(str(students_csv))
+    compile_roster(students_df, str(students_csv))
+    first = load_compiled_roster(str(students_csv))
+
+    touch(students_csv, 5)
+    compile_roster(students_df, str(students_csv))
+    assert len(version_dirs(students_csv)) == 2
+    new_version = version_dirs(students_csv)[-1]
+
+    # The first load still reads its own version; new loads read the new one
+    pd.testing.assert_frame_equal(first, students_df)
+    pd.testing.assert_frame_equal(load_compiled_roster(str(students_csv)), students_df)
+
+    assert retire_compiled_versions(str(students_csv)) == 1
+    assert version_dirs(students_csv) == [new_version]
+    pd.testing.assert_frame_equal(load_compiled_roster(str(students_csv)), students_df)
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Tests for the delivery engine's priority lanes and rate limiting (within one
+engine and shared between engines), with a fake transport that records when
+each send attempt starts
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agents import delivery_engine
+from agents import shared_state
+from agents.delivery_engine import (
+    PRIORITY_ALERT, PRIORITY_BULK, PRIORITY_STATUS, DeliveryEngine, SharedTokenBucket, TokenBucket
+)
+from agents.shared_state import SharedStateStore
+
+
+def make_notifications(label, count):
+    return [
+        {'student_id': i, 'parent_email': f"{label}.{i}@email.com", 'subject': label, 'message': label}
+        for i in range(count)
+    ]
+
+
+class RecordingTransport:
+    """Records (time, recipient) for every send attempt; fails the first `failures` attempts per recipient"""
+
+    name = 'recording'
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.attempts = []
+        self.released = threading.Event()
+        self.released.set()
+        self._failed = {}
+
+    async def send(self, notification):
+        self.attempts.append((time.monotonic(), notification['parent_email']))
+        while not self.released.is_set():
+            await asyncio.sleep(0.005)
+        email = notification['parent_email']
+        if self._failed.get(email, 0) < self.failures:
+            self._failed[email] = self._failed.get(email, 0) + 1
+            raise OSError('temporary failure')
+
+    @property
+    def recipients(self):
+        return [email for _, email in self.attempts]
+
+    @property
+    def times(self):
+        return [at for at, _ in self.attempts]
+
+
+@pytest.fixture
+def make_engine():
+    engines = []
+
+    def make(transport, **kwargs):
+        engine = DeliveryEngine(transport, **kwargs)
+        engines.append(engine)
+        return engine
+
+    yield make
+    for engine in engines:
+        engine.close()
+
+
+def test_lanes_are_served_most_urgent_first(make_engine):
+    transport = RecordingTransport()
+    engine = make_engine(transport, concurrency=1, max_retries=0)
+
+    # Hold the only worker so every lane fills up before anything is chosen
+    transport.released.clear()
+    blocker = engine.submit(make_notifications('blocker', 1))
+    while not transport.attempts:
+        time.sleep(0.001)
+    futures = [
+        engine.submit(make_notifications('status', 3), priority=PRIORITY_STATUS),
+        engine.submit(make_notifications('bulk', 3), priority=PRIORITY_BULK),
+        engine.submit(make_notifications('alert', 3), priority=PRIORITY_ALERT),
+    ]
+    while engine.metrics()['lanes']['alert']['queued'] < 3:
+        time.sleep(0.001)
+    transport.released.set()
+    for future in [blocker] + futures:
+        future.result(timeout=10)
+
+    # Lanes in priority order, each first-in first-out
+    assert transport.recipients == ['blocker.0@email.com'] + [
+        f"{label}.{i}@email.com" for label in ('alert', 'bulk', 'status') for i in range(3)
+    ]
+
+
+def test_rate_limit_spaces_sends(make_engine):
+    transport = RecordingTransport()
+    engine = make_engine(transport, concurrency=10, max_retries=0, rate_limit=50, burst=1)
+
+    results = engine.deliver(make_notifications('alert', 21))
+
+    assert all(result['status'] == 'sent' for result in results)
+    # 21 sends at 50 per second with no burst: 20 intervals of 20 ms
+    elapsed = transport.times[-1] - transport.times[0]
+    assert 0.38 <= elapsed < 1.0
+    assert engine.metrics()['throttled_seconds'] > 0
+
+
+def test_retries_take_tokens(make_engine):
+    transport = RecordingTransport(failures=1)
+    engine = make_engine(transport, concurrency=10, max_retries=1, backoff=0.0, rate_limit=50, burst=1)
+
+    results = engine.deliver(make_notifications('alert', 10))
+
+    assert all(result['status'] == 'sent' and result['attempts'] == 2 for result in results)
+    assert len(transport.attempts) == 20
+    # Retries are rate limited too: 20 attempts need 19 intervals, not 9
+    elapsed = transport.times[-1] - transport.times[0]
+    assert elapsed >= 0.36
+
+
+def test_token_bucket_refills_at_rate(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(delivery_engine.time, 'monotonic', lambda: now[0])
+    bucket = TokenBucket(rate=4, burst=2)
+
+    # The burst is available at once, then one token per 1/rate seconds
+    for _ in range(2):
+        assert bucket.delay() == 0.0
+        bucket.take()
+    assert bucket.delay() == 0.25
+    now[0] += 0.125
+    assert bucket.delay() == 0.125
+    now[0] += 0.125
+    assert bucket.delay() == 0.0
+    # Idle time never accumulates more than the burst
+    bucket.take()
+    now[0] += 60
+    bucket.delay()
+    assert bucket.tokens == 2
+
+
+def test_engines_sharing_a_store_share_the_rate_limit(make_engine, tmp_path):
+    # Two stores on one file stand in for two server worker processes
+    stores = [SharedStateStore(str(tmp_path / 'state.db')) for _ in range(2)]
+    transport = RecordingTransport()
+    engines = [
+        make_engine(transport, concurrency=10, max_retries=0, rate_limit=50, burst=1, rate_limit_store=store)
+        for store in stores
+    ]
+    try:
+        futures = [engine.submit(make_notifications(f"worker{i}", 10)) for i, engine in enumerate(engines)]
+        for future in futures:
+            assert all(result['status'] == 'sent' for result in future.result(timeout=10))
+
+        # 20 sends at 50 per second in total, not 50 per second per engine
+        times = sorted(transport.times)
+        assert times[-1] - times[0] >= 0.34
+    finally:
+        for engine in engines:
+            engine.close()
+        for store in stores:
+            store.close()
+
+
+def test_shared_token_bucket_takes_from_one_budget(monkeypatch, tmp_path):
+    now = [100.0]
+    monkeypatch.setattr(shared_state.time, 'time', lambda: now[0])
+    store = SharedStateStore(str(tmp_path / 'state.db'))
+    first = SharedTokenBucket(store, 'provider', rate=4, burst=2)
+    second = SharedTokenBucket(store, 'provider', rate=4, burst=2)
+    other = SharedTokenBucket(store, 'other-provider', rate=4, burst=2)
+    try:
+        first.take()
+        second.take()
+        assert first.delay() == second.delay() == 0.25
+        # A bucket under another name keeps its own tokens
+        assert other.delay() == 0.0
+        # Taking while empty puts the bucket in debt for every taker
+        second.take()
+        assert first.delay() == 0.5
+        now[0] += 0.5
+        assert first.delay() == second.delay() == 0.0
+    finally:
+        store.close()
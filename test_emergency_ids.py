@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Tests for emergency ID generation with an injected clock: uniqueness under
+concurrency, ordering when the clock steps backwards, sequence rollover and
+local-time formatting
+"""
+
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agents.emergency_ids import SEQUENCE_LIMIT, EmergencyIdGenerator, emergency_id_time, is_emergency_id
+
+requires_tzset = pytest.mark.skipif(not hasattr(time, 'tzset'), reason='needs time.tzset to switch time zones')
+
+# 2024-10-27 00:59:59.900 UTC: 100 ms before Central Europe falls back from 03:00 CEST to 02:00 CET
+BEFORE_FALL_BACK = 1729990799.9
+
+
+class FakeClock:
+    """Clock returning preset times, then staying on the last one"""
+
+    def __init__(self, *times):
+        self.times = list(times)
+
+    def __call__(self):
+        return self.times.pop(0) if len(self.times) > 1 else self.times[0]
+
+
+def id_parts(emergency_id):
+    """(local time text, milliseconds, sequence) of an ID"""
+    _, date, clock, millis, tail = emergency_id.split('_')
+    return f"{date}_{clock}", int(millis), int(tail[:4], 16)
+
+
+@pytest.fixture
+def local_timezone(monkeypatch):
+    """Switch the process's local time zone for one test"""
+    def use(name):
+        monkeypatch.setenv('TZ', name)
+        time.tzset()
+
+    yield use
+    monkeypatch.undo()
+    time.tzset()
+
+
+@requires_tzset
+def test_id_reads_as_local_time(local_timezone):
+    local_timezone('Asia/Kolkata')
+    emergency_id = EmergencyIdGenerator(clock=FakeClock(1727432790.512)).new_id()
+
+    # 2024-09-27 10:26:30.512 UTC is 15:56:30.512 in India
+    assert emergency_id.startswith('EMRG_20240927_155630_512_0000')
+    assert is_emergency_id(emergency_id)
+    assert emergency_id_time(emergency_id) == datetime(2024, 9, 27, 15, 56, 30, 512000)
+
+
+@requires_tzset
+def test_ids_sort_after_older_ids_from_earlier_local_times(local_timezone):
+    local_timezone('America/New_York')
+    emergency_id = EmergencyIdGenerator(clock=FakeClock(1727432790.512)).new_id()
+
+    # Older IDs were written in local time too: 06:26:30 in New York
+    assert 'EMRG_20240927_062629' < emergency_id < 'EMRG_20240927_062631'
+    assert sorted(['EMRG_20240927_062631', emergency_id, 'EMRG_20240927_062629']) == [
+        'EMRG_20240927_062629', emergency_id, 'EMRG_20240927_062631'
+    ]
+
+
+def test_unique_across_threads():
+    # A frozen clock puts every ID in the same millisecond and forces sequence rollovers
+    generator = EmergencyIdGenerator(clock=FakeClock(1727432790.512))
+    per_thread = 20000
+    results = [None] * 4
+    start = threading.Barrier(len(results))
+
+    def generate(i):
+        start.wait()
+        results[i] = [generator.new_id() for _ in range(per_thread)]
+
+    threads = [threading.Thread(target=generate, args=(i,)) for i in range(len(results))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    all_ids = [emergency_id for ids in results for emergency_id in ids]
+    assert len(all_ids) == 80000
+    assert len(set(all_ids)) == 80000
+    for ids in results:
+        assert ids == sorted(ids)
+
+
+def test_strictly_increasing_when_clock_steps_backwards():
+    generator = EmergencyIdGenerator(clock=FakeClock(1000.000, 1000.002, 999.000, 999.500, 1000.002, 1000.010))
+    ids = [generator.new_id() for _ in range(6)]
+
+    assert ids == sorted(ids) and len(set(ids)) == 6
+    # While the clock is behind, IDs stay on the last millisecond and count up
+    assert [id_parts(emergency_id)[1:] for emergency_id in ids] == [
+        (0, 0), (2, 0), (2, 1), (2, 2), (2, 3), (10, 0)
+    ]
+
+
+@requires_tzset
+def test_strictly_increasing_across_daylight_saving_fall_back(local_timezone):
+    local_timezone('Europe/Berlin')
+    clock = FakeClock(BEFORE_FALL_BACK, BEFORE_FALL_BACK + 0.2, BEFORE_FALL_BACK + 3600.2)
+    generator = EmergencyIdGenerator(clock=clock)
+    ids = [generator.new_id() for _ in range(3)]
+
+    assert ids == sorted(ids) and len(set(ids)) == 3
+    # 03:00:00.100 CEST is 02:00:00.100 CET: the local clock went back an hour
+    assert id_parts(ids[0]) == ('20241027_025959', 900, 0)
+    assert id_parts(ids[1]) == ('20241027_025959', 900, 1)
+    # Once the local clock passes the last ID again, IDs follow it
+    assert id_parts(ids[2]) == ('20241027_030000', 100, 0)
+
+
+def test_sequence_rollover_moves_to_next_millisecond():
+    generator = EmergencyIdGenerator(clock=FakeClock(1000.999))
+    ids = [generator.new_id() for _ in range(SEQUENCE_LIMIT + 2)]
+
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
+    first_time, first_ms, _ = id_parts(ids[0])
+    assert id_parts(ids[SEQUENCE_LIMIT - 1])[1:] == (first_ms, SEQUENCE_LIMIT - 1)
+    # The millisecond after .999 is the next second
+    rolled_time, rolled_ms, rolled_sequence = id_parts(ids[SEQUENCE_LIMIT])
+    assert (rolled_ms, rolled_sequence) == (0, 0)
+    assert rolled_time > first_time
+    assert id_parts(ids[SEQUENCE_LIMIT + 1])[1:] == (0, 1)
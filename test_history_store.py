@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Tests for the emergency history store: durable batched appends, keeping the
+first record of an emergency, notifications by emergency and time, keyed
+emergency lookups, and paging and streaming the history newest first
+"""
+
+import json
+import os
+import sqlite3
+import sys
+
+import pytest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agents.emergency_ids import EmergencyIdGenerator
+from agents.history_store import HistoryStore
+
+
+def make_record(emergency_id, timestamp, message='Fire drill', sent=2):
+    return {
+        'alert_data': {
+            'emergency_id': emergency_id, 'emergency_type': 'section', 'emergency_message': message,
+            'timestamp': timestamp, 'affected_count': sent
+        },
+        'notification_result': {'notifications_sent': sent, 'notifications_failed': 0},
+        'timestamp': timestamp
+    }
+
+
+def make_notifications(timestamp, count=2):
+    return [
+        {'student_id': 1001 + i, 'parent_email': f"parent.{i}@email.com", 'timestamp': timestamp, 'status': 'sent'}
+        for i in range(count)
+    ]
+
+
+def count_rows(path):
+    """(emergencies, notifications) written to the database, as another process would see them"""
+    with sqlite3.connect(path) as conn:
+        return tuple(conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                     for table in ('emergencies', 'notifications'))
+
+
+@pytest.fixture
+def make_ids():
+    # One second apart from 2024-09-27 10:26:30 local time
+    clock = iter(range(1727432790, 1727432790 + 1000))
+    generator = EmergencyIdGenerator(clock=lambda: next(clock))
+    return lambda count: [generator.new_id() for _ in range(count)]
+
+
+@pytest.fixture
+def history_path(tmp_path):
+    return str(tmp_path / 'history.db')
+
+
+def test_history_survives_reopening(history_path, make_ids):
+    first, second = make_ids(2)
+    store = HistoryStore(history_path, flush_interval=60)
+    store.append_emergency(make_record(first, '2024-09-27T10:00:00'))
+    store.append_notifications(first, make_notifications('2024-09-27 10:00:01'))
+    store.append_emergency(make_record(second, '2024-09-28T10:00:00'))
+    store.close()
+
+    reopened = HistoryStore(history_path)
+    try:
+        assert reopened.count_emergencies() == 2
+        assert reopened.get_emergency(first)['alert_data']['emergency_id'] == first
+        assert [n['student_id'] for n in reopened.get_notifications(first)] == [1001, 1002]
+        # The recent window is reloaded from disk
+        assert len(reopened.recent_notifications()) == 2
+        assert [r['alert_data']['emergency_id'] for r in reopened.get_emergencies(start='2024-09-28')] == [second]
+    finally:
+        reopened.close()
+
+
+def test_appends_are_buffered_until_a_batch_is_full(history_path, make_ids):
+    store = HistoryStore(history_path, batch_size=3, flush_interval=60)
+    try:
+        emergency_id, = make_ids(1)
+        store.append_emergency(make_record(emergency_id, '2024-09-27T10:00:00'))
+        store.append_notifications(emergency_id, make_notifications('2024-09-27 10:00:01', count=1))
+        assert count_rows(history_path) == (0, 0)
+
+        # The third record fills the batch: all three are written in one transaction
+        store.append_notifications(emergency_id, make_notifications('2024-09-27 10:00:02', count=1))
+        assert count_rows(history_path) == (1, 2)
+    finally:
+        store.close()
+
+
+def test_an_emergency_recorded_twice_keeps_its_first_record(history_path, make_ids):
+    emergency_id, = make_ids(1)
+    store = HistoryStore(history_path)
+    try:
+        store.append_emergency(make_record(emergency_id, '2024-09-27T10:00:00', 'first'))
+        store.flush()
+        store.append_emergency(make_record(emergency_id, '2024-09-27T10:00:00', 'second'))
+        store.append_notifications(emergency_id, make_notifications('2024-09-27 10:00:01'))
+        store.flush()
+
+        assert store.count_emergencies() == 1
+        assert store.get_emergency(emergency_id)['alert_data']['emergency_message'] == 'first'
+        # The second recording's notifications are dropped with it
+        assert store.get_notifications(emergency_id) == []
+    finally:
+        store.close()
+
+
+def test_recent_emergencies_are_found_without_a_query(history_path, make_ids):
+    ids = make_ids(3)
+    store = HistoryStore(history_path, index_size=2)
+    statements = []
+    try:
+        for emergency_id in ids:
+            store.append_emergency(make_record(emergency_id, '2024-09-27T10:00:00'))
+        store.flush()
+        store._conn.set_trace_callback(statements.append)
+
+        assert store.get_emergency(ids[2])['alert_data']['emergency_id'] == ids[2]
+        assert store.get_emergency(ids[1])['alert_data']['emergency_id'] == ids[1]
+        assert statements == []
+
+        # Evicted from the keyed index: one lookup on the database's unique index, then indexed again
+        assert store.get_emergency(ids[0])['alert_data']['emergency_id'] == ids[0]
+        assert len(statements) == 1 and statements[0].startswith('SELECT record FROM emergencies WHERE emergency_id =')
+        assert store.get_emergency(ids[0]) is not None and len(statements) == 1
+        assert store.get_emergency(make_ids(1)[0]) is None
+    finally:
+        store._conn.set_trace_callback(None)
+        store.close()
+
+
+def test_pages_walk_the_history_newest_first(history_path, make_ids):
+    ids = make_ids(7)
+    store = HistoryStore(history_path)
+    try:
+        for emergency_id in ids:
+            store.append_emergency(make_record(emergency_id, '2024-09-27T10:00:00'))
+
+        pages, cursor = [], None
+        while True:
+            records, cursor = store.page_emergencies(cursor, limit=3)
+            pages.append([record['emergency_id'] for record in records])
+            if cursor is None:
+                break
+
+        assert pages == [ids[6:3:-1], ids[3:0:-1], ids[:1]]
+        # Pages hold summaries; detail pages hold the full records
+        records, _ = store.page_emergencies(limit=1, detail=True)
+        assert 'notifications_sent' in store.page_emergencies(limit=1)[0][0]
+        assert records[0]['alert_data']['emergency_id'] == ids[6]
+    finally:
+        store.close()
+
+
+def test_streamed_history_matches_the_pages(history_path, make_ids):
+    ids = make_ids(5)
+    store = HistoryStore(history_path)
+    try:
+        for emergency_id in ids:
+            store.append_emergency(make_record(emergency_id, '2024-09-27T10:00:00'))
+
+        streamed = [json.loads(text)['emergency_id'] for text in store.iter_emergencies_json(page_size=2)]
+        assert streamed == ids[::-1]
+        limited = [json.loads(text)['emergency_id'] for text in store.iter_emergencies_json(ids[3], limit=2, page_size=1)]
+        assert limited == [ids[2], ids[1]]
+    finally:
+        store.close()
+
+
+def test_invalid_cursor_and_limit_are_rejected(history_path):
+    store = HistoryStore(history_path)
+    try:
+        with pytest.raises(ValueError):
+            store.page_emergencies("x' OR 1=1 --")
+        with pytest.raises(ValueError):
+            store.page_emergencies(limit=0)
+    finally:
+        store.close()
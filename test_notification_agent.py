@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Tests for concurrent notification delivery: sends overlap up to the engine's
+concurrency, slow and failing sends are bounded by timeouts and retries, and
+the agent reports every recipient's outcome and the sends saved by writing
+to each guardian once
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import pandas as pd
+import pytest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agents.delivery_engine import DeliveryEngine
+from agents.notification_agent import NotificationAgent
+
+ALERT_DATA = {'emergency_id': 'EMRG_20240927_102630_512_0000A3F19C', 'emergency_message': 'Fire drill'}
+
+
+def make_notifications(count):
+    return [
+        {'student_id': i, 'parent_email': f"parent.{i}@email.com", 'subject': 'Alert', 'message': 'Evacuate'}
+        for i in range(count)
+    ]
+
+
+class SlowTransport:
+    """Takes `delay` seconds per send; recipients in `fail` always fail, those in `hang` never answer"""
+
+    name = 'slow'
+
+    def __init__(self, delay=0.0, fail=(), hang=()):
+        self.delay = delay
+        self.fail = set(fail)
+        self.hang = set(hang)
+        self.active = 0
+        self.max_active = 0
+        self.sent = []
+
+    async def send(self, notification):
+        email = notification['parent_email']
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(3600 if email in self.hang else self.delay)
+            if email in self.fail:
+                raise ConnectionRefusedError('mailbox unavailable')
+            self.sent.append(email)
+        finally:
+            self.active -= 1
+
+
+@pytest.fixture
+def make_engine():
+    engines = []
+
+    def make(transport, **kwargs):
+        engine = DeliveryEngine(transport, **kwargs)
+        engines.append(engine)
+        return engine
+
+    yield make
+    for engine in engines:
+        engine.close()
+
+
+def test_sends_overlap_up_to_the_concurrency(make_engine):
+    transport = SlowTransport(delay=0.1)
+    engine = make_engine(transport, concurrency=10)
+
+    started = time.perf_counter()
+    results = engine.deliver(make_notifications(30))
+    elapsed = time.perf_counter() - started
+
+    assert [result['status'] for result in results] == ['sent'] * 30
+    assert transport.max_active == 10
+    # Three rounds of 100 ms, not thirty
+    assert elapsed < 1.0
+
+
+def test_results_keep_input_order_and_report_each_outcome(make_engine):
+    transport = SlowTransport(fail={'parent.1@email.com'}, hang={'parent.2@email.com'})
+    engine = make_engine(transport, concurrency=5, timeout=0.05, max_retries=2, backoff=0.0)
+    finished = []
+
+    results = engine.deliver(make_notifications(4), on_result=lambda notification, result: finished.append(
+        notification['student_id']
+    ))
+
+    assert [result['status'] for result in results] == ['sent', 'failed', 'failed', 'sent']
+    assert results[1] == dict(results[1], attempts=3, error='mailbox unavailable')
+    assert results[2]['error'] == 'timeout' and results[2]['attempts'] == 3
+    assert sorted(finished) == [0, 1, 2, 3]
+
+
+def test_agent_reports_sent_and_failed_recipients(make_engine):
+    transport = SlowTransport(fail={'parent.1002@email.com'})
+    agent = NotificationAgent(make_engine(transport, max_retries=0), coalesce=False)
+    students = pd.DataFrame({
+        'student_id': [1001, 1002, 1003],
+        'name': ['Asha', 'Ben', 'Chen'],
+        'branch': ['CSE', 'CSE', 'ECE'],
+        'section': ['A', 'A', 'B'],
+        'parent_email': ['parent.1001@email.com', 'parent.1002@email.com', 'parent.1003@email.com'],
+    })
+
+    result = agent.send_emergency_notifications(ALERT_DATA, students)
+
+    assert result['status'] == 'partial_failure'
+    assert (result['notifications_sent'], result['notifications_failed']) == (2, 1)
+    assert [n['status'] for n in result['details']] == ['sent', 'failed', 'sent']
+    assert sorted(transport.sent) == ['parent.1001@email.com', 'parent.1003@email.com']
+
+
+def test_agent_without_students_sends_nothing(make_engine):
+    transport = SlowTransport()
+    agent = NotificationAgent(make_engine(transport))
+
+    result = agent.send_emergency_notifications(ALERT_DATA, pd.DataFrame())
+
+    assert result['status'] == 'no_students' and transport.sent == []
+
+
+def test_agent_sends_one_message_per_guardian(make_engine):
+    transport = SlowTransport()
+    agent = NotificationAgent(make_engine(transport))
+    students = pd.DataFrame({
+        'student_id': [1001, 1002, 1003],
+        'name': ['Asha', 'Ben', 'Chen'],
+        'branch': ['CSE', 'ECE', 'CSE'],
+        'section': ['A', 'B', 'A'],
+        'parent_email': ['family@email.com', 'other@email.com', 'Family@email.com'],
+    })
+
+    result = agent.send_emergency_notifications(ALERT_DATA, students)
+
+    assert (result['students_notified'], result['notifications_sent'], result['sends_saved']) == (3, 2, 1)
+    assert sorted(transport.sent) == ['family@email.com', 'other@email.com']
+    assert agent.get_stats() == {'students_notified': 3, 'notifications_rendered': 2, 'sends_saved': 1}
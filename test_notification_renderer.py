@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Tests for batch notification rendering: every message equals the template
+formatted for its row, with one timestamp per emergency, and siblings'
+guardians get one combined message
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agents.notification_renderer import (
+    EMERGENCY_MESSAGE_TEMPLATE, EMERGENCY_SUBJECT_TEMPLATE, CompiledTemplate, NotificationRenderer, guardian_codes
+)
+
+ALERT_DATA = {
+    'emergency_id': 'EMRG_20240927_102630_512_0000A3F19C',
+    'emergency_message': 'Evacuate to the {north} gate',
+}
+TIMESTAMP = '2024-09-27 10:26:30'
+
+
+def make_students(emails):
+    count = len(emails)
+    return pd.DataFrame({
+        'student_id': [1001 + i for i in range(count)],
+        'name': [f"Student {i}" for i in range(count)],
+        'branch': pd.Categorical(['CSE', 'ECE'] * (count // 2) + ['CSE'] * (count % 2)),
+        'section': ['A'] * count,
+        'parent_email': emails,
+    })
+
+
+def test_compiled_template_matches_str_format():
+    frame = pd.DataFrame({'name': ['Asha', 'Ben'], 'student_id': [1, 2]})
+    template = CompiledTemplate("{name} ({student_id}) - {event}: {name}")
+
+    rendered = template.render(frame, {'event': 'drill {x}'})
+
+    # Constants are inserted as-is, never formatted again
+    assert rendered == ['Asha (1) - drill {x}: Asha', 'Ben (2) - drill {x}: Ben']
+
+
+def test_render_matches_per_row_formatting():
+    students = make_students([f"parent.{i}@email.com" for i in range(5)])
+
+    notifications = NotificationRenderer().render(ALERT_DATA, students, TIMESTAMP)
+
+    assert len(notifications) == 5
+    for notification, student in zip(notifications, students.to_dict('records')):
+        fields = dict(student, emergency_id=ALERT_DATA['emergency_id'],
+                      emergency_message=ALERT_DATA['emergency_message'], timestamp=TIMESTAMP)
+        assert notification['subject'] == EMERGENCY_SUBJECT_TEMPLATE.format(**fields)
+        assert notification['message'] == EMERGENCY_MESSAGE_TEMPLATE.format(**fields)
+        assert notification['student_id'] == student['student_id']
+        assert notification['branch'] == student['branch'] and notification['status'] == 'queued'
+
+
+def test_render_stamps_one_time_on_every_notification():
+    notifications = NotificationRenderer().render(ALERT_DATA, make_students(['a@email.com', 'b@email.com']))
+
+    assert len({notification['timestamp'] for notification in notifications}) == 1
+    assert notifications[0]['timestamp'] in notifications[1]['message']
+
+
+def test_guardian_codes_ignore_case_and_surrounding_spaces():
+    emails = ['a@email.com', ' A@Email.com ', 'b@email.com', None, '', '  ', np.nan, 'a@email.com']
+
+    codes = guardian_codes(pd.Series(emails, dtype=object))
+
+    assert codes[0] == codes[1] == codes[7] and codes[2] != codes[0]
+    # Missing and blank emails each get a guardian of their own
+    assert len(set(codes[3:7].tolist()) | {codes[0], codes[2]}) == 6
+
+
+def test_siblings_get_one_combined_message():
+    students = make_students(['a@email.com', 'b@email.com', 'A@email.com ', 'c@email.com', 'a@email.com'])
+
+    notifications = NotificationRenderer().render_by_guardian(ALERT_DATA, students, TIMESTAMP)
+
+    # Ordered by each guardian's first student; the combined one keeps the first email as written
+    assert [n['student_ids'] for n in notifications] == [[1001, 1003, 1005], [1002], [1004]]
+    combined, single = notifications[0], notifications[1]
+    assert combined['parent_email'] == 'a@email.com'
+    assert combined['student_name'] == 'Student 0, Student 2, Student 4'
+    assert combined['branch'] == 'CSE' and combined['section'] == 'A'
+    assert all(f"Student {i}" in combined['message'] for i in (0, 2, 4))
+    assert ALERT_DATA['emergency_message'] in combined['message'] and TIMESTAMP in combined['message']
+    # A guardian with one affected student gets the regular message
+    assert single == dict(NotificationRenderer().render(ALERT_DATA, students.iloc[[1]], TIMESTAMP)[0],
+                          student_ids=[1002])
+
+
+def test_students_without_email_are_never_grouped():
+    students = make_students([None, '', None, 'a@email.com'])
+
+    notifications = NotificationRenderer().render_by_guardian(ALERT_DATA, students, TIMESTAMP)
+
+    assert [n['student_ids'] for n in notifications] == [[1001], [1002], [1003], [1004]]
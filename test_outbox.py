@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Tests for the durable delivery outbox: crashes at each stage of a delivery,
+orphan claiming across processes, resuming only pending recipients, releasing
+failed deliveries, the resume deadline and pruning completed emergencies
+"""
+
+import os
+import sqlite3
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+
+import pytest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agents.delivery_engine import DeliveryEngine
+from agents.emergency_coordinator import EmergencyCoordinator
+from agents.notification_agent import NotificationAgent
+from agents.outbox import Outbox, idempotency_key
+
+EMERGENCY_ID = 'EMRG_20240927_102630_512_0000A3F19C'
+ALERT_DATA = {'emergency_id': EMERGENCY_ID, 'emergency_message': 'Fire drill'}
+
+
+def make_notifications(count):
+    notifications = [
+        {
+            'student_id': 1000 + i,
+            'parent_email': f"parent.{1000 + i}@email.com",
+            'subject': f"URGENT: Emergency Alert - {EMERGENCY_ID}",
+            'message': 'Please evacuate the building.'
+        }
+        for i in range(count)
+    ]
+    for notification in notifications:
+        notification['idempotency_key'] = idempotency_key(EMERGENCY_ID, notification)
+    return notifications
+
+
+def crash(path, body):
+    """Run body in a separate process that dies with os._exit, without any cleanup"""
+    script = textwrap.dedent(f"""
+        import os, sys
+        sys.path.insert(0, {os.path.dirname(os.path.abspath(__file__))!r})
+        import conftest  # makes `agents` importable in the flat layout too
+        from agents.outbox import Outbox
+        from test_outbox import ALERT_DATA, make_notifications
+        outbox = Outbox({str(path)!r})
+    """) + textwrap.dedent(body) + '\nos._exit(1)\n'
+    completed = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, timeout=60)
+    assert completed.returncode == 1, completed.stderr
+
+
+def expire_owners(path):
+    """Make every owner recorded so far look like it stopped heartbeating long ago"""
+    with sqlite3.connect(path) as conn:
+        conn.execute('UPDATE outbox_owners SET heartbeat = 0')
+
+
+class RecordingTransport:
+    name = 'recording'
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, notification):
+        self.sent.append(notification['idempotency_key'])
+
+
+@pytest.fixture
+def outbox_path(tmp_path):
+    return tmp_path / 'outbox.db'
+
+
+def test_crash_while_recording_leaves_nothing_to_resume(outbox_path):
+    # Dies halfway through encoding the rows, inside the open transaction
+    crash(outbox_path, """
+        def notifications():
+            for i, notification in enumerate(make_notifications(50)):
+                if i == 25:
+                    os._exit(1)
+                yield notification
+        outbox.add(ALERT_DATA, notifications(), 0)
+    """)
+    expire_owners(outbox_path)
+
+    outbox = Outbox(outbox_path)
+    try:
+        assert outbox.claim_orphans() == []
+        assert outbox.get_emergency(EMERGENCY_ID) == (None, None)
+        assert outbox.counts(EMERGENCY_ID) == {'pending': 0, 'sent': 0, 'failed': 0}
+    finally:
+        outbox.close()
+
+
+def test_crash_before_first_send_resumes_every_recipient(outbox_path):
+    crash(outbox_path, "outbox.add(ALERT_DATA, make_notifications(50), 1)\n")
+    expire_owners(outbox_path)
+
+    outbox = Outbox(outbox_path)
+    try:
+        assert outbox.claim_orphans() == [EMERGENCY_ID]
+        alert_data, priority = outbox.get_emergency(EMERGENCY_ID)
+        assert alert_data == ALERT_DATA and priority == 1
+        assert outbox.pending(EMERGENCY_ID) == make_notifications(50)
+    finally:
+        outbox.close()
+
+
+def test_crash_mid_delivery_resends_only_pending(outbox_path):
+    # 20 results written, 5 more still buffered when the process dies
+    crash(outbox_path, """
+        notifications = make_notifications(50)
+        outbox.add(ALERT_DATA, notifications, 0)
+        for notification in notifications[:20]:
+            outbox.record_result(notification['idempotency_key'], {'status': 'sent', 'attempts': 1})
+        outbox.flush()
+        for notification in notifications[20:25]:
+            outbox.record_result(notification['idempotency_key'], {'status': 'sent', 'attempts': 1})
+    """)
+    expire_owners(outbox_path)
+
+    outbox = Outbox(outbox_path)
+    transport = RecordingTransport()
+    engine = DeliveryEngine(transport, concurrency=4, max_retries=0)
+    try:
+        assert outbox.claim_orphans() == [EMERGENCY_ID]
+        pending = outbox.pending(EMERGENCY_ID)
+        assert [n['idempotency_key'] for n in pending] == [
+            n['idempotency_key'] for n in make_notifications(50)[20:]
+        ]
+
+        agent = NotificationAgent(engine, outbox=outbox)
+        result = agent.resume_notifications(ALERT_DATA, pending)
+
+        assert result['notifications_sent'] == 30
+        assert sorted(transport.sent) == sorted(n['idempotency_key'] for n in pending)
+        assert outbox.counts(EMERGENCY_ID) == {'pending': 0, 'sent': 50, 'failed': 0}
+    finally:
+        engine.close()
+        outbox.close()
+
+
+def test_orphan_is_claimed_by_exactly_one_outbox(outbox_path):
+    crash(outbox_path, "outbox.add(ALERT_DATA, make_notifications(10), 0)\n")
+    expire_owners(outbox_path)
+
+    outboxes = [Outbox(outbox_path) for _ in range(4)]
+    claimed = [None] * len(outboxes)
+    start = threading.Barrier(len(outboxes))
+
+    def claim(i):
+        start.wait()
+        claimed[i] = outboxes[i].claim_orphans()
+
+    threads = [threading.Thread(target=claim, args=(i,)) for i in range(len(outboxes))]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sorted(sum(claimed, [])) == [EMERGENCY_ID]
+        winner = outboxes[next(i for i, ids in enumerate(claimed) if ids)]
+        with sqlite3.connect(outbox_path) as conn:
+            owner, = conn.execute(
+                'SELECT owner FROM outbox_emergencies WHERE emergency_id = ?', (EMERGENCY_ID,)
+            ).fetchone()
+        assert owner == winner.owner
+        # A live owner keeps its claim
+        assert all(outbox.claim_orphans() == [] for outbox in outboxes)
+    finally:
+        for outbox in outboxes:
+            outbox.close()
+
+
+def test_claim_is_compare_and_set(outbox_path):
+    crash(outbox_path, "outbox.add(ALERT_DATA, make_notifications(10), 0)\n")
+    expire_owners(outbox_path)
+
+    first, second = Outbox(outbox_path), Outbox(outbox_path)
+    claimed_first = []
+
+    def race(statement):
+        # The first outbox claims the orphan after the second one saw it as orphaned
+        if statement.startswith('UPDATE outbox_emergencies SET owner') and not claimed_first:
+            claimed_first.extend(first.claim_orphans())
+
+    try:
+        second._conn.set_trace_callback(race)
+        assert second.claim_orphans() == []
+        assert claimed_first == [EMERGENCY_ID]
+        assert first.get_emergency(EMERGENCY_ID)[0] == ALERT_DATA
+        with sqlite3.connect(outbox_path) as conn:
+            owner, = conn.execute('SELECT owner FROM outbox_emergencies').fetchone()
+        assert owner == first.owner
+    finally:
+        second._conn.set_trace_callback(None)
+        first.close()
+        second.close()
+
+
+def test_orphan_past_resume_deadline_is_abandoned(outbox_path):
+    crash(outbox_path, "outbox.add(ALERT_DATA, make_notifications(10), 0)\n")
+    expire_owners(outbox_path)
+    with sqlite3.connect(outbox_path) as conn:
+        conn.execute('UPDATE outbox_emergencies SET created_at = created_at - 3600')
+
+    outbox = Outbox(outbox_path, resume_deadline=1800)
+    try:
+        # Claimed so nobody else resumes it, but closed instead of being resent an hour late
+        assert outbox.claim_orphans() == []
+        assert outbox.counts(EMERGENCY_ID) == {'pending': 0, 'sent': 0, 'failed': 0, 'abandoned': 10}
+        assert outbox.notifications(EMERGENCY_ID)[0]['error'] == 'resume deadline passed'
+        with sqlite3.connect(outbox_path) as conn:
+            completed_at, = conn.execute('SELECT completed_at FROM outbox_emergencies').fetchone()
+        assert completed_at is not None
+        assert outbox.claim_orphans() == []
+    finally:
+        outbox.close()
+
+
+def test_released_emergency_is_reclaimed_after_lease(outbox_path):
+    outbox = Outbox(outbox_path, lease=0.2)
+    try:
+        outbox.add(ALERT_DATA, make_notifications(10), 0)
+        # A live owner keeps its emergency until it releases it
+        assert outbox.claim_orphans() == []
+        outbox.release(EMERGENCY_ID)
+        assert outbox.claim_orphans() == []
+        time.sleep(0.3)
+        # Any live process may claim it once the lease has passed, the one that released it too
+        assert outbox.claim_orphans() == [EMERGENCY_ID]
+        assert len(outbox.pending(EMERGENCY_ID)) == 10
+    finally:
+        outbox.close()
+
+
+def test_failed_delivery_in_live_process_is_resumed(students_csv, tmp_path, monkeypatch):
+    transport = RecordingTransport()
+    coordinator = EmergencyCoordinator(
+        delivery_engine=DeliveryEngine(transport, max_retries=0), history_path=str(tmp_path / 'history.db'),
+        roster_path=str(students_csv), state_path=str(tmp_path / 'state.db'), outbox_path=str(tmp_path / 'outbox.db')
+    )
+    try:
+        # Recording the history fails after every notification went out
+        with monkeypatch.context() as patch:
+            patch.setattr(coordinator.history_store, 'append_emergency', lambda record: 1 / 0)
+            with pytest.raises(ZeroDivisionError):
+                coordinator.trigger_emergency('section', 'Fire drill', 'CSE', 'A')
+        emergency_id, = {key.split('/')[0] for key in transport.sent}
+
+        coordinator.outbox.lease = 0
+        assert coordinator.outbox.claim_orphans() == [emergency_id]
+        coordinator._resume_emergency(emergency_id)
+
+        record = coordinator.get_emergency(emergency_id)
+        assert record['notification_result']['resumed'] is True
+        assert record['notification_result']['notifications_sent'] == len(transport.sent)
+        assert coordinator.outbox.claim_orphans() == []
+    finally:
+        coordinator.roster.stop()
+        coordinator.outbox.close()
+        coordinator.notification_agent.delivery_engine.close()
+
+
+def test_prune_deletes_completed_emergencies_past_retention(outbox_path):
+    outbox = Outbox(outbox_path, retention=3600)
+    try:
+        notifications = make_notifications(10)
+        outbox.add(ALERT_DATA, notifications, 0)
+        for notification in notifications:
+            outbox.record_result(notification['idempotency_key'], {'status': 'sent', 'attempts': 1})
+        outbox.complete(EMERGENCY_ID)
+        assert outbox.prune() == 0
+        assert outbox.counts(EMERGENCY_ID)['sent'] == 10
+
+        with sqlite3.connect(outbox_path) as conn:
+            conn.execute('UPDATE outbox_emergencies SET completed_at = completed_at - 7200')
+        assert outbox.prune() == 1
+        assert outbox.get_emergency(EMERGENCY_ID) == (None, None)
+        assert outbox.counts(EMERGENCY_ID) == {'pending': 0, 'sent': 0, 'failed': 0}
+    finally:
+        outbox.close()
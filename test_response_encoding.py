@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Tests for response encoding: compact JSON with and without orjson, NumPy
+arrays in payloads, Accept-Encoding negotiation and compression
+"""
+
+import gzip
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agents import response_encoding
+from agents.response_encoding import compress, dumps, negotiate_encoding
+
+PAYLOAD = {'count': 3, 'data': {'student_id': np.array([1001, 1002, 2001]), 'name': ['Asha', 'Ben', 'Chen']}}
+EXPECTED = {'count': 3, 'data': {'student_id': [1001, 1002, 2001], 'name': ['Asha', 'Ben', 'Chen']}}
+
+
+@pytest.fixture(params=['orjson', 'json'])
+def encoder(request, monkeypatch):
+    """Run a test with orjson (when installed) and with the standard library fallback"""
+    if request.param == 'orjson':
+        pytest.importorskip('orjson')
+    else:
+        monkeypatch.setattr(response_encoding, 'orjson', None)
+    return request.param
+
+
+def test_dumps_writes_compact_json_with_numpy_arrays(encoder):
+    body = dumps(PAYLOAD)
+
+    assert isinstance(body, bytes)
+    assert json.loads(body) == EXPECTED
+    assert b' ' not in body
+
+
+def test_dumps_rejects_unserializable_values(encoder):
+    with pytest.raises(TypeError):
+        dumps({'value': object()})
+
+
+@pytest.mark.parametrize('header, expected', [
+    (None, None),
+    ('', None),
+    ('identity', None),
+    ('gzip, deflate', 'gzip'),
+    ('GZIP', 'gzip'),
+    ('deflate, gzip;q=0.5', 'gzip'),
+    ('gzip;q=0', None),
+    ('gzip; q=0.0, deflate', None),
+])
+def test_negotiate_encoding_without_brotli(header, expected, monkeypatch):
+    monkeypatch.setattr(response_encoding, 'brotli', None)
+    assert negotiate_encoding(header) == expected
+    # brotli is only offered when it is installed
+    assert negotiate_encoding('br') is None
+
+
+def test_negotiate_encoding_prefers_brotli():
+    pytest.importorskip('brotli')
+    assert negotiate_encoding('gzip, deflate, br') == 'br'
+    assert negotiate_encoding('gzip, br;q=0') == 'gzip'
+
+
+def test_compress_round_trips():
+    body = dumps(EXPECTED) * 50
+
+    assert compress(body, None) is body
+    compressed = compress(body, 'gzip')
+    assert len(compressed) < len(body) and gzip.decompress(compressed) == body
+
+
+def test_compress_with_brotli_round_trips():
+    brotli = pytest.importorskip('brotli')
+    body = dumps(EXPECTED) * 50
+    assert brotli.decompress(compress(body, 'br')) == body
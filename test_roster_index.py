@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Tests for the columnar roster index: branch and section lookups match a
+full-table filter, a rebuilt index only regroups what changed, and safe
+students are excluded with typed ID arrays
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agents import roster_index
+from agents.roster_index import RosterIndex, exclusion_mask, parse_student_ids
+
+
+def make_roster(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'student_id': np.arange(1000, 1000 + count),
+        'name': [f"Student {i}" for i in range(count)],
+        'branch': rng.choice(['CSE', 'ECE', 'MECH'], count),
+        'section': rng.choice(['A', 'B', 'C'], count),
+        'parent_email': [f"parent.{i}@email.com" for i in range(count)],
+    })
+
+
+def test_lookups_match_a_full_table_filter():
+    roster = make_roster(500)
+    expected = roster.copy()
+    index = RosterIndex(roster)
+
+    for branch in ('CSE', 'ECE', 'MECH'):
+        positions = index.positions(branch)
+        assert positions.tolist() == np.flatnonzero(expected['branch'] == branch).tolist()
+        for section in ('A', 'B', 'C'):
+            selected = index.select(branch, section)
+            match = expected[(expected['branch'] == branch) & (expected['section'] == section)]
+            assert selected['student_id'].tolist() == match['student_id'].tolist()
+
+
+def test_unknown_targets_and_missing_values_select_nobody():
+    roster = make_roster(20)
+    roster.loc[3, 'branch'] = None
+    roster.loc[4, 'section'] = None
+    index = RosterIndex(roster)
+
+    assert len(index.positions('CIVIL')) == 0
+    assert len(index.positions('CSE', 'Z')) == 0
+    grouped = np.concatenate([index.positions(branch) for branch in index.branch_positions])
+    # The student without a branch is in no branch; the one without a section is in its branch only
+    assert 3 not in grouped and 4 in grouped
+    assert 4 not in np.concatenate(list(index.section_positions.values()))
+    assert isinstance(index.students_data['branch'].dtype, pd.CategoricalDtype)
+
+
+def test_rebuild_groups_only_appended_rows():
+    roster = make_roster(100)
+    previous = RosterIndex(roster.copy())
+    appended = pd.concat([roster, make_roster(10, seed=1).assign(student_id=range(2000, 2010))], ignore_index=True)
+
+    index = RosterIndex.rebuild(previous, appended.copy())
+    fresh = RosterIndex(appended.copy())
+
+    assert index.branch_positions.keys() == fresh.branch_positions.keys()
+    for key, positions in fresh.section_positions.items():
+        assert index.section_positions[key].tolist() == positions.tolist()
+    # The previous index's arrays are never modified
+    assert all(positions.max() < 100 for positions in previous.branch_positions.values())
+
+
+def test_rebuild_starts_over_when_a_student_moves():
+    roster = make_roster(100)
+    previous = RosterIndex(roster.copy())
+    moved = roster.copy()
+    moved.loc[0, 'branch'] = 'ECE' if roster.loc[0, 'branch'] != 'ECE' else 'CSE'
+
+    index = RosterIndex.rebuild(previous, moved.copy())
+
+    assert 0 in index.positions(moved.loc[0, 'branch'])
+    assert 0 not in index.positions(roster.loc[0, 'branch'])
+
+
+def test_parse_student_ids_accepts_dashboard_input():
+    assert parse_student_ids(['1003', 1001, '1003', '1002']).tolist() == [1001, 1002, 1003]
+    assert parse_student_ids([1002.0, 1001]).tolist() == [1001, 1002]
+    assert parse_student_ids(None).dtype == np.int64 and len(parse_student_ids([])) == 0
+
+
+@pytest.mark.parametrize('student_ids', ['1001', {'1001': True}, [[1001]], ['abc'], [True, False], [1001.5]])
+def test_parse_student_ids_rejects_anything_else(student_ids):
+    with pytest.raises(ValueError):
+        parse_student_ids(student_ids)
+
+
+@pytest.mark.parametrize('spread', [1, 10_000_000])
+def test_exclusion_mask_matches_isin(monkeypatch, spread):
+    # A small spread uses the bitmap; a huge one falls back to binary search
+    monkeypatch.setattr(roster_index, 'BITMAP_MIN_SPAN', 1024)
+    rng = np.random.default_rng(0)
+    student_ids = rng.integers(0, 5000 * spread, 5000)
+    excluded = parse_student_ids(rng.choice(student_ids, 500).tolist() + [-1, 10 ** 12])
+
+    assert exclusion_mask(student_ids, excluded).tolist() == np.isin(student_ids, excluded).tolist()
+
+
+def test_exclude_only_drops_safe_students_of_the_target():
+    roster = make_roster(200)
+    index = RosterIndex(roster)
+    positions = index.positions('CSE', 'A')
+    safe = parse_student_ids([int(roster['student_id'].iloc[positions[0]]), 1000 + 199, 99999])
+
+    remaining = index.exclude(positions, safe)
+
+    assert remaining.tolist() == [position for position in positions.tolist()[1:] if position != 199]
+    assert index.exclude(None, safe).tolist() == [i for i in range(200) if i not in (positions[0], 199)]
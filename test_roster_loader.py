@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests for the chunked roster loader: compact dtypes, results that do not
+depend on the chunk size, shared parent emails, and the load's peak memory
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agents.roster_loader import PeakMemory, read_roster_csv
+
+
+def write_roster(path, count, first_id=1000):
+    pd.DataFrame({
+        'student_id': range(first_id, first_id + count),
+        'name': [f"Student {i}" for i in range(count)],
+        'branch': [('CSE', 'ECE', 'MECH')[i % 3] for i in range(count)],
+        'section': [('A', 'B')[i % 2] for i in range(count)],
+        # Siblings: every two students share a parent
+        'parent_email': [f"parent.{i // 2}@email.com" for i in range(count)],
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+def test_compact_dtypes(tmp_path):
+    students_df = read_roster_csv(write_roster(tmp_path / 'students.csv', 100))
+
+    assert students_df['student_id'].dtype == np.int32
+    assert isinstance(students_df['branch'].dtype, pd.CategoricalDtype)
+    assert isinstance(students_df['section'].dtype, pd.CategoricalDtype)
+    assert students_df['name'].dtype == object and students_df['parent_email'].dtype == object
+
+
+def test_chunking_does_not_change_the_roster(tmp_path):
+    csv_path = write_roster(tmp_path / 'students.csv', 1000)
+
+    whole = read_roster_csv(csv_path)
+    chunked = read_roster_csv(csv_path, chunk_size=7)
+
+    pd.testing.assert_frame_equal(chunked, whole)
+    assert sorted(chunked['branch'].cat.categories) == ['CSE', 'ECE', 'MECH']
+
+
+def test_ids_too_large_for_int32_stay_int64(tmp_path):
+    students_df = read_roster_csv(write_roster(tmp_path / 'students.csv', 10, first_id=2**31), chunk_size=3)
+
+    assert students_df['student_id'].dtype == np.int64
+    assert students_df['student_id'].iloc[-1] == 2**31 + 9
+
+
+def test_sibling_emails_are_shared_across_chunks(tmp_path):
+    # With 3-row chunks, siblings 2 and 3 (and so on) fall into different chunks
+    students_df = read_roster_csv(write_roster(tmp_path / 'students.csv', 12), chunk_size=3)
+
+    emails = students_df['parent_email']
+    assert emails[2] == emails[3] == 'parent.1@email.com'
+    assert emails[2] is emails[3]
+    assert len({id(email) for email in emails}) == 6
+
+
+def test_peak_memory_is_measured_around_the_block():
+    with PeakMemory() as outside:
+        retained = np.ones(4 * 1024 * 1024 // 8)  # 4 MB kept for the next block's baseline
+        with PeakMemory() as inside:
+            transient = np.ones(16 * 1024 * 1024 // 8)
+            del transient
+
+    # Memory held before a block started is not part of its peak
+    assert 15.9 <= inside.peak_mb < 17
+    assert outside.peak_mb >= 4
+    del retained
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Tests for roster hot-reloading: edits to the CSV publish a new snapshot
+(with its own branch/section catalog), invalid edits keep the current one,
+and held snapshots never change
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agents.roster_manager import RosterManager
+
+HEADER = 'student_id,name,branch,section,parent_email\n'
+
+
+def write_roster(path, rows, bump=0):
+    """Write roster rows; bump moves the modification time forward so the change is always seen"""
+    with open(path, 'w') as f:
+        f.write(HEADER + ''.join(f"{row}\n" for row in rows))
+    if bump:
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + bump * 1_000_000_000))
+
+
+ROWS = [
+    '1001,Asha,CSE,A,a@email.com',
+    '1002,Ben,CSE,B,b@email.com',
+]
+
+
+@pytest.fixture
+def roster_path(tmp_path):
+    path = tmp_path / 'students.csv'
+    write_roster(path, ROWS)
+    return str(path)
+
+
+@pytest.fixture(params=[False, True], ids=['csv', 'compiled'])
+def make_manager(request):
+    managers = []
+
+    def make(path, **kwargs):
+        manager = RosterManager(path, compiled=request.param, **kwargs)
+        managers.append(manager)
+        return manager
+
+    yield make
+    for manager in managers:
+        manager.stop()
+
+
+def test_unchanged_file_is_not_reloaded(roster_path, make_manager):
+    manager = make_manager(roster_path)
+    snapshot = manager.snapshot
+
+    assert manager.check() is False
+    assert manager.snapshot is snapshot and snapshot.version == 1 and len(snapshot) == 2
+
+
+def test_edit_publishes_a_new_snapshot(roster_path, make_manager):
+    manager = make_manager(roster_path)
+    held = manager.snapshot
+
+    write_roster(roster_path, ROWS + ['2001,Chen,ECE,A,c@email.com'], bump=5)
+    assert manager.check() is True
+
+    snapshot = manager.snapshot
+    assert snapshot.version == 2 and snapshot.tag != held.tag
+    assert snapshot.students_data['student_id'].tolist() == [1001, 1002, 2001]
+    assert len(snapshot.roster_index.positions('ECE')) == 1
+    # Whoever holds the old snapshot keeps a consistent view
+    assert len(held) == 2 and len(held.roster_index.positions('ECE')) == 0
+
+
+def test_invalid_edit_keeps_the_current_snapshot(roster_path, make_manager):
+    manager = make_manager(roster_path)
+    snapshot = manager.snapshot
+
+    write_roster(roster_path, ROWS + ['1001,Duplicate,ECE,A,d@email.com'], bump=5)
+    assert manager.check() is False
+    assert manager.snapshot is snapshot
+    # The rejected version is not parsed again on every poll
+    assert manager.check() is False
+
+    write_roster(roster_path, ROWS[:1], bump=10)
+    assert manager.check() is True and len(manager.snapshot) == 1
+
+
+def test_watcher_picks_up_edits(roster_path, make_manager):
+    manager = make_manager(roster_path, poll_interval=0.02)
+    manager.start()
+
+    write_roster(roster_path, ROWS + ['2001,Chen,ECE,A,c@email.com'], bump=5)
+    deadline = time.monotonic() + 5
+    while manager.snapshot.version == 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert manager.snapshot.version == 2 and len(manager.snapshot) == 3
+
+
+def test_each_snapshot_has_its_own_catalog(roster_path, make_manager):
+    manager = make_manager(roster_path)
+    held = manager.snapshot
+    assert held.catalog.to_dict() == {
+        'total_students': 2,
+        'branches': [{'branch': 'CSE', 'count': 2, 'sections': [
+            {'section': 'A', 'count': 1}, {'section': 'B', 'count': 1}
+        ]}]
+    }
+
+    write_roster(roster_path, ROWS + ['2001,Chen,ECE,C,c@email.com', '2002,Dana,ECE,C,d@email.com'], bump=5)
+    assert manager.check() is True
+
+    catalog = manager.snapshot.catalog
+    assert catalog.branches == ['CSE', 'ECE'] and catalog.sections == ['A', 'B', 'C']
+    assert catalog.sections_for('ECE') == ['C'] and catalog.sections_for('MECH') == []
+    assert catalog.section_counts[('ECE', 'C')] == 2 and catalog.total == 4
+    # The catalog is built with its snapshot, never updated in place
+    assert held.catalog.branches == ['CSE'] and held.catalog.total == 2
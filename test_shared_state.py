@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Tests for the state shared by server workers: writes from one process are
+visible to every other, versions never lose a write, and job progress can be
+polled from a worker that is not running the job
+"""
+
+import os
+import subprocess
+import sys
+import textwrap
+import time
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agents.emergency_jobs import EmergencyDispatcher
+from agents.shared_state import SharedStateStore
+
+
+def test_stores_on_one_file_share_values_and_versions(tmp_path):
+    path = str(tmp_path / 'state.db')
+    first, second = SharedStateStore(path), SharedStateStore(path)
+    try:
+        assert first.get_versioned('current_emergency') == (None, 0)
+        assert first.set('current_emergency', {'status': 'active'}) == 1
+        assert second.get_versioned('current_emergency') == ({'status': 'active'}, 1)
+        assert second.set('current_emergency', {'status': 'resolved'}) == 2
+        assert first.version('current_emergency') == 2
+        second.delete('current_emergency')
+        assert first.get('current_emergency', 'idle') == 'idle'
+    finally:
+        first.close()
+        second.close()
+
+
+def test_concurrent_processes_never_lose_a_version(tmp_path):
+    path = str(tmp_path / 'state.db')
+    script = textwrap.dedent(f"""
+        import sys
+        sys.path.insert(0, {os.path.dirname(os.path.abspath(__file__))!r})
+        import conftest  # makes `agents` importable in the flat layout too
+        from agents.shared_state import SharedStateStore
+        store = SharedStateStore({path!r}, timeout=30)
+        for i in range(200):
+            store.set('counter', i)
+    """)
+    SharedStateStore(path).close()
+    workers = [subprocess.Popen([sys.executable, '-c', script]) for _ in range(3)]
+    assert [worker.wait(timeout=60) for worker in workers] == [0, 0, 0]
+
+    store = SharedStateStore(path)
+    try:
+        assert store.get_versioned('counter') == (199, 600)
+    finally:
+        store.close()
+
+
+def test_prune_keeps_the_most_recent_keys(tmp_path):
+    store = SharedStateStore(str(tmp_path / 'state.db'))
+    try:
+        for i in range(5):
+            store.set(f"progress:{i}", i)
+            time.sleep(0.002)
+        store.set('progress_other', 'kept')  # '_' is not a wildcard
+
+        store.prune('progress:', keep=2)
+
+        assert [store.get(f"progress:{i}") for i in range(5)] == [None, None, None, 3, 4]
+        assert store.get('progress_other') == 'kept'
+    finally:
+        store.close()
+
+
+def test_progress_is_visible_to_other_workers(tmp_path):
+    path = str(tmp_path / 'state.db')
+    running, polling = SharedStateStore(path), SharedStateStore(path)
+    dispatcher = EmergencyDispatcher(progress_store=running)
+    other_worker = EmergencyDispatcher(progress_store=polling)
+
+    def work(job):
+        job.set_affected(3)
+        job.set_queued(3)
+        for _ in range(3):
+            job.record_result(None, {'status': 'sent'})
+
+    try:
+        dispatcher.submit('EMRG_1', work)
+        deadline = time.monotonic() + 5
+        while (other_worker.get_progress('EMRG_1') or {}).get('status') != 'completed':
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+
+        progress = other_worker.get_progress('EMRG_1')
+        assert (progress['sent'], progress['pending'], progress['affected_students_count']) == (3, 0, 3)
+        assert other_worker.get_progress('EMRG_2') is None
+    finally:
+        dispatcher.shutdown()
+        other_worker.shutdown()
+        running.close()
+        polling.close()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Tests for the pooled SMTP transport against the local fake server: many
+messages over a few persistent sessions, rejected messages, recycling and
+reconnecting after the server drops its sessions
+"""
+
+import os
+import sys
+
+import pytest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agents.delivery_engine import DeliveryEngine
+from agents.fake_smtp import FakeSMTPServer
+from agents.smtp_pool import PooledSMTPTransport
+
+
+def make_notifications(count, label='alert'):
+    return [
+        {'student_id': i, 'parent_email': f"parent.{i}@email.com", 'subject': f"{label} {i}",
+         'message': f"{label} for student {i}\n.line starting with a dot"}
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def server():
+    with FakeSMTPServer() as server:
+        yield server
+
+
+@pytest.fixture
+def make_engine():
+    engines = []
+
+    def make(transport, **kwargs):
+        engine = DeliveryEngine(transport, concurrency=transport.pool_size, backoff=0.0, **kwargs)
+        engines.append(engine)
+        return engine
+
+    yield make
+    for engine in engines:
+        engine.close()
+
+
+def test_many_messages_share_a_few_sessions(server, make_engine):
+    transport = PooledSMTPTransport(port=server.port, pool_size=4)
+    engine = make_engine(transport, max_retries=0)
+
+    results = engine.deliver(make_notifications(50))
+
+    assert [result['status'] for result in results] == ['sent'] * 50
+    assert transport.sessions_opened == server.connections <= 4
+    assert sorted(m['rcpt_to'][0] for m in server.messages) == sorted(f"<parent.{i}@email.com>" for i in range(50))
+    # Dot-stuffing is undone by the server: the content arrives unchanged
+    assert all('\r\n.line starting with a dot' in message['data'] for message in server.messages)
+
+
+def test_rejected_message_keeps_the_session():
+    with FakeSMTPServer(fail_every=3) as server:
+        transport = PooledSMTPTransport(port=server.port, pool_size=1)
+        engine = DeliveryEngine(transport, concurrency=1, max_retries=0)
+        try:
+            results = engine.deliver(make_notifications(6))
+        finally:
+            engine.close()
+
+    assert [result['status'] for result in results] == ['sent', 'sent', 'failed'] * 2
+    assert '451' in results[2]['error']
+    assert len(server.messages) == 4 and server.connections == transport.sessions_opened == 1
+
+
+def test_sessions_are_recycled_after_max_messages(server, make_engine):
+    transport = PooledSMTPTransport(port=server.port, pool_size=1, max_messages=5)
+    engine = make_engine(transport, max_retries=0)
+
+    results = engine.deliver(make_notifications(12))
+
+    assert all(result['status'] == 'sent' for result in results)
+    assert transport.sessions_opened == server.connections == 3
+
+
+@pytest.mark.parametrize('health_check_interval, max_retries', [(0.0, 0), (3600.0, 1)],
+                         ids=['health-check', 'retry'])
+def test_sessions_reconnect_after_the_server_restarts(health_check_interval, max_retries, make_engine):
+    first = FakeSMTPServer().start()
+    transport = PooledSMTPTransport(port=first.port, pool_size=2, health_check_interval=health_check_interval)
+    engine = make_engine(transport, max_retries=max_retries)
+    try:
+        assert all(result['status'] == 'sent' for result in engine.deliver(make_notifications(4)))
+        opened = transport.sessions_opened
+    finally:
+        # Ends every pooled session from the server side
+        first.stop()
+
+    with FakeSMTPServer(port=first.port) as second:
+        results = engine.deliver(make_notifications(4, label='update'))
+
+    # An idle session failing its NOOP is replaced before sending; otherwise the failed send is retried
+    assert all(result['status'] == 'sent' for result in results)
+    assert len(second.messages) == 4 and transport.sessions_opened > opened
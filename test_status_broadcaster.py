@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests for pushing status changes: listeners wake on changes made in this
+process or in another one, and only ever get the latest value
+"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from agents.shared_state import SharedStateStore
+from agents.status_broadcaster import StatusBroadcaster
+
+
+@pytest.fixture
+def stores(tmp_path):
+    """Two stores on one file, standing in for two server workers"""
+    path = str(tmp_path / 'state.db')
+    opened = [SharedStateStore(path), SharedStateStore(path)]
+    yield opened
+    for store in opened:
+        store.close()
+
+
+def publish_later(broadcaster, value, delay=0.1):
+    thread = threading.Timer(delay, broadcaster.publish, args=(value,))
+    thread.start()
+    return thread
+
+
+def test_listener_gets_any_value_newer_than_its_own(stores):
+    broadcaster = StatusBroadcaster(stores[0], default={'active': False})
+    try:
+        assert broadcaster.current() == ({'active': False}, 0)
+        broadcaster.publish({'active': True})
+        assert broadcaster.wait(0, timeout=1) == ({'active': True}, 1)
+        # Nothing newer than what the listener has: times out
+        assert broadcaster.wait(1, timeout=0.05) is None
+    finally:
+        broadcaster.close()
+
+
+def test_publish_wakes_waiting_listeners(stores):
+    broadcaster = StatusBroadcaster(stores[0], poll_interval=60)
+    try:
+        publisher = publish_later(broadcaster, {'active': True})
+        started = time.monotonic()
+        assert broadcaster.wait(0, timeout=5) == ({'active': True}, 1)
+        # Woken by the publish itself, not by the (one minute) poll
+        assert time.monotonic() - started < 1
+        publisher.join()
+    finally:
+        broadcaster.close()
+
+
+def test_changes_from_another_worker_reach_listeners(stores):
+    listener = StatusBroadcaster(stores[0], poll_interval=0.02)
+    other_worker = StatusBroadcaster(stores[1])
+    try:
+        publisher = publish_later(other_worker, {'active': True, 'emergency_id': 'EMRG_1'})
+        assert listener.wait(0, timeout=5) == ({'active': True, 'emergency_id': 'EMRG_1'}, 1)
+        publisher.join()
+
+        # A burst of changes costs a slow listener one wake-up with the latest value
+        for i in range(5):
+            other_worker.publish({'active': True, 'emergency_id': f"EMRG_{i + 2}"})
+        time.sleep(0.1)
+        assert listener.wait(1, timeout=5) == ({'active': True, 'emergency_id': 'EMRG_6'}, 6)
+    finally:
+        listener.close()
+        other_worker.close()
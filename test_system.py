@@ -21,7 +21,24 @@ def test_basic_functionality():
         'agents/selection_agent.py', 
         'agents/notification_agent.py',
         'agents/emergency_coordinator.py',
+        'agents/roster_index.py',
+        'agents/delivery_engine.py',
+        'agents/emergency_jobs.py',
+        'agents/notification_renderer.py',
+        'agents/history_store.py',
+        'agents/emergency_target.py',
+        'agents/agent_logging.py',
+        'agents/roster_manager.py',
+        'agents/compiled_roster.py',
+        'agents/roster_loader.py',
+        'agents/shared_state.py',
+        'agents/status_broadcaster.py',
+        'agents/response_encoding.py',
+        'agents/smtp_pool.py',
+        'agents/outbox.py',
+        'agents/emergency_ids.py',
         'app.py',
+        'wsgi.py',
         'templates/dashboard.html',
         'static/style.css',
         'static/script.js'
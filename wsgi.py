@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+"""
+WSGI entry point for production servers running several worker processes,
+e.g. `gunicorn --workers 4 --worker-class gthread wsgi:app`
+"""
+
+import os
+import sys
+
+# Add current directory to path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Every worker imports this module: keep emergency status and progress in the shared store
+os.environ.setdefault('EMERGENCY_SHARED_STATE', '1')
+
+from app import app
+
+application = app